@@ -0,0 +1,248 @@
+import os
+import re
+import json
+import math
+import time
+import atexit
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query so trivially different phrasings share a cache entry"""
+    normalized = re.sub(r"\s+", " ", query.strip().lower())
+    return normalized.rstrip("?!. ")
+
+
+def _unit(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+class AnswerCache:
+    """Process-wide response cache for ContextAwareChatbot.ask_question.
+
+    Entries are keyed by (normalized query, mode, knowledge-base version) and
+    evicted by TTL and LRU order. An optional semantic tier serves a cached
+    answer when a new query's embedding is within a cosine-similarity
+    threshold of a cached query with the same mode and KB version. Embedding
+    similarity does not see negation or small wording changes that flip the
+    meaning, so the semantic tier is off unless a threshold is set.
+
+    With a persist path, changes are written by a background timer at most
+    once per save_delay_seconds, and at exit, never on the request path.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 3600,
+                 semantic_threshold: float = 0.0, persist_path: Optional[str] = None,
+                 save_delay_seconds: float = 5.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.semantic_threshold = semantic_threshold
+        self.persist_path = persist_path
+        self.save_delay_seconds = save_delay_seconds
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._save_lock = threading.Lock()
+        self._save_timer: Optional[threading.Timer] = None
+        self._dirty = False
+        self._stats = {
+            "exact_hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+
+        if self.persist_path:
+            self._load()
+            atexit.register(self.flush)
+
+    @property
+    def semantic_enabled(self) -> bool:
+        return self.semantic_threshold > 0
+
+    @staticmethod
+    def make_key(query: str, mode: str, kb_version: str) -> str:
+        return json.dumps([normalize_query(query), mode, kb_version])
+
+    def get(self, query: str, mode: str, kb_version: str,
+            query_embedding: Optional[List[float]] = None) -> Optional[Dict[str, Any]]:
+        """Look up a cached result, trying the exact tier before the semantic tier"""
+        key = self.make_key(query, mode, kb_version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and not self._expired(entry):
+                self._entries.move_to_end(key)
+                self._stats["exact_hits"] += 1
+                return entry["result"]
+            if entry:
+                self._remove(key, "expirations")
+
+            if self.semantic_enabled and query_embedding is not None:
+                match = self._semantic_lookup(mode, kb_version, query_embedding)
+                if match:
+                    self._entries.move_to_end(match)
+                    self._stats["semantic_hits"] += 1
+                    return self._entries[match]["result"]
+
+            self._stats["misses"] += 1
+            return None
+
+    def peek(self, query: str, mode: str, kb_version: str) -> Optional[Dict[str, Any]]:
+        """Exact-tier lookup that leaves hit statistics and LRU order untouched"""
+        with self._lock:
+            entry = self._entries.get(self.make_key(query, mode, kb_version))
+            if entry and not self._expired(entry):
+                return entry["result"]
+            return None
+
+    def put(self, query: str, mode: str, kb_version: str, result: Dict[str, Any],
+            query_embedding: Optional[List[float]] = None):
+        """Store a result and evict least recently used entries over capacity"""
+        key = self.make_key(query, mode, kb_version)
+        with self._lock:
+            self._entries[key] = {
+                "query": normalize_query(query),
+                "mode": mode,
+                "kb_version": kb_version,
+                "result": result,
+                "embedding": _unit(list(query_embedding)) if query_embedding is not None else None,
+                "created": time.time(),
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest, "evictions")
+            self._schedule_save()
+
+    def invalidate(self, kb_version: Optional[str] = None):
+        """Drop all entries, or only those built for a given KB version"""
+        with self._lock:
+            if kb_version is None:
+                self._entries.clear()
+            else:
+                for key in [k for k, e in self._entries.items() if e["kb_version"] == kb_version]:
+                    del self._entries[key]
+            self._schedule_save()
+        logger.info(f"Answer cache invalidated ({'all versions' if kb_version is None else kb_version})")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit-rate metrics for the status panel"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["exact_hits"] + stats["semantic_hits"] + stats["misses"]
+        stats["lookups"] = lookups
+        stats["hit_rate"] = (stats["exact_hits"] + stats["semantic_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def _expired(self, entry: Dict[str, Any]) -> bool:
+        return self.ttl_seconds > 0 and time.time() - entry["created"] > self.ttl_seconds
+
+    def _remove(self, key: str, reason: str):
+        del self._entries[key]
+        self._stats[reason] += 1
+
+    def _semantic_lookup(self, mode: str, kb_version: str, query_embedding: List[float]) -> Optional[str]:
+        """Key of the most similar live entry above the threshold, if any"""
+        candidates: List[Tuple[str, List[float]]] = []
+        for key, entry in list(self._entries.items()):
+            if entry["mode"] != mode or entry["kb_version"] != kb_version or entry["embedding"] is None:
+                continue
+            if self._expired(entry):
+                self._remove(key, "expirations")
+                continue
+            candidates.append((key, entry["embedding"]))
+        if not candidates:
+            return None
+
+        query_vector = _unit(list(query_embedding))
+        if NUMPY_AVAILABLE:
+            scores = np.asarray([vector for _, vector in candidates]) @ np.asarray(query_vector)
+            best = int(np.argmax(scores))
+            best_score = float(scores[best])
+        else:
+            scores = [sum(a * b for a, b in zip(vector, query_vector)) for _, vector in candidates]
+            best = max(range(len(scores)), key=scores.__getitem__)
+            best_score = scores[best]
+
+        return candidates[best][0] if best_score >= self.semantic_threshold else None
+
+    def _load(self):
+        """Restore persisted entries, skipping ones that expired while offline"""
+        if not os.path.exists(self.persist_path):
+            return
+        try:
+            with open(self.persist_path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+            for key, entry in stored.items():
+                if not self._expired(entry):
+                    self._entries[key] = entry
+            logger.info(f"Loaded {len(self._entries)} cached answers from {self.persist_path}")
+        except Exception as e:
+            logger.error(f"Error loading answer cache from {self.persist_path}: {e}")
+
+    def _schedule_save(self):
+        """Mark the cache changed and start the save timer if none is pending; call with the lock held"""
+        if not self.persist_path:
+            return
+        self._dirty = True
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(self.save_delay_seconds, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush(self):
+        """Write pending changes to the persist path now"""
+        if not self.persist_path:
+            return
+        with self._save_lock:
+            with self._lock:
+                if self._save_timer is not None:
+                    self._save_timer.cancel()
+                    self._save_timer = None
+                if not self._dirty:
+                    return
+                self._dirty = False
+                # Entries are not modified once stored, so a shallow copy can be written outside the lock
+                snapshot = dict(self._entries)
+            try:
+                tmp_path = f"{self.persist_path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(snapshot, f)
+                os.replace(tmp_path, self.persist_path)
+            except Exception as e:
+                logger.error(f"Error saving answer cache to {self.persist_path}: {e}")
+
+
+_shared_cache: Optional[AnswerCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_answer_cache(config) -> Optional[AnswerCache]:
+    """Return the process-wide answer cache shared by all chatbot sessions"""
+    global _shared_cache
+    if not getattr(config, "ENABLE_ANSWER_CACHE", False):
+        return None
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = AnswerCache(
+                max_entries=config.ANSWER_CACHE_MAX_ENTRIES,
+                ttl_seconds=config.ANSWER_CACHE_TTL_SECONDS,
+                semantic_threshold=config.ANSWER_CACHE_SEMANTIC_THRESHOLD,
+                persist_path=config.ANSWER_CACHE_PATH or None,
+                save_delay_seconds=getattr(config, "ANSWER_CACHE_SAVE_DELAY_SECONDS", 5.0),
+            )
+        return _shared_cache
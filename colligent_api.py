@@ -0,0 +1,401 @@
+"""Headless HTTP API for the chatbot.
+
+Serves one shared ContextAwareChatbot over plain HTTP/1.1 on asyncio, so the
+assistant can be embedded in other sites without a Streamlit session per
+visitor. Each request is answered by a cheap fork of the shared chatbot, in the
+mode it asks for.
+
+Endpoints:
+    POST /ask           {"question": "...", "mode": "interview", "include_context": false}
+    POST /ask/stream    same body; answer events as Server-Sent Events, ending in done or error
+    GET  /modes         available response modes
+    GET  /kb/info       knowledge base details
+    GET  /health        readiness and load
+    GET  /metrics       Prometheus metrics
+
+Usage:
+    python colligent_api.py --host 0.0.0.0 --port 8000
+"""
+import os
+import json
+import time
+import socket
+import asyncio
+import logging
+import argparse
+from http import HTTPStatus
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
+
+from colligent_config import Config
+from colligent_core import ContextAwareChatbot
+from colligent_metrics import METRICS, configure_metrics
+from colligent_modes import MODE_DESCRIPTIONS
+from colligent_rate_limiter import (
+    get_rate_limiter, parse_trusted_proxies, resolve_client_address, LLM_BUDGET, CACHE_BUDGET
+)
+from colligent_warmup import start_quick_question_warm_up
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 64 * 1024
+MAX_HEADERS = 100
+KEEP_ALIVE_TIMEOUT_SECONDS = 15
+REQUEST_READ_TIMEOUT_SECONDS = 10  # Headers and body together, once the request line has arrived
+
+
+class HTTPError(Exception):
+    """An error answered with a JSON body and the given status"""
+
+    def __init__(self, status: int, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+class Request:
+    __slots__ = ("method", "path", "version", "headers", "body", "client")
+
+    def __init__(self, method: str, path: str, version: str, headers: Dict[str, str], body: bytes, client: str):
+        self.method = method
+        self.path = path
+        self.version = version
+        self.headers = headers
+        self.body = body
+        self.client = client
+
+    @property
+    def keep_alive(self) -> bool:
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+    def json(self) -> Dict[str, Any]:
+        try:
+            payload = json.loads(self.body or b"{}")
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            raise HTTPError(400, "Request body must be JSON")
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "Request body must be a JSON object")
+        return payload
+
+
+async def read_request(reader: asyncio.StreamReader, client: str) -> Optional[Request]:
+    """Parse one request from the stream, or return None if the client hung up"""
+    try:
+        line = await asyncio.wait_for(reader.readline(), KEEP_ALIVE_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        return None
+    if not line:
+        return None
+    try:
+        method, path, version = line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(400, "Malformed request line")
+
+    # One deadline for the rest, so a client trickling bytes cannot hold the connection
+    try:
+        headers, body = await asyncio.wait_for(_read_headers_and_body(reader), REQUEST_READ_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        raise HTTPError(408, "Request timed out")
+    return Request(method.upper(), path.split("?", 1)[0].rstrip("/") or "/", version, headers, body, client)
+
+
+async def _read_headers_and_body(reader: asyncio.StreamReader) -> Tuple[Dict[str, str], bytes]:
+    headers: Dict[str, str] = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        if len(headers) >= MAX_HEADERS:
+            raise HTTPError(431, "Too many headers")
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HTTPError(400, "Invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, "Request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return headers, body
+
+
+class ColliGentAPI:
+    """Routes requests to a shared chatbot, at most max_concurrency questions at a time"""
+
+    def __init__(self, config: Config, chatbot_factory: Optional[Callable[[Config], ContextAwareChatbot]] = None):
+        self.config = config
+        self.chatbot_factory = chatbot_factory or ContextAwareChatbot
+        self.chatbot: Optional[ContextAwareChatbot] = None
+        self.ready = False
+        self.started = time.time()
+        self.max_concurrency = getattr(config, "API_MAX_CONCURRENCY", 8)
+        self.queue_timeout = getattr(config, "API_QUEUE_TIMEOUT_SECONDS", 10)
+        self.rate_limiter = get_rate_limiter(config)
+        self.trusted_proxies = parse_trusted_proxies(getattr(config, "TRUSTED_PROXIES", ""))
+        self.in_flight = 0
+        self.rejected = 0
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.routes = {
+            ("GET", "/health"): self.health,
+            ("GET", "/modes"): self.modes,
+            ("GET", "/kb/info"): self.kb_info,
+            ("GET", "/metrics"): self.metrics,
+            ("POST", "/ask"): self.ask,
+        }
+        self.stream_routes = {("POST", "/ask/stream"): self.ask_stream}
+        origins = getattr(config, "API_CORS_ORIGINS", "*")
+        self.cors_origins = {origin.strip() for origin in origins.split(",") if origin.strip()}
+
+    async def load(self):
+        """Create the shared chatbot and load the knowledge base off the event loop"""
+        configure_metrics(self.config)
+        loop = asyncio.get_running_loop()
+        self.chatbot = await loop.run_in_executor(None, self.chatbot_factory, self.config)
+        self.ready = await loop.run_in_executor(None, self.chatbot.initialize_knowledge_base)
+        if self.ready:
+            start_quick_question_warm_up(self.chatbot, self.config.QUICK_QUESTIONS)
+            logger.info("Knowledge base loaded, API ready")
+        else:
+            logger.error("Failed to initialize knowledge base; /ask will return 503")
+
+    async def serve(self, host: Optional[str] = None, port: Optional[int] = None,
+                    sock: Optional[socket.socket] = None) -> asyncio.AbstractServer:
+        """Listen on host:port, or on an already bound socket shared with other worker processes"""
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        if sock is not None:
+            server = await asyncio.start_server(self.handle_connection, sock=sock)
+            host, port = sock.getsockname()[:2]
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+        logger.info(f"ColliGent API listening on http://{host}:{port} (pid {os.getpid()})")
+        await self.load()
+        return server
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        peer = writer.get_extra_info("peername")
+        peer_host = peer[0] if peer else "unknown"
+        try:
+            while True:
+                request = None
+                try:
+                    request = await read_request(reader, peer_host)
+                    if request is None:
+                        break
+                    if not await self.dispatch(request, writer):
+                        break
+                except HTTPError as e:
+                    origin = request.headers.get("origin") if request else None
+                    await self.send_json(writer, e.status, {"error": e.message}, e.headers, origin, keep_alive=False)
+                    break
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    break
+                except Exception as e:
+                    logger.error(f"Error handling API request from {peer_host}: {e}")
+                    await self.send_json(writer, 500, {"error": "Internal server error"}, keep_alive=False)
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, request: Request, writer: asyncio.StreamWriter) -> bool:
+        """Answer one request; return whether the connection can be reused"""
+        origin = request.headers.get("origin")
+        route = (request.method, request.path)
+        if request.method == "OPTIONS":
+            await self.send(writer, 204, b"", origin=origin, keep_alive=request.keep_alive, extra_headers={
+                "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
+                "Access-Control-Allow-Headers": "Content-Type",
+                "Access-Control-Max-Age": "600",
+            })
+            return request.keep_alive
+        if route in self.stream_routes:
+            await self.stream_routes[route](request, writer)
+            return False
+        if route not in self.routes:
+            if any(path == request.path for _, path in list(self.routes) + list(self.stream_routes)):
+                raise HTTPError(405, f"Method {request.method} not allowed on {request.path}")
+            raise HTTPError(404, f"No route for {request.path}")
+
+        status, body = await self.routes[route](request)
+        if isinstance(body, str):
+            await self.send(writer, status, body.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8",
+                            origin, request.keep_alive)
+        else:
+            await self.send_json(writer, status, body, origin=origin, keep_alive=request.keep_alive)
+        return request.keep_alive
+
+    # Endpoints
+
+    async def health(self, request: Request) -> Tuple[int, Dict[str, Any]]:
+        payload = {
+            "status": "ok" if self.ready else "starting",
+            "kb_version": self.chatbot.kb_version if self.chatbot else None,
+            "llm": bool(self.chatbot and self.chatbot.llm),
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "rejected": self.rejected,
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "pid": os.getpid(),
+        }
+        return (200 if self.ready else 503), payload
+
+    async def modes(self, request: Request) -> Tuple[int, Dict[str, Any]]:
+        return 200, {"modes": dict(MODE_DESCRIPTIONS)}
+
+    async def kb_info(self, request: Request) -> Tuple[int, Dict[str, Any]]:
+        self._require_ready()
+        info = await asyncio.get_running_loop().run_in_executor(None, self.chatbot.get_knowledge_base_info)
+        return 200, dict(info, kb_version=self.chatbot.kb_version)
+
+    async def metrics(self, request: Request) -> Tuple[int, str]:
+        return 200, METRICS.render_prometheus()
+
+    async def ask(self, request: Request) -> Tuple[int, Dict[str, Any]]:
+        session, question, include_context = self._prepare_question(request)
+        async with self._slot():
+            result = await session.aask_question(question, include_context=include_context)
+        result["mode"] = session.current_mode
+        return (500 if "error" in result else 200), result
+
+    async def ask_stream(self, request: Request, writer: asyncio.StreamWriter):
+        origin = request.headers.get("origin")
+        session, question, include_context = self._prepare_question(request)
+        async with self._slot():
+            head = self._head(200, "text/event-stream", origin, keep_alive=False,
+                              extra_headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+            writer.write(head)
+            events: AsyncIterator[Dict[str, Any]] = session.aask_question_stream(question, include_context=include_context)
+            try:
+                async for event in events:
+                    if event["type"] == "done":
+                        event = dict(event, mode=session.current_mode)
+                    writer.write(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode("utf-8"))
+                    await writer.drain()
+            except ConnectionError:
+                raise
+            except Exception as e:
+                # The 200 head is already out, so the failure is reported in the stream, which then ends
+                logger.error(f"Error streaming answer: {e}")
+                error = {"type": "error", "error": "Internal server error"}
+                writer.write(f"event: error\ndata: {json.dumps(error)}\n\n".encode("utf-8"))
+                await writer.drain()
+            finally:
+                # Closing the generator releases a coalesced question if the client left
+                await events.aclose()
+
+    # Helpers
+
+    def _require_ready(self):
+        if not self.ready:
+            raise HTTPError(503, "Knowledge base is not loaded yet", {"Retry-After": "5"})
+
+    def _prepare_question(self, request: Request) -> Tuple[ContextAwareChatbot, str, bool]:
+        """Validate a question request and charge it to the client's rate limit"""
+        self._require_ready()
+        payload = request.json()
+        question = payload.get("question")
+        if not isinstance(question, str) or not question.strip():
+            raise HTTPError(400, "'question' must be a non-empty string")
+        question = question.strip()
+        if getattr(self.config, "ENABLE_INPUT_VALIDATION", True) and len(question) > self.config.MAX_INPUT_LENGTH:
+            raise HTTPError(400, f"'question' is longer than {self.config.MAX_INPUT_LENGTH} characters")
+        mode = payload.get("mode")
+        try:
+            session = self.chatbot.fork_session(mode)
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+
+        if self.rate_limiter:
+            # The peer address, unless the peer is a trusted proxy reporting the client's
+            client_id = resolve_client_address(request.client, request.headers.get("x-forwarded-for"),
+                                               self.trusted_proxies)
+            budget = LLM_BUDGET if session.needs_llm(question) else CACHE_BUDGET
+            allowed, retry_after = self.rate_limiter.check(client_id, budget)
+            if not allowed:
+                raise HTTPError(429, "Rate limit exceeded", {"Retry-After": str(max(1, round(retry_after)))})
+        return session, question, bool(payload.get("include_context", False))
+
+    def _slot(self) -> "_Slot":
+        return _Slot(self)
+
+    def _cors_headers(self, origin: Optional[str]) -> Dict[str, str]:
+        if "*" in self.cors_origins:
+            return {"Access-Control-Allow-Origin": "*"}
+        if origin and origin in self.cors_origins:
+            return {"Access-Control-Allow-Origin": origin, "Vary": "Origin"}
+        return {}
+
+    def _head(self, status: int, content_type: Optional[str], origin: Optional[str], keep_alive: bool,
+              content_length: Optional[int] = None, extra_headers: Optional[Dict[str, str]] = None) -> bytes:
+        headers = {"Server": "ColliGent", "Connection": "keep-alive" if keep_alive else "close"}
+        if content_type:
+            headers["Content-Type"] = content_type
+        if content_length is not None:
+            headers["Content-Length"] = str(content_length)
+        headers.update(self._cors_headers(origin))
+        headers.update(extra_headers or {})
+        lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def send(self, writer: asyncio.StreamWriter, status: int, body: bytes,
+                   content_type: Optional[str] = None, origin: Optional[str] = None, keep_alive: bool = True,
+                   extra_headers: Optional[Dict[str, str]] = None):
+        writer.write(self._head(status, content_type, origin, keep_alive, len(body), extra_headers) + body)
+        await writer.drain()
+
+    async def send_json(self, writer: asyncio.StreamWriter, status: int, payload: Dict[str, Any],
+                        extra_headers: Optional[Dict[str, str]] = None, origin: Optional[str] = None,
+                        keep_alive: bool = True):
+        body = json.dumps(payload, default=str).encode("utf-8")
+        await self.send(writer, status, body, "application/json", origin, keep_alive, extra_headers)
+
+
+class _Slot:
+    """Holds one of the API's concurrency slots, waiting at most queue_timeout for it"""
+
+    def __init__(self, api: ColliGentAPI):
+        self.api = api
+
+    async def __aenter__(self):
+        try:
+            await asyncio.wait_for(self.api._slots.acquire(), self.api.queue_timeout)
+        except asyncio.TimeoutError:
+            self.api.rejected += 1
+            raise HTTPError(503, "Server busy, try again shortly", {"Retry-After": "1"})
+        self.api.in_flight += 1
+
+    async def __aexit__(self, *exc):
+        self.api.in_flight -= 1
+        self.api._slots.release()
+
+
+async def run(config: Config, host: str, port: int):
+    api = ColliGentAPI(config)
+    server = await api.serve(host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    config = Config()
+    parser = argparse.ArgumentParser(description="Serve the ColliGent chatbot over HTTP")
+    parser.add_argument("--host", default=config.API_HOST)
+    parser.add_argument("--port", type=int, default=config.API_PORT)
+    parser.add_argument("--max-concurrency", type=int, default=config.API_MAX_CONCURRENCY)
+    args = parser.parse_args()
+    config.API_MAX_CONCURRENCY = args.max_concurrency
+
+    try:
+        asyncio.run(run(config, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""Answer a bank of questions from the command line.
+
+Reads questions from JSONL ({"question": ..., "id": ..., "mode": ...}) or CSV
+with a "question" column, answers them in parallel with a bounded number of
+workers, and writes one JSON line per question, in input order, with the
+answer, sources, response path, timing and token counts.
+
+Questions are embedded in batches before answering, so the embedding model
+runs a few large calls instead of one per question. The shared answer cache
+and request coalescing apply as they do in the app.
+
+Usage:
+    python colligent_batch.py questions.jsonl -o answers.jsonl --concurrency 8
+    python colligent_batch.py eval.csv -o answers.jsonl --mode interview --rebuild
+"""
+import os
+import sys
+import csv
+import json
+import time
+import logging
+import argparse
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional
+
+from colligent_config import Config, LOG_LEVELS, configure_cli_logging
+from colligent_core import ContextAwareChatbot
+from colligent_metrics import percentile
+from colligent_modes import MODE_DESCRIPTIONS
+from colligent_tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+
+def read_questions(path: str) -> List[Dict[str, Any]]:
+    """Load question records from a .csv file or JSONL (one object, or one plain string, per line)"""
+    records = []
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            reader = csv.DictReader(f)
+            if not reader.fieldnames or "question" not in reader.fieldnames:
+                raise ValueError(f"{path} needs a 'question' column")
+            records = [dict(row) for row in reader]
+        else:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"{path}:{line_number}: invalid JSON ({e})")
+                records.append({"question": record} if isinstance(record, str) else record)
+
+    for index, record in enumerate(records):
+        if not isinstance(record.get("question"), str) or not record["question"].strip():
+            raise ValueError(f"{path}: record {index + 1} has no question")
+        record.setdefault("id", index + 1)
+    return records
+
+
+def embed_in_batches(chatbot: ContextAwareChatbot, questions: List[str], batch_size: int) -> List[Optional[List[float]]]:
+    """Query embeddings for every question, or None where the store embeds nothing (fallback mode)"""
+    embed_queries = getattr(chatbot.vector_store, "embed_queries", None)
+    embeddings: List[Optional[List[float]]] = [None] * len(questions)
+    if embed_queries is None:
+        return embeddings
+    for start in range(0, len(questions), batch_size):
+        batch = embed_queries(questions[start:start + batch_size])
+        if batch is None:
+            return embeddings
+        embeddings[start:start + len(batch)] = batch
+    return embeddings
+
+
+class BatchAnswerer:
+    """Answers question records with one shared chatbot and a session fork per question"""
+
+    def __init__(self, chatbot: ContextAwareChatbot, default_mode: Optional[str] = None,
+                 include_context: bool = False):
+        self.chatbot = chatbot
+        self.default_mode = default_mode
+        self.include_context = include_context
+
+    def answer(self, record: Dict[str, Any], query_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
+        question = record["question"].strip()
+        mode = record.get("mode") or self.default_mode
+        output = {"id": record["id"], "question": question}
+        start = time.perf_counter()
+        path = "error"
+        try:
+            session = self.chatbot.fork_session(mode)
+            result = session.ask_question(question, include_context=self.include_context,
+                                          query_embedding=query_embedding)
+            if "error" not in result:
+                path = session.last_response_path
+        except ValueError as e:
+            # Unknown mode in this record
+            result = {"response": "", "error": str(e)}
+        output.update({
+            "mode": mode or self.chatbot.current_mode,
+            "response": result.get("response", ""),
+            "sources": result.get("sources", []),
+            "path": path,
+            "cached": result.get("cached", False),
+            "coalesced": result.get("coalesced", False),
+            "seconds": round(time.perf_counter() - start, 4),
+            "context_tokens": result.get("context_tokens", 0),
+            "response_tokens": count_tokens(result.get("response", ""), self.chatbot.config.OPENAI_MODEL),
+        })
+        if self.include_context:
+            output["context"] = result.get("context", "")
+        if "error" in result:
+            output["error"] = result["error"]
+        return output
+
+    def answer_all(self, records: List[Dict[str, Any]], concurrency: int = 4,
+                   embed_batch_size: int = 64) -> Iterator[Dict[str, Any]]:
+        """Yield answers in input order while up to concurrency questions are answered at once"""
+        embeddings = embed_in_batches(self.chatbot, [r["question"].strip() for r in records], embed_batch_size)
+        with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="batch") as pool:
+            yield from pool.map(self.answer, records, embeddings)
+
+
+def main():
+    config = Config()
+    parser = argparse.ArgumentParser(description="Answer a file of questions and write the answers as JSONL")
+    parser.add_argument("input", help="Questions as .jsonl or .csv (with a 'question' column)")
+    parser.add_argument("-o", "--output", help="Answers JSONL file (default: stdout)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Questions answered at once")
+    parser.add_argument("--mode", help="Response mode for questions without their own 'mode'")
+    parser.add_argument("--embed-batch-size", type=int, default=64, help="Questions embedded per model call")
+    parser.add_argument("--include-context", action="store_true", help="Add the retrieved context to each answer")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the knowledge base from data/ first")
+    parser.add_argument("--no-cache", action="store_true", help="Answer every question afresh")
+    parser.add_argument("--log-level", choices=LOG_LEVELS, default="WARNING")
+    args = parser.parse_args()
+
+    # Keep per-question INFO lines out of the way
+    configure_cli_logging(args.log_level)
+    try:
+        records = read_questions(args.input)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    if args.no_cache:
+        config.ENABLE_ANSWER_CACHE = False
+
+    if args.mode and args.mode not in MODE_DESCRIPTIONS:
+        parser.error(f"Unknown mode '{args.mode}'. Available modes: {', '.join(MODE_DESCRIPTIONS)}")
+
+    chatbot = ContextAwareChatbot(config)
+    if not chatbot.initialize_knowledge_base(force_rebuild=args.rebuild):
+        parser.exit(1, "Failed to initialize knowledge base\n")
+
+    answerer = BatchAnswerer(chatbot, args.mode, args.include_context)
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    latencies, paths = [], Counter()
+    tokens = Counter()
+    start = time.perf_counter()
+    try:
+        for done, answer in enumerate(answerer.answer_all(records, args.concurrency, args.embed_batch_size), 1):
+            out.write(json.dumps(answer, ensure_ascii=False) + "\n")
+            out.flush()
+            latencies.append(answer["seconds"])
+            paths[answer["path"] or "unknown"] += 1
+            tokens["context"] += answer["context_tokens"]
+            tokens["response"] += answer["response_tokens"]
+            if args.output and (done % 25 == 0 or done == len(records)):
+                print(f"\r{done}/{len(records)} answered", end="", file=sys.stderr, flush=True)
+    finally:
+        if args.output:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"\n{len(latencies)} questions in {elapsed:.1f}s ({len(latencies) / elapsed:.1f}/s); "
+          f"p50 {percentile(latencies, 0.5) or 0:.2f}s, p95 {percentile(latencies, 0.95) or 0:.2f}s", file=sys.stderr)
+    print("Paths: " + ", ".join(f"{path} {count}" for path, count in paths.most_common()), file=sys.stderr)
+    print(f"Tokens: {tokens['context']} context, {tokens['response']} response", file=sys.stderr)
+    if args.output:
+        print(f"Answers written to {os.path.abspath(args.output)}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
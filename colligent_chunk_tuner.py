@@ -0,0 +1,237 @@
+"""Chunking-parameter tuner.
+
+Sweeps chunk size and overlap against the golden question set, building a
+temporary in-memory index for every candidate in parallel worker processes,
+and keeps the Pareto-best candidates for recall@k versus index size versus
+prompt tokens. It tunes the whole corpus and, separately, each source that
+golden questions point to (a CV and a thesis want very different chunks).
+The chosen settings are written as a chunking profile that DocumentProcessor
+loads in place of CHUNK_SIZE/CHUNK_OVERLAP.
+
+Retrieval is measured the way the chatbot retrieves: dense search when the
+embedding model is installed (keyword search otherwise), reranked if
+ENABLE_RERANKING is on, keeping RETRIEVAL_K chunks.
+
+Usage:
+    python colligent_chunk_tuner.py
+    python colligent_chunk_tuner.py --sizes 400 800 1200 --overlaps 0 0.15 --jobs 4 --dry-run
+"""
+import os
+import json
+import time
+import logging
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+from colligent_config import Config, LOG_LEVELS, configure_cli_logging
+from colligent_document_processor import DocumentProcessor
+from colligent_retrieval_benchmark import (
+    ChunkedCorpus, DENSE_AVAILABLE, METHODS, evaluate_corpus, load_dense_encoder, load_golden_set
+)
+from colligent_reranker import LexicalReranker
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = [300, 500, 750, 1000, 1500, 2000]
+DEFAULT_OVERLAPS = [0.0, 0.1, 0.2]  # Fractions of the chunk size
+ALL_SOURCES = "*"  # Group key of the whole-corpus sweep
+
+# Per-process state set up once by _init_worker
+_worker: Dict[str, Any] = {}
+
+
+def source_stem(source: str) -> str:
+    """A data file name without its extension, so a PDF and its text export tune together"""
+    return os.path.splitext(source)[0]
+
+
+def candidate_grid(sizes: List[int], overlaps: List[float]) -> List[Tuple[int, int]]:
+    """(chunk_size, chunk_overlap) pairs; overlaps below 1 are fractions of the size"""
+    grid = []
+    for size in sizes:
+        for overlap in overlaps:
+            chunk_overlap = int(size * overlap) if overlap < 1 else int(overlap)
+            if 0 <= chunk_overlap < size:
+                grid.append((size, chunk_overlap))
+    return list(dict.fromkeys(grid))
+
+
+def _init_worker(config: Config, golden: List[Dict[str, Any]], retriever: str, log_level: str):
+    configure_cli_logging(log_level)
+    _worker["config"] = config
+    _worker["documents"] = DocumentProcessor(config).load_documents()
+    _worker["golden"] = golden
+    _worker["retriever"] = retriever
+    _worker["encoder"] = load_dense_encoder(config, [retriever])
+    _worker["reranker"] = LexicalReranker(
+        cross_encoder_model=getattr(config, "RERANK_CROSS_ENCODER_MODEL", ""),
+        latency_budget_ms=getattr(config, "RERANK_LATENCY_BUDGET_MS", 150),
+    )
+
+
+def questions_for(golden: List[Dict[str, Any]], group: str) -> List[Dict[str, Any]]:
+    if group == ALL_SOURCES:
+        return golden
+    return [item for item in golden if group in item.get("sources", [])]
+
+
+def _evaluate(task: Tuple[str, int, int, int, bool]) -> Dict[str, Any]:
+    """Index one source group with one chunking and score it on that group's golden questions"""
+    group, chunk_size, chunk_overlap, k, rerank = task
+    config = _worker["config"]
+    documents = [doc for doc in _worker["documents"]
+                 if group == ALL_SOURCES or source_stem(doc.metadata.get("source", "")) == group]
+    start = time.perf_counter()
+    corpus = ChunkedCorpus(config, documents, chunk_size, chunk_overlap, _worker["encoder"])
+    build_seconds = time.perf_counter() - start
+
+    questions = questions_for(_worker["golden"], group)
+    row = evaluate_corpus(corpus, questions, [_worker["retriever"]], [k], [rerank],
+                          _worker["reranker"], getattr(config, "RERANK_CANDIDATES", 50))[0]
+    index_bytes = sum(len(chunk.page_content.encode("utf-8")) for chunk in corpus.chunks)
+    if corpus.embeddings is not None:
+        index_bytes += corpus.embeddings.astype("float32").nbytes
+    row.update({
+        "group": group,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "questions": len(questions),
+        "index_kb": index_bytes / 1024,
+        "build_seconds": build_seconds,
+    })
+    return row
+
+
+def dominates(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    """a is at least as good as b on recall, index size and prompt tokens, and better on one"""
+    at_least = (a["recall@k"] >= b["recall@k"] and a["index_kb"] <= b["index_kb"]
+                and a["context_tokens"] <= b["context_tokens"])
+    better = (a["recall@k"] > b["recall@k"] or a["index_kb"] < b["index_kb"]
+              or a["context_tokens"] < b["context_tokens"])
+    return at_least and better
+
+
+def pareto_front(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [row for row in rows if not any(dominates(other, row) for other in rows)]
+
+
+def choose(front: List[Dict[str, Any]], recall_tolerance: float = 0.0) -> Dict[str, Any]:
+    """The cheapest front member (fewest prompt tokens, then smallest index) within tolerance of the best recall"""
+    best_recall = max(row["recall@k"] for row in front)
+    eligible = [row for row in front if row["recall@k"] >= best_recall - recall_tolerance - 1e-9]
+    return min(eligible, key=lambda row: (row["context_tokens"], row["index_kb"], -row["recall@k"]))
+
+
+def tune(config: Config, golden: List[Dict[str, Any]], grid: List[Tuple[int, int]], retriever: str, k: int,
+         rerank: bool, jobs: int, per_source: bool = True, log_level: str = "WARNING") -> Dict[str, List[Dict[str, Any]]]:
+    """Evaluate every candidate for the whole corpus and each golden-set source; return rows by group"""
+    groups = [ALL_SOURCES]
+    if per_source:
+        data_stems = {source_stem(name) for name in os.listdir(config.DATA_FOLDER)}
+        golden_stems = sorted({stem for item in golden for stem in item.get("sources", [])})
+        groups += [stem for stem in golden_stems if stem in data_stems]
+    tasks = [(group, size, overlap, k, rerank) for group in groups for size, overlap in grid]
+
+    # Spawned workers each load the documents and embedding model once
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max(1, jobs), mp_context=context,
+                             initializer=_init_worker, initargs=(config, golden, retriever, log_level)) as pool:
+        rows = list(pool.map(_evaluate, tasks))
+
+    by_group: Dict[str, List[Dict[str, Any]]] = {}
+    for row in rows:
+        by_group.setdefault(row["group"], []).append(row)
+    return by_group
+
+
+def build_profile(by_group: Dict[str, List[Dict[str, Any]]], retriever: str, k: int, rerank: bool,
+                  recall_tolerance: float) -> Dict[str, Any]:
+    """The chunking profile for DocumentProcessor, with the measurements behind each choice"""
+    def entry(row: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "chunk_size": row["chunk_size"],
+            "chunk_overlap": row["chunk_overlap"],
+            "recall_at_k": round(row["recall@k"], 4),
+            "mrr": round(row["mrr"], 4),
+            "context_tokens": round(row["context_tokens"], 1),
+            "index_kb": round(row["index_kb"], 1),
+            "questions": row["questions"],
+        }
+
+    chosen = {group: choose(pareto_front(rows), recall_tolerance) for group, rows in by_group.items()}
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "retriever": retriever,
+        "k": k,
+        "rerank": rerank,
+        "recall_tolerance": recall_tolerance,
+        "default": entry(chosen[ALL_SOURCES]),
+        "sources": {group: entry(row) for group, row in chosen.items() if group != ALL_SOURCES},
+    }
+
+
+def print_group(group: str, rows: List[Dict[str, Any]], chosen: Dict[str, Any]):
+    front = pareto_front(rows)
+    label = "whole corpus" if group == ALL_SOURCES else group
+    print(f"\n{label} ({rows[0]['questions']} questions)")
+    print(f"  {'size':>6} {'overlap':>7} {'chunks':>6} {'recall@k':>8} {'mrr':>6} {'tokens':>8} {'index kb':>9} {'build s':>7}")
+    for row in sorted(rows, key=lambda r: (r["chunk_size"], r["chunk_overlap"])):
+        marker = ">" if row is chosen else ("*" if row in front else " ")
+        print(f"{marker} {row['chunk_size']:>6} {row['chunk_overlap']:>7} {row['chunks']:>6} {row['recall@k']:>8.3f} "
+              f"{row['mrr']:>6.3f} {row['context_tokens']:>8.1f} {row['index_kb']:>9.1f} {row['build_seconds']:>7.2f}")
+
+
+def main():
+    config = Config()
+    parser = argparse.ArgumentParser(description="Tune chunk size and overlap against the golden question set")
+    parser.add_argument("--golden", default=config.GOLDEN_QUESTIONS_PATH)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--overlaps", type=float, nargs="+", default=DEFAULT_OVERLAPS,
+                        help="Overlaps as fractions of the chunk size (below 1) or in characters")
+    parser.add_argument("--retriever", choices=METHODS, default="dense" if DENSE_AVAILABLE else "keyword")
+    parser.add_argument("--k", type=int, default=config.RETRIEVAL_K)
+    parser.add_argument("--rerank", choices=("on", "off"), default="on" if config.ENABLE_RERANKING else "off")
+    parser.add_argument("--recall-tolerance", type=float, default=0.0,
+                        help="Recall the choice may give up for fewer prompt tokens")
+    parser.add_argument("--whole-corpus-only", action="store_true", help="Do not tune sources separately")
+    parser.add_argument("--jobs", type=int, default=min(os.cpu_count() or 1, 4), help="Parallel worker processes")
+    parser.add_argument("--output", default=config.CHUNKING_PROFILE_PATH, help="Where to write the profile")
+    parser.add_argument("--dry-run", action="store_true", help="Print the results without writing the profile")
+    parser.add_argument("--log-level", choices=LOG_LEVELS, default="WARNING")
+    args = parser.parse_args()
+
+    configure_cli_logging(args.log_level)
+    try:
+        golden = load_golden_set(args.golden)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    grid = candidate_grid(args.sizes, args.overlaps)
+    if not grid:
+        parser.error("No valid size/overlap candidates")
+    if args.retriever in ("dense", "hybrid") and not DENSE_AVAILABLE:
+        parser.error(f"The {args.retriever} retriever needs sentence-transformers")
+
+    rerank = args.rerank == "on"
+    start = time.perf_counter()
+    by_group = tune(config, golden, grid, args.retriever, args.k, rerank, args.jobs, not args.whole_corpus_only,
+                    args.log_level)
+    profile = build_profile(by_group, args.retriever, args.k, rerank, args.recall_tolerance)
+    print(f"{len(grid)} candidates x {len(by_group)} groups in {time.perf_counter() - start:.1f}s "
+          f"({args.retriever}, rerank {args.rerank}, k={args.k}); * Pareto front, > chosen")
+    for group, rows in by_group.items():
+        chosen = choose(pareto_front(rows), args.recall_tolerance)
+        print_group(group, rows, chosen)
+
+    if args.dry_run:
+        print("\n" + json.dumps(profile, indent=2))
+        return
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=2)
+    print(f"\nWrote chunking profile to {args.output}; rebuild the knowledge base to apply it")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import os
+import logging
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -10,24 +11,109 @@ class Config:
     # OpenAI API Configuration
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
     OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+    OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "")  # e.g. the local stub server in colligent_llm_stub.py
+    
+    # LLM Client (shared connection pool, retries and hedging)
+    LLM_TIMEOUT_SECONDS = 30
+    LLM_MAX_CONNECTIONS = 20
+    LLM_MAX_CLIENTS = 64           # Clients kept for distinct API keys/settings, least recently used evicted
+    LLM_MAX_RETRIES = 2
+    LLM_RETRY_BASE_DELAY = 0.5     # Backoff doubles per retry, with full jitter
+    LLM_RETRY_MAX_DELAY = 8.0
+    LLM_RETRY_DEADLINE_SECONDS = 30.0  # No retry starts (Retry-After included) past this many seconds
+    ENABLE_HEDGED_REQUESTS = os.getenv("ENABLE_HEDGED_REQUESTS", "false").lower() == "true"
+    LLM_HEDGE_MIN_SAMPLES = 20     # Latencies observed before hedging at p95
     
     # Vector Database Configuration
     VECTOR_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "vector_db")
     CHUNK_SIZE = 1000
     CHUNK_OVERLAP = 200
+    # Per-source chunk sizes written by colligent_chunk_tuner.py; overrides the two above when present
+    CHUNKING_PROFILE_PATH = os.getenv("CHUNKING_PROFILE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "chunking_profile.json"))
     
     # Document Processing
     DATA_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
     SUPPORTED_FORMATS = [".pdf", ".txt", ".docx"]
+    # Questions with their supporting passages in data/, for the retrieval benchmarks (kept outside data/ so it is not indexed)
+    GOLDEN_QUESTIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden_questions.jsonl")
     
     # Chatbot Configuration
     MAX_TOKENS = 1500
     TEMPERATURE = 0.7
     
+    # Retrieval Configuration
+    RETRIEVAL_K = 3                # Chunks that reach the prompt per question
+    FALLBACK_RETRIEVAL_K = 5       # Without an LLM there is no prompt to shrink; keyword extraction wants more
+    ENABLE_RERANKING = True
+    RERANK_CANDIDATES = 50         # Over-fetched from the vector store, then reranked down to RETRIEVAL_K
+    RERANK_CROSS_ENCODER_MODEL = os.getenv("RERANK_CROSS_ENCODER_MODEL", "")  # e.g. cross-encoder/ms-marco-MiniLM-L-6-v2
+    RERANK_LATENCY_BUDGET_MS = 150 # Cross-encoder pairs scored per question are capped to fit this
+    CONTEXT_TOKEN_BUDGET = 1200    # Max prompt tokens spent on retrieved context
+    MIN_RELEVANCE_SCORE = 0.0      # Chunks scoring below this never reach the prompt
+    
+    # Conversation Memory (per session)
+    CONVERSATION_MAX_TURNS = 20            # Older turns are folded into a rolling summary
+    CONVERSATION_MAX_BYTES = 64 * 1024
+    CONVERSATION_SUMMARY_MAX_CHARS = 1500
+    CHAT_VISIBLE_TURNS = 10                # Newest turns shown; older ones load a page at a time on request
+    
+    # Answer Cache (shared by all sessions in the process)
+    ENABLE_ANSWER_CACHE = True
+    ANSWER_CACHE_MAX_ENTRIES = 256
+    ANSWER_CACHE_TTL_SECONDS = 3600
+    # Reuses answers for similar questions (e.g. 0.92); also for near-duplicates that differ in meaning,
+    # such as "what did your thesis find" and "what did your thesis not find". 0 disables the semantic tier
+    ANSWER_CACHE_SEMANTIC_THRESHOLD = float(os.getenv("ANSWER_CACHE_SEMANTIC_THRESHOLD", "0"))
+    ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", "")  # Empty keeps the cache in memory only
+    ANSWER_CACHE_SAVE_DELAY_SECONDS = 5  # Changes are written in the background at most this often
+    
+    # Quick Questions shown in the web app, precomputed in every mode after the KB loads
+    QUICK_QUESTIONS = [
+        "What kind of engineer am I?",
+        "What are my strongest technical skills?",
+        "What projects am I most proud of?",
+        "What kind of tasks energize or drain me?",
+        "How do I collaborate best with others?",
+        "Where do I need to grow?",
+    ]
+    ENABLE_QUICK_QUESTION_WARMUP = True
+    
+    # Request Coalescing (identical questions in flight share one answer)
+    ENABLE_REQUEST_COALESCING = True
+    COALESCE_WAIT_TIMEOUT_SECONDS = 60  # Followers compute on their own after this
+    
+    # Metrics (per-stage latency histograms; METRICS_PORT serves Prometheus text at /metrics)
+    ENABLE_METRICS = True
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # 0 disables the endpoint
+    
+    # Profiling (collapsed-stack files, viewable in the debug section)
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))  # Fraction of requests profiled automatically
+    PROFILE_INTERVAL_MS = 5
+    PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles")
+    PROFILE_MAX_FILES = 50
+    
+    # Headless HTTP API (python colligent_api.py)
+    API_HOST = os.getenv("API_HOST", "127.0.0.1")
+    API_PORT = int(os.getenv("API_PORT", "8000"))
+    API_MAX_CONCURRENCY = int(os.getenv("API_MAX_CONCURRENCY", "8"))  # Questions answered at once
+    API_QUEUE_TIMEOUT_SECONDS = 10  # How long a question waits for a free slot before a 503
+    API_CORS_ORIGINS = os.getenv("API_CORS_ORIGINS", "*")  # Comma-separated origins allowed to call the API
+    
+    # Multi-process serving (python colligent_workers.py serve)
+    WORKER_COUNT = int(os.getenv("WORKER_COUNT", str(os.cpu_count() or 1)))  # API worker processes
+    WORKER_RESTART_DELAY_SECONDS = 1  # Pause before replacing a worker that died
+    EMBEDDING_SERVICE_PORT = int(os.getenv("EMBEDDING_SERVICE_PORT", "8766"))  # Shared query-embedding service
+    
     # Security Configuration
     ENABLE_RATE_LIMITING = True
     MAX_REQUESTS_PER_MINUTE = 20  # Reduced for better security
+    RATE_LIMIT_CACHE_MULTIPLIER = 5  # Cached answers cost no LLM calls, so allow more of them
+    RATE_LIMIT_DB_PATH = os.getenv("RATE_LIMIT_DB_PATH", "")  # SQLite file shared by worker processes; empty limits per process
+    RATE_LIMIT_PRUNE_EVERY = 1000  # Checks between sweeps of idle client buckets
+    # Proxy IPs/CIDRs whose X-Forwarded-For is believed; empty ignores the header (clients can forge it)
+    TRUSTED_PROXIES = os.getenv("TRUSTED_PROXIES", "")
     SESSION_TIMEOUT_MINUTES = 30   # Shorter timeout
+    SESSION_REAP_INTERVAL_SECONDS = 60  # How often idle sessions are looked for and freed
     ENABLE_INPUT_VALIDATION = True
     MAX_INPUT_LENGTH = 500         # Reduced for security
     ENABLE_AUTHENTICATION = False  # Disabled for cloud deployment
@@ -38,6 +124,10 @@ class Config:
     # Embedding Model
     EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
     
+    # Embedding dimensionality reduction (0 keeps the native 384-d vectors)
+    EMBEDDING_DIMENSION = int(os.getenv("EMBEDDING_DIMENSION", "0"))
+    EMBEDDING_PROJECTION = os.getenv("EMBEDDING_PROJECTION", "pca")  # "pca" or "truncate"
+    
     # System Prompt
     SYSTEM_PROMPT = """You are Collins Maripane's personal AI assistant. You speak in Collins' voice and refer to the materials as Collins' own documents and experiences. 
 
@@ -49,3 +139,18 @@ class Config:
     - If the context doesn't contain enough information to answer the question, respond with: "I do not have available information yet."
     - Be concise but thorough in your responses
     - Maintain Collins' professional yet approachable tone"""
+
+
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR")
+
+
+def configure_cli_logging(level="WARNING"):
+    """Set the log level of a command-line tool.
+
+    The chatbot modules call logging.basicConfig(level=INFO) on import, which
+    also resets the root level when they are imported after the tool set it.
+    Installing the root handler first makes those calls no-ops, whatever the
+    import order.
+    """
+    logging.basicConfig(level=level)
+    logging.getLogger().setLevel(level)
@@ -1,7 +1,15 @@
 import os
+import copy
+import json
+import asyncio
+import functools
+import contextvars
+import time
+from dataclasses import replace
+import hashlib
 import logging
 import sys
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, AsyncIterator, Generator, Tuple, Set
 
 # Add current directory to path for imports
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -13,7 +21,6 @@ logger = logging.getLogger(__name__)
 
 # Try to import LangChain packages, but don't fail if they're missing
 try:
-    from langchain_openai import ChatOpenAI
     from langchain.schema import HumanMessage, AIMessage
     LANGCHAIN_AVAILABLE = True
     logger.info("Successfully imported LangChain packages")
@@ -27,11 +34,6 @@ except ImportError as e:
     class AIMessage:
         def __init__(self, content):
             self.content = content
-    class ChatOpenAI:
-        def __init__(self, *args, **kwargs):
-            pass
-        def __call__(self, messages):
-            return AIMessage(content="LangChain not available - using fallback responses")
 
 # Try to import config, but don't fail if it doesn't work
 try:
@@ -50,7 +52,7 @@ except ImportError as e:
 
 # Try to import document processor, but don't fail if it doesn't work
 try:
-    from colligent_document_processor import DocumentProcessor
+    from colligent_document_processor import DocumentProcessor, load_chunking_profile
     logger.info("Successfully imported DocumentProcessor")
 except ImportError as e:
     logger.warning(f"Failed to import DocumentProcessor: {e}, using fallback")
@@ -61,6 +63,9 @@ except ImportError as e:
         def process_documents(self):
             logger.warning("Using fallback DocumentProcessor")
             return []
+    
+    def load_chunking_profile(path):
+        return {}
 
 # Try to import vector store, but don't fail if it doesn't work
 try:
@@ -74,39 +79,174 @@ except ImportError as e:
             self.config = config
         def load_vector_store(self):
             return None
-        def create_vector_store(self, documents):
+        def create_vector_store(self, documents, on_progress=None):
             return None
-        def search_similar(self, query, k=5):
+        def search_similar(self, query, k=5, query_embedding=None):
+            return []
+        def search_with_scores(self, query, k=5, query_embedding=None):
             return []
+        def embed_query(self, query):
+            return None
+        def estimate_bytes(self):
+            return 0
+
+from colligent_tokens import pack_chunks, get_effective_budget
+from colligent_retrieval import RetrievedContext, context_header
+from colligent_memory import ConversationMemory
+from colligent_keyword_matcher import KeywordAutomaton
+from colligent_modes import MODE_DESCRIPTIONS, transform_response, render_all_modes
+from colligent_single_flight import get_single_flight, make_flight_key
+from colligent_llm_client import get_llm_client_manager
+from colligent_reranker import get_reranker
+from colligent_metrics import METRICS, stage, observe, traced, current_trace
+from colligent_profiler import profiled, get_profile_store
+from colligent_rate_limiter import get_rate_limiter
+from colligent_tokens import count_tokens
+
+# Try to import the shared answer cache, but don't fail if it doesn't work
+try:
+    from colligent_answer_cache import get_answer_cache
+    logger.info("Successfully imported answer cache")
+except ImportError as e:
+    logger.warning(f"Failed to import answer cache: {e}, caching disabled")
+    def get_answer_cache(config):
+        return None
+
+# Fallback response routing: query keywords and their extractors, in priority order
+FALLBACK_ROUTES = [
+    ('engineer', '_extract_engineering_info'),
+    ('technical', '_extract_technical_skills'),
+    ('skills', '_extract_technical_skills'),
+    ('project', '_extract_projects'),
+    ('experience', '_extract_projects'),
+    ('proud', '_extract_projects'),
+    ('culture', '_extract_culture_values'),
+    ('team', '_extract_culture_values'),
+    ('value', '_extract_culture_values'),
+    ('learning', '_extract_learning_approach'),
+    ('debug', '_extract_learning_approach'),
+    ('research', '_extract_research_info'),
+    ('astrophysics', '_extract_research_info'),
+    ('data scientist', '_extract_research_info'),
+    ('background', '_extract_background_info'),
+    ('education', '_extract_background_info'),
+    # Self-reflective patterns
+    ('energize', '_extract_energy_preferences'),
+    ('drain', '_extract_energy_preferences'),
+    ('collaborate', '_extract_collaboration_style'),
+    ('collaboration', '_extract_collaboration_style'),
+    ('teamwork', '_extract_collaboration_style'),
+    ('grow', '_extract_growth_areas'),
+    ('growth', '_extract_growth_areas'),
+    ('improve', '_extract_growth_areas'),
+    ('develop', '_extract_growth_areas'),
+    ('reflection', '_extract_self_reflection'),
+    ('self', '_extract_self_reflection'),
+    ('personal', '_extract_self_reflection')
+]
+
+# Common question words that count as relevant when in both query and context
+QUESTION_PATTERNS = [
+    'what', 'how', 'when', 'where', 'why', 'who', 'which',
+    'experience', 'skills', 'background', 'education', 'work',
+    'project', 'research', 'study', 'degree', 'university'
+]
+
+# Phrases the fallback extractors look for in the retrieved context
+CONTEXT_FEATURE_PHRASES = [
+    '21cm', '21cm cosmology', 'ambition', 'astrophysics', 'collabora', 'collaboration',
+    'collins maripane', 'cosmic structures', 'cosmology', 'curiosity', 'data science',
+    'data scientist', 'diffusion', 'diffusion models', 'hard-working', 'hard-working team player',
+    'innovation', 'machine learning', 'neutral hydrogen', 'precision', 'python', 'research',
+    'team', 'team player', 'theoretical', 'theoretical puzzles', 'universe seeing conditions'
+]
+
+# Built once per process and shared by every chatbot instance
+ROUTING_MATCHER = KeywordAutomaton([keyword for keyword, _ in FALLBACK_ROUTES] + QUESTION_PATTERNS)
+FEATURE_MATCHER = KeywordAutomaton(CONTEXT_FEATURE_PHRASES + QUESTION_PATTERNS)
+
+def compute_index_version(config) -> str:
+    """Fingerprint the documents and settings a vector index is built from; stored with the index"""
+    fingerprint = [
+        getattr(config, 'EMBEDDING_MODEL', None),
+        getattr(config, 'CHUNK_SIZE', None),
+        getattr(config, 'CHUNK_OVERLAP', None),
+        load_chunking_profile(getattr(config, 'CHUNKING_PROFILE_PATH', '')),
+        getattr(config, 'EMBEDDING_DIMENSION', None),
+        getattr(config, 'EMBEDDING_PROJECTION', None),
+    ]
+    data_folder = getattr(config, 'DATA_FOLDER', '')
+    if os.path.isdir(data_folder):
+        for filename in sorted(os.listdir(data_folder)):
+            stat = os.stat(os.path.join(data_folder, filename))
+            fingerprint.append([filename, stat.st_size, int(stat.st_mtime)])
+    digest = hashlib.sha256(json.dumps(fingerprint).encode("utf-8")).hexdigest()
+    return digest[:16]
+
+def compute_kb_version(config) -> str:
+    """Fingerprint the documents and indexing settings behind the knowledge base"""
+    fingerprint = [
+        compute_index_version(config),
+        # Retrieval settings change answers too, so they version the answer cache
+        getattr(config, 'RETRIEVAL_K', None),
+        getattr(config, 'FALLBACK_RETRIEVAL_K', None),
+        getattr(config, 'ENABLE_RERANKING', None),
+        getattr(config, 'RERANK_CROSS_ENCODER_MODEL', None),
+    ]
+    digest = hashlib.sha256(json.dumps(fingerprint).encode("utf-8")).hexdigest()
+    return digest[:16]
 
 class ContextAwareChatbot:
     """Main chatbot class that handles document-based question answering"""
     
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, vector_store=None):
         self.config = config
         self.llm = None
         self.document_processor = DocumentProcessor(config)
-        self.vector_store = VectorStore(config)
-        self.conversation_history = []
+        # Worker processes pass a store that reads a shared index instead of loading their own
+        self.vector_store = vector_store if vector_store is not None else VectorStore(config)
+        self.memory = ConversationMemory(
+            max_turns=getattr(config, 'CONVERSATION_MAX_TURNS', 20),
+            max_bytes=getattr(config, 'CONVERSATION_MAX_BYTES', 64 * 1024),
+            summary_max_chars=getattr(config, 'CONVERSATION_SUMMARY_MAX_CHARS', 1500)
+        )
         self.current_mode = "default"  # Default mode
+        self.answer_cache = get_answer_cache(config)
+        self.single_flight = get_single_flight(config)
+        self.reranker = get_reranker(config)
+        self.kb_version = None
+        self.last_response_path = None  # "llm", "fallback" or "no_context"
         
         # Initialize LLM if API key is available
-        if config.OPENAI_API_KEY:
-            self.llm = ChatOpenAI(
-                model_name=config.OPENAI_MODEL,
-                temperature=config.TEMPERATURE,
-                max_tokens=config.MAX_TOKENS,
-                openai_api_key=config.OPENAI_API_KEY
-            )
-        else:
+        self.llm_manager = get_llm_client_manager(config)
+        self.set_api_key(config.OPENAI_API_KEY)
+    
+    def set_api_key(self, api_key: str):
+        """Switch to the shared LLM client for api_key, keeping the knowledge base and history"""
+        self.llm = self.llm_manager.get_llm(api_key) if api_key else None
+        if not self.llm:
             logger.warning("OpenAI API key not found. Chatbot will use fallback responses.")
     
+    def _compute_kb_version(self) -> str:
+        return compute_kb_version(self.config)
+    
+    def swap_vector_store(self, vector_store, kb_version: str):
+        """Switch to a freshly built knowledge base; questions in flight finish on the old one"""
+        self.vector_store = vector_store
+        self.kb_version = kb_version
+    
+    @profiled("initialize_knowledge_base")
     def initialize_knowledge_base(self, force_rebuild: bool = False) -> bool:
         """Initialize the knowledge base from documents"""
         try:
-            # Try to load existing vector store
+            self.kb_version = self._compute_kb_version()
+            index_version = compute_index_version(self.config)
+            if force_rebuild and self.answer_cache:
+                self.answer_cache.invalidate()
+            
+            # Try to load existing vector store; one built from other documents or settings is rebuilt
             if not force_rebuild:
-                existing_store = self.vector_store.load_vector_store()
+                existing_store = self.vector_store.load_vector_store(index_version=index_version)
                 if existing_store:
                     logger.info("Using existing knowledge base")
                     return True
@@ -131,7 +271,7 @@ class ContextAwareChatbot:
             
             # Create vector store with enhanced error handling
             logger.info(f"Attempting to create vector store with {len(documents)} documents")
-            vector_store_success = self.vector_store.create_vector_store(documents)
+            vector_store_success = self.vector_store.create_vector_store(documents, index_version=index_version)
             
             if vector_store_success:
                 logger.info("Knowledge base initialized successfully")
@@ -153,27 +293,67 @@ class ContextAwareChatbot:
             logger.error(f"Full traceback: {traceback.format_exc()}")
             return False
     
-    def get_relevant_context(self, query: str, k: int = 5) -> str:
-        """Get relevant context from documents based on query"""
+    def retrieve(self, query: str, k: Optional[int] = None,
+                 query_embedding: Optional[List[float]] = None) -> RetrievedContext:
+        """Retrieve the most relevant chunks, packed into the context token budget"""
         try:
-            # Search for similar documents
-            similar_docs = self.vector_store.search_similar(query, k=k)
+            # Search for similar chunks, over-fetching when a reranker picks the best k
+            if not k:
+                k = getattr(self.config, 'RETRIEVAL_K', 3) if self.llm else getattr(self.config, 'FALLBACK_RETRIEVAL_K', 5)
+            fetch_k = max(k, getattr(self.config, 'RERANK_CANDIDATES', 50)) if self.reranker else k
+            with stage("search"):
+                results = self.vector_store.search_with_scores(query, k=fetch_k, query_embedding=query_embedding)
+            
+            # Keep chunks in rank order, dropping weak matches and duplicates
+            # such as the PDF and text copies of the same document
+            min_score = getattr(self.config, 'MIN_RELEVANCE_SCORE', 0.0)
+            ranked = []
+            seen = set()
+            for result in results:
+                fingerprint = " ".join(result.text.split()).lower()
+                if result.score < min_score or fingerprint in seen:
+                    continue
+                seen.add(fingerprint)
+                ranked.append(result)
             
-            if not similar_docs:
-                return "No relevant information found in the documents."
+            if not ranked:
+                return RetrievedContext()
             
-            # Combine relevant context
-            context_parts = []
-            for i, doc in enumerate(similar_docs, 1):
-                source = doc.metadata.get('source', 'Unknown')
-                content = doc.page_content.strip()
-                context_parts.append(f"Source {i} ({source}):\n{content}\n")
+            if self.reranker:
+                with stage("rerank"):
+                    ranked = self.reranker.rerank(query, ranked, k)
+            else:
+                ranked = ranked[:k]
             
-            return "\n".join(context_parts)
+            with stage("packing"):
+                model = self.config.OPENAI_MODEL
+                budget = get_effective_budget(
+                    getattr(self.config, 'CONTEXT_TOKEN_BUDGET', 1500), model, self.config.MAX_TOKENS, query=query
+                )
+                packed, tokens_used = pack_chunks(
+                    [(context_header(rank, result.source), result.text) for rank, result in enumerate(ranked, 1)],
+                    budget, model
+                )
+                # The last packed chunk may have been trimmed to fit
+                selected = [
+                    replace(result, text=text, end=result.start + len(text) if result.start is not None else result.end)
+                    for result, (_, text) in zip(ranked, packed)
+                ]
+            logger.info(f"Packed {len(selected)} of {len(results)} chunks into {tokens_used}/{budget} context tokens")
+            return RetrievedContext(results=selected, tokens=tokens_used)
             
         except Exception as e:
             logger.error(f"Error getting relevant context: {str(e)}")
+            return RetrievedContext(error=str(e))
+    
+    def get_relevant_context(self, query: str, k: Optional[int] = None, query_embedding: Optional[List[float]] = None) -> str:
+        """Get relevant context from documents based on query, formatted for a prompt"""
+        retrieved = self.retrieve(query, k=k, query_embedding=query_embedding)
+        if retrieved.error:
             return "Error retrieving relevant information."
+        if not retrieved:
+            return "No relevant information found in the documents."
+        return retrieved.format_for_prompt()
     
     def create_prompt(self, query: str, context: str) -> str:
         """Create a prompt for the LLM with context and query"""
@@ -190,90 +370,96 @@ Please answer the question based on the provided context. If the context doesn't
 Answer:"""
         return prompt_template
     
-    def get_llm_response(self, query: str, context: str) -> str:
+    def get_llm_response(self, query: str, context: RetrievedContext) -> str:
         """Get response from LLM"""
+        response, self.last_response_path = self._generate_response(query, context)
+        return response
+    
+    def _generate_response(self, query: str, context: RetrievedContext) -> Tuple[str, str]:
+        """Answer from the LLM or the fallback engine, returning (response, path)"""
         # Check if context is insufficient first
-        if not context or context == "No relevant information found in the documents." or context == "Error retrieving relevant information.":
-            return "I do not have available information yet."
+        if not context:
+            return "I do not have available information yet.", "no_context"
         
         if not self.llm:
-            return self.get_fallback_response(query, context)
+            return self.get_fallback_response(query, context.plain_text), "fallback"
         
         try:
-            prompt = self.create_prompt(query, context)
-            messages = [
-                HumanMessage(content=f"Context:\n{context}\n\nQuestion: {query}")
-            ]
-            
-            response = self.llm.invoke(messages)
-            return response.content
+            response = self.llm.invoke(self._build_messages(query, context))
+            return response.content, "llm"
             
         except Exception as e:
             logger.error(f"Error getting LLM response: {str(e)}")
-            return self.get_fallback_response(query, context)
+            return self.get_fallback_response(query, context.plain_text), "fallback"
+    
+    def get_llm_response_stream(self, query: str, context: RetrievedContext) -> Generator[str, None, str]:
+        """Stream the response from the LLM token by token, returning this answer's response path.
+        
+        Streams on one chatbot run concurrently, so the path is the generator's
+        return value rather than state on the instance.
+        """
+        # Check if context is insufficient first
+        if not context:
+            yield "I do not have available information yet."
+            return "no_context"
+        
+        if not self.llm:
+            yield self.get_fallback_response(query, context.plain_text)
+            return "fallback"
+        
+        streamed_any = False
+        try:
+            for chunk in self.llm.stream(self._build_messages(query, context)):
+                if chunk.content:
+                    streamed_any = True
+                    yield chunk.content
+            return "llm"
+            
+        except Exception as e:
+            logger.error(f"Error streaming LLM response: {str(e)}")
+            # Once tokens are on screen we cannot swap in a different answer
+            if not streamed_any:
+                yield self.get_fallback_response(query, context.plain_text)
+                return "fallback"
+            return "llm_partial"
+    
+    def _build_messages(self, query: str, context: RetrievedContext) -> List[Any]:
+        """Build the chat messages sent to the LLM; the only place context is formatted"""
+        return [
+            HumanMessage(content=f"Context:\n{context.format_for_prompt()}\n\nQuestion: {query}")
+        ]
     
     def get_fallback_response(self, query: str, context: str) -> str:
         """Fallback response when LLM is not available"""
         if not context or context == "No relevant information found in the documents.":
             return "I do not have available information yet."
         
-        # Extract key information from context
-        query_lower = query.lower()
-        context_lower = context.lower()
-        
-        # Define question patterns and their response strategies
-        response_patterns = {
-            'engineer': self._extract_engineering_info,
-            'technical': self._extract_technical_skills,
-            'skills': self._extract_technical_skills,
-            'project': self._extract_projects,
-            'experience': self._extract_projects,
-            'proud': self._extract_projects,
-            'culture': self._extract_culture_values,
-            'team': self._extract_culture_values,
-            'value': self._extract_culture_values,
-            'learning': self._extract_learning_approach,
-            'debug': self._extract_learning_approach,
-            'research': self._extract_research_info,
-            'astrophysics': self._extract_research_info,
-            'data scientist': self._extract_research_info,
-            'background': self._extract_background_info,
-            'education': self._extract_background_info,
-            # Self-reflective patterns
-            'energize': self._extract_energy_preferences,
-            'drain': self._extract_energy_preferences,
-            'collaborate': self._extract_collaboration_style,
-            'collaboration': self._extract_collaboration_style,
-            'teamwork': self._extract_collaboration_style,
-            'grow': self._extract_growth_areas,
-            'growth': self._extract_growth_areas,
-            'improve': self._extract_growth_areas,
-            'develop': self._extract_growth_areas,
-            'reflection': self._extract_self_reflection,
-            'self': self._extract_self_reflection,
-            'personal': self._extract_self_reflection
-        }
+        # Extract key information from context: one pass over the query for
+        # routing keywords and one pass over the context for feature phrases
+        query_keywords = ROUTING_MATCHER.find_all(query)
+        features = FEATURE_MATCHER.find_all(context)
         
-        # Find the best matching pattern
-        for keyword, response_func in response_patterns.items():
-            if keyword in query_lower:
-                response = response_func(context)
+        # Find the best matching pattern, in priority order
+        for keyword, extractor_name in FALLBACK_ROUTES:
+            if keyword in query_keywords:
+                response = getattr(self, extractor_name)(context, features)
                 if response:
                     return response
         
         # If no specific pattern matches, provide a general response
-        general_response = self._extract_general_info(context, query)
+        general_response = self._extract_general_info(context, query, features)
         if general_response == "I do not have available information yet.":
             return general_response
         
         # If we have some general info but it's not specific to the query, 
         # check if the context actually contains relevant information
-        if not self._context_contains_relevant_info(context, query):
+        if not self._context_contains_relevant_info(context, query, features, query_keywords):
             return "I do not have available information yet."
         
         return general_response
     
-    def _context_contains_relevant_info(self, context: str, query: str) -> bool:
+    def _context_contains_relevant_info(self, context: str, query: str, features: Optional[Set[str]] = None,
+                                        query_keywords: Optional[Set[str]] = None) -> bool:
         """Check if the context contains information relevant to the query"""
         if not context or context == "No relevant information found in the documents.":
             return False
@@ -291,108 +477,113 @@ Answer:"""
                 return True
         
         # Check for common question patterns
-        question_patterns = [
-            'what', 'how', 'when', 'where', 'why', 'who', 'which',
-            'experience', 'skills', 'background', 'education', 'work',
-            'project', 'research', 'study', 'degree', 'university'
-        ]
-        
-        for pattern in question_patterns:
-            if pattern in query_lower and pattern in context_lower:
-                return True
+        features = self._context_features(context, features)
+        if query_keywords is None:
+            query_keywords = ROUTING_MATCHER.find_all(query)
         
-        return False
+        return any(pattern in query_keywords and pattern in features for pattern in QUESTION_PATTERNS)
     
-    def _extract_engineering_info(self, context: str) -> str:
+    def _context_features(self, context: str, features: Optional[Set[str]] = None) -> Set[str]:
+        """Feature phrases present in the context, matched once per context"""
+        if features is None:
+            features = FEATURE_MATCHER.find_all(context)
+        return features
+    
+    def _extract_engineering_info(self, context: str, features: Optional[Set[str]] = None) -> str:
         """Extract engineering background information"""
-        if 'data scientist' in context.lower() or 'astrophysics' in context.lower():
+        features = self._context_features(context, features)
+        if 'data scientist' in features or 'astrophysics' in features:
             return "I'm a Data Scientist and Astrophysics Researcher. I work at the intersection of machine learning and cosmology, specializing in predicting universe seeing conditions, emulating cosmic structures with AI, and solving theoretical puzzles in astrophysics."
         return None
     
-    def _extract_technical_skills(self, context: str) -> str:
+    def _extract_technical_skills(self, context: str, features: Optional[Set[str]] = None) -> str:
         """Extract technical skills information"""
+        features = self._context_features(context, features)
         skills = []
-        context_lower = context.lower()
         
         # Look for technical skills in the context
-        if 'machine learning' in context_lower:
+        if 'machine learning' in features:
             skills.append("Machine Learning")
-        if 'python' in context_lower:
+        if 'python' in features:
             skills.append("Python")
-        if 'data science' in context_lower:
+        if 'data science' in features:
             skills.append("Data Science")
-        if 'astrophysics' in context_lower:
+        if 'astrophysics' in features:
             skills.append("Astrophysics")
-        if 'cosmology' in context_lower:
+        if 'cosmology' in features:
             skills.append("Cosmology")
-        if 'diffusion' in context_lower:
+        if 'diffusion' in features:
             skills.append("Diffusion Models")
-        if '21cm' in context_lower:
+        if '21cm' in features:
             skills.append("21cm Cosmology")
-        if 'neutral hydrogen' in context_lower:
+        if 'neutral hydrogen' in features:
             skills.append("Neutral Hydrogen Analysis")
         
         if skills:
             return f"My strongest technical skills include: {', '.join(skills)}. I specialize in applying machine learning to astrophysical problems, particularly in cosmology and neutral hydrogen analysis."
         return None
     
-    def _extract_projects(self, context: str) -> str:
+    def _extract_projects(self, context: str, features: Optional[Set[str]] = None) -> str:
         """Extract project and experience information"""
+        features = self._context_features(context, features)
         projects = []
-        context_lower = context.lower()
         
-        if 'diffusion models' in context_lower:
+        if 'diffusion models' in features:
             projects.append("Research on Diffusion Models for Emulating Neutral Hydrogen Maps")
-        if '21cm cosmology' in context_lower:
+        if '21cm cosmology' in features:
             projects.append("21cm Cosmology research")
-        if 'neutral hydrogen' in context_lower:
+        if 'neutral hydrogen' in features:
             projects.append("Neutral Hydrogen analysis and mapping")
-        if 'cosmic structures' in context_lower:
+        if 'cosmic structures' in features:
             projects.append("AI emulation of cosmic structures")
-        if 'universe seeing conditions' in context_lower:
+        if 'universe seeing conditions' in features:
             projects.append("Predicting universe seeing conditions")
         
         if projects:
             return f"I'm most proud of my work in: {', '.join(projects)}. My research focuses on innovative approaches to understanding cosmic evolution through machine learning and astrophysics."
         return None
     
-    def _extract_culture_values(self, context: str) -> str:
+    def _extract_culture_values(self, context: str, features: Optional[Set[str]] = None) -> str:
         """Extract culture and team values"""
-        if 'hard-working team player' in context.lower() or 'collabora' in context.lower():
+        features = self._context_features(context, features)
+        if 'hard-working team player' in features or 'collabora' in features:
             return "I value being a hard-working team player who thrives in collaboration. I'm driven by curiosity and powered by machine learning, pushing boundaries with ambition and precision."
         return None
     
-    def _extract_learning_approach(self, context: str) -> str:
+    def _extract_learning_approach(self, context: str, features: Optional[Set[str]] = None) -> str:
         """Extract learning and debugging approach"""
-        if 'curiosity' in context.lower() or 'theoretical puzzles' in context.lower():
+        features = self._context_features(context, features)
+        if 'curiosity' in features or 'theoretical puzzles' in features:
             return "My approach to learning involves curiosity-driven exploration and solving theoretical puzzles. I push boundaries with ambition and precision, whether it's predicting universe conditions or emulating cosmic structures with AI."
         return None
     
-    def _extract_research_info(self, context: str) -> str:
+    def _extract_research_info(self, context: str, features: Optional[Set[str]] = None) -> str:
         """Extract research information"""
-        if 'diffusion models' in context.lower() and 'neutral hydrogen' in context.lower():
+        features = self._context_features(context, features)
+        if 'diffusion models' in features and 'neutral hydrogen' in features:
             return "My research focuses on Diffusion Models for Emulating Neutral Hydrogen Maps, representing a novel approach to 21cm cosmology. I work on detecting and analyzing neutral hydrogen through its characteristic 21cm emission line to understand cosmic evolution."
         return None
     
-    def _extract_background_info(self, context: str) -> str:
+    def _extract_background_info(self, context: str, features: Optional[Set[str]] = None) -> str:
         """Extract background and education information"""
-        if 'data scientist' in context.lower() and 'astrophysics' in context.lower():
+        features = self._context_features(context, features)
+        if 'data scientist' in features and 'astrophysics' in features:
             return "I'm Collins Maripane, a Data Scientist and Astrophysics Researcher. I'm an aspiring data scientist, astrophysicist, and creative innovator driven by curiosity and powered by machine learning."
         return None
     
-    def _extract_general_info(self, context: str, query: str) -> str:
+    def _extract_general_info(self, context: str, query: str, features: Optional[Set[str]] = None) -> str:
         """Extract general information when no specific pattern matches"""
+        features = self._context_features(context, features)
         # Look for key phrases in the context
         key_phrases = []
-        context_lower = context.lower()
         
-        if 'collins maripane' in context_lower:
+        if 'collins maripane' in features:
             key_phrases.append("Collins Maripane")
-        if 'data scientist' in context_lower:
+        if 'data scientist' in features:
             key_phrases.append("Data Scientist")
-        if 'astrophysics' in context_lower:
+        if 'astrophysics' in features:
             key_phrases.append("Astrophysics Researcher")
-        if 'machine learning' in context_lower:
+        if 'machine learning' in features:
             key_phrases.append("Machine Learning specialist")
         
         if key_phrases:
@@ -401,70 +592,446 @@ Answer:"""
         # If no relevant information is found in the context, return the standard response
         return "I do not have available information yet."
     
-    def ask_question(self, query: str, include_context: bool = False) -> Dict[str, Any]:
-        """Main method to ask a question and get a response"""
+    def _lookup_cached_answer(self, query: str, query_embedding: Optional[List[float]] = None):
+        """Check the shared cache, returning (cached result or None, query embedding)"""
+        if not self.answer_cache:
+            return None, query_embedding
+        with stage("cache_lookup"):
+            if self.answer_cache.semantic_enabled and query_embedding is None:
+                with stage("embedding"):
+                    query_embedding = self.vector_store.embed_query(query)
+            cached = self.answer_cache.get(query, self.current_mode, self.kb_version, query_embedding)
+        if cached and cached.get("path") == "fallback" and self.llm:
+            # Precomputed without an API key; the LLM can now do better
+            cached = None
+        if cached:
+            cached = dict(cached, path="cache")
+        return cached, query_embedding
+    
+    def _finalize_answer(self, query: str, context: RetrievedContext, response: str, response_path: str,
+                         query_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
+        """Apply the mode transformation and cache the answer"""
+        # Apply Power Agent mode transformation
+        with stage("mode_transform"):
+            transformed_response = self.apply_mode_transformation(response)
+        answer = {
+            "response": transformed_response,
+            "base_response": response,
+            "sources": context.sources,
+            "retrieved": context,
+            "context_tokens": context.tokens,
+            "path": response_path
+        }
+        
+        # Only LLM answers are worth caching; fallback answers are computed locally
+        if self.answer_cache and response_path == "llm":
+            with stage("cache_store"):
+                self.answer_cache.put(query, self.current_mode, self.kb_version,
+                                      dict(answer, retrieved=context.to_dict()), query_embedding)
+        return answer
+    
+    def needs_llm(self, query: str) -> bool:
+        """Whether answering would call the LLM, judged from the exact cache tier without side effects"""
+        if not self.llm:
+            return False
+        if not self.answer_cache or not self.kb_version:
+            return True
+        cached = self.answer_cache.peek(query, self.current_mode, self.kb_version)
+        return not cached or cached.get("path") == "fallback"
+
+    def _flight_key(self, query: str) -> str:
+        llm_identity = getattr(self.llm, "identity", None) if self.llm else None
+        return make_flight_key(query, self.current_mode, self.kb_version, llm_identity)
+    
+    def _compute_answer(self, query: str, query_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
+        """Answer a question from the cache, or by retrieval and generation"""
+        answer, query_embedding = self._lookup_cached_answer(query, query_embedding)
+        if answer:
+            return answer
+        
+        # Get relevant context
+        context = self.retrieve(query, query_embedding=query_embedding)
+        
+        # Get LLM response
+        with stage("generation"):
+            response, response_path = self._generate_response(query, context)
+        return self._finalize_answer(query, context, response, response_path, query_embedding)
+    
+    async def _acompute_answer(self, query: str) -> Dict[str, Any]:
+        """Asyncio counterpart of _compute_answer"""
+        answer, query_embedding = await self._run_in_executor(self._lookup_cached_answer, query)
+        if answer:
+            return answer
+        
+        context = await self._run_in_executor(self.retrieve, query, query_embedding=query_embedding)
+        with stage("generation"):
+            response, response_path = await self._agenerate_response(query, context)
+        return await self._run_in_executor(
+            self._finalize_answer, query, context, response, response_path, query_embedding
+        )
+    
+    def _run_in_executor(self, fn, *args, **kwargs):
+        """Run blocking work in the default executor, keeping the request trace"""
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(None, functools.partial(contextvars.copy_context().run, fn, *args, **kwargs))
+    
+    def precompute_answers(self, query: str) -> str:
+        """Answer a question once and cache it rendered in every mode, returning the response path"""
+        if self.answer_cache is None or not self.kb_version:
+            return "no_cache"
+        query_embedding = None
+        if self.answer_cache.semantic_enabled:
+            query_embedding = self.vector_store.embed_query(query)
+        context = self.retrieve(query, query_embedding=query_embedding)
+        with stage("generation"):
+            response, response_path = self._generate_response(query, context)
+        if response_path not in ("llm", "fallback"):
+            return response_path
+        
+        stored = {
+            "base_response": response,
+            "sources": context.sources,
+            "retrieved": context.to_dict(),
+            "context_tokens": context.tokens,
+            "path": response_path
+        }
+        for mode, rendered in render_all_modes(response).items():
+            self.answer_cache.put(query, mode, self.kb_version, dict(stored, response=rendered), query_embedding)
+        return response_path
+    
+    def _build_result(self, query: str, answer: Dict[str, Any], include_context: bool) -> Dict[str, Any]:
+        """Record the answer in the conversation history and shape the result"""
+        self.last_response_path = answer.get("path")
+        
+        trace = current_trace()
+        if trace is not None:
+            trace.path = answer.get("path")
+            trace.coalesced = answer.get("coalesced", False)
+            trace.context_tokens = answer.get("context_tokens", 0)
+            trace.response_tokens = count_tokens(answer["response"], self.config.OPENAI_MODEL)
+        
+        # Store a compact record in the bounded conversation memory
+        self.memory.add_turn(query, answer["response"], answer.get("sources", []), self.current_mode,
+                             answer.get("base_response"))
+        
+        result = {
+            "query": query,
+            "response": answer["response"],
+            "sources": answer.get("sources", []),
+            "cached": answer.get("path") == "cache",
+            "coalesced": answer.get("coalesced", False),
+            "context_tokens": answer.get("context_tokens", 0)
+        }
+        
+        if include_context:
+            retrieved = answer.get("retrieved") or RetrievedContext()
+            if isinstance(retrieved, dict):
+                # Cached answers hold the serialized retrieval results
+                retrieved = RetrievedContext.from_dict(retrieved)
+            result["context"] = retrieved.format_for_prompt()
+            result["results"] = [r.to_dict() for r in retrieved.results]
+        
+        return result
+    
+    @profiled("ask_question")
+    @traced("ask")
+    def ask_question(self, query: str, include_context: bool = False,
+                     query_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
+        """Main method to ask a question and get a response.
+
+        query_embedding may be passed when the caller embedded questions in a batch.
+        """
         try:
-            # Get relevant context
-            context = self.get_relevant_context(query)
-            
-            # Get LLM response
-            response = self.get_llm_response(query, context)
+            if self.single_flight:
+                # Identical questions already in flight share the leader's answer
+                answer, shared = self.single_flight.do(self._flight_key(query), self._compute_answer, query,
+                                                       query_embedding)
+                if shared:
+                    answer = dict(answer, coalesced=True)
+            else:
+                answer = self._compute_answer(query, query_embedding)
             
-            # Apply Power Agent mode transformation
-            transformed_response = self.apply_mode_transformation(response)
+            return self._build_result(query, answer, include_context)
             
-            # Store in conversation history
-            self.conversation_history.append({
+        except Exception as e:
+            logger.error(f"Error processing question: {str(e)}")
+            return {
                 "query": query,
-                "context": context if include_context else None,
-                "response": transformed_response,
-                "timestamp": None  # Could add datetime here
-            })
+                "response": "I do not have available information yet.",
+                "error": str(e)
+            }
+    
+    @profiled("ask_question_stream")
+    @traced("ask_stream")
+    def ask_question_stream(self, query: str, include_context: bool = False) -> Iterator[Dict[str, Any]]:
+        """Streaming variant of ask_question.
+        
+        Yields events as they become available:
+        - {"type": "sources", "sources": [...]} once retrieval is done
+        - {"type": "token", "content": "..."} for each piece of the raw answer
+        - {"type": "done", **result} with the mode-transformed final result
+        """
+        try:
+            answer = None
+            flight = None
+            if self.single_flight:
+                key = self._flight_key(query)
+                future, leader = self.single_flight.join(key)
+                if leader:
+                    flight = (key, future)
+                else:
+                    # Another session is answering the same question; wait for it
+                    answer = self.single_flight.wait(key, future)
+            
+            if answer:
+                answer = dict(answer, coalesced=True)
+                yield {"type": "sources", "sources": answer.get("sources", [])}
+                yield {"type": "token", "content": answer["response"]}
+            else:
+                try:
+                    answer = yield from self._stream_answer(query)
+                except BaseException as e:
+                    if flight:
+                        self.single_flight.complete(*flight, error=e)
+                    raise
+                if flight:
+                    self.single_flight.complete(*flight, result=answer)
+            
+            yield dict(type="done", **self._build_result(query, answer, include_context))
             
-            result = {
+        except Exception as e:
+            logger.error(f"Error streaming question: {str(e)}")
+            yield {
+                "type": "done",
                 "query": query,
-                "response": transformed_response,
-                "sources": self._extract_sources(context)
+                "response": "I do not have available information yet.",
+                "error": str(e)
             }
+    
+    def _stream_answer(self, query: str) -> Iterator[Dict[str, Any]]:
+        """Yield sources and token events for a question, returning the final answer"""
+        answer, query_embedding = self._lookup_cached_answer(query)
+        
+        if answer:
+            yield {"type": "sources", "sources": answer.get("sources", [])}
+            yield {"type": "token", "content": answer["response"]}
+            return answer
+        
+        context = self.retrieve(query, query_embedding=query_embedding)
+        yield {"type": "sources", "sources": context.sources}
+        
+        tokens = []
+        start = time.perf_counter()
+        stream = self.get_llm_response_stream(query, context)
+        with stage("generation"):
+            while True:
+                try:
+                    token = next(stream)
+                except StopIteration as done:
+                    response_path = done.value
+                    break
+                if not tokens:
+                    observe("first_token", time.perf_counter() - start)
+                tokens.append(token)
+                yield {"type": "token", "content": token}
+        return self._finalize_answer(query, context, "".join(tokens), response_path, query_embedding)
+    
+    async def _agenerate_response(self, query: str, context: RetrievedContext) -> Tuple[str, str]:
+        """Async counterpart of get_llm_response, returning (response, path)"""
+        if not context:
+            return "I do not have available information yet.", "no_context"
+        
+        if not self.llm:
+            return self.get_fallback_response(query, context.plain_text), "fallback"
+        
+        try:
+            response = await self.llm.ainvoke(self._build_messages(query, context))
+            return response.content, "llm"
             
-            if include_context:
-                result["context"] = context
+        except Exception as e:
+            logger.error(f"Error getting async LLM response: {str(e)}")
+            return self.get_fallback_response(query, context.plain_text), "fallback"
+    
+    @traced("aask")
+    async def aask_question(self, query: str, include_context: bool = False) -> Dict[str, Any]:
+        """Asyncio-native variant of ask_question.
+        
+        Embedding, search and cache I/O run in the default executor and the LLM
+        is awaited through its async client, so a single event loop can keep many
+        questions in flight.
+        """
+        try:
+            if self.single_flight:
+                answer, shared = await self.single_flight.ado(
+                    self._flight_key(query), lambda: self._acompute_answer(query)
+                )
+                if shared:
+                    answer = dict(answer, coalesced=True)
+            else:
+                answer = await self._acompute_answer(query)
             
-            return result
+            return self._build_result(query, answer, include_context)
             
         except Exception as e:
-            logger.error(f"Error processing question: {str(e)}")
+            logger.error(f"Error processing async question: {str(e)}")
             return {
                 "query": query,
                 "response": "I do not have available information yet.",
                 "error": str(e)
             }
     
-    def _extract_sources(self, context: str) -> List[str]:
-        """Extract source documents from context"""
-        sources = []
-        lines = context.split('\n')
-        for line in lines:
-            if line.startswith('Source') and '(' in line and ')' in line:
-                source = line.split('(')[1].split(')')[0]
-                if source not in sources:
-                    sources.append(source)
-        return sources
-    
-    def get_conversation_history(self) -> List[Dict[str, Any]]:
-        """Get conversation history"""
-        return self.conversation_history
+    @traced("aask_stream")
+    async def aask_question_stream(self, query: str, include_context: bool = False) -> AsyncIterator[Dict[str, Any]]:
+        """Asyncio-native variant of ask_question_stream, yielding the same events"""
+        try:
+            answer = None
+            flight = None
+            if self.single_flight:
+                key = self._flight_key(query)
+                future, leader = self.single_flight.join(key)
+                if leader:
+                    flight = (key, future)
+                else:
+                    answer = await self.single_flight.await_result(key, future)
+            
+            if answer:
+                answer = dict(answer, coalesced=True)
+                yield {"type": "sources", "sources": answer.get("sources", [])}
+                yield {"type": "token", "content": answer["response"]}
+            else:
+                try:
+                    answer, query_embedding = await self._run_in_executor(self._lookup_cached_answer, query)
+                    
+                    if answer:
+                        yield {"type": "sources", "sources": answer.get("sources", [])}
+                        yield {"type": "token", "content": answer["response"]}
+                    else:
+                        context = await self._run_in_executor(self.retrieve, query, query_embedding=query_embedding)
+                        yield {"type": "sources", "sources": context.sources}
+                    
+                        tokens = []
+                        start = time.perf_counter()
+                        if self.llm and context:
+                            response_path = "llm"
+                            try:
+                                async for chunk in self.llm.astream(self._build_messages(query, context)):
+                                    if chunk.content:
+                                        if not tokens:
+                                            observe("first_token", time.perf_counter() - start)
+                                        tokens.append(chunk.content)
+                                        yield {"type": "token", "content": chunk.content}
+                            except Exception as e:
+                                logger.error(f"Error streaming async LLM response: {str(e)}")
+                                # Once tokens are on screen we cannot swap in a different answer
+                                if tokens:
+                                    response_path = "llm_partial"
+                                else:
+                                    response_path = "fallback"
+                                    tokens.append(self.get_fallback_response(query, context.plain_text))
+                                    yield {"type": "token", "content": tokens[0]}
+                        else:
+                            response, response_path = await self._agenerate_response(query, context)
+                            tokens.append(response)
+                            yield {"type": "token", "content": response}
+                        observe("generation", time.perf_counter() - start)
+                    
+                        answer = await self._run_in_executor(
+                            self._finalize_answer, query, context, "".join(tokens), response_path, query_embedding
+                        )
+                except BaseException as e:
+                    if flight:
+                        self.single_flight.complete(*flight, error=e)
+                    raise
+                if flight:
+                    self.single_flight.complete(*flight, result=answer)
+            
+            yield dict(type="done", **self._build_result(query, answer, include_context))
+            
+        except Exception as e:
+            logger.error(f"Error streaming async question: {str(e)}")
+            yield {
+                "type": "done",
+                "query": query,
+                "response": "I do not have available information yet.",
+                "error": str(e)
+            }
+    
+    def fork_session(self, mode: Optional[str] = None) -> "ContextAwareChatbot":
+        """A chatbot sharing this one's knowledge base, LLM and caches, with its own mode and history.
+        
+        Forking is cheap (no model or index is loaded), so a server can answer
+        each request in its own mode from one loaded knowledge base.
+        """
+        if mode is not None and mode not in MODE_DESCRIPTIONS:
+            raise ValueError(f"Unknown mode '{mode}'. Available modes: {', '.join(MODE_DESCRIPTIONS)}")
+        session = copy.copy(self)
+        session.memory = ConversationMemory(
+            max_turns=self.memory.max_turns,
+            max_bytes=self.memory.max_bytes,
+            summary_max_chars=self.memory.summary_max_chars
+        )
+        session.current_mode = mode or self.current_mode
+        session.last_response_path = None
+        return session
+    
+    @property
+    def conversation_history(self) -> List[Dict[str, Any]]:
+        return self.memory.get_history()
+    
+    def get_conversation_history(self, last_n: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Get conversation history, or only its newest last_n turns"""
+        return self.memory.get_history(last_n)
+    
+    def get_conversation_length(self) -> int:
+        """Number of turns kept in the history (folded turns are in the summary)"""
+        return len(self.memory)
+    
+    def get_conversation_summary(self) -> str:
+        """Get the rolling summary of turns folded out of the history"""
+        return self.memory.summary
     
     def clear_conversation_history(self):
         """Clear conversation history"""
-        self.conversation_history = []
+        self.memory.clear()
+    
+    def release(self) -> int:
+        """Free this session's history before the chatbot is dropped; return approximate bytes freed.
+        
+        Shared objects (answer cache, LLM client, reranker) are left alone; the
+        session's own vector store and embedding model are freed once the last
+        reference to the chatbot goes.
+        """
+        freed = self.memory.size_bytes()
+        if not getattr(self.vector_store, 'shared', False):
+            freed += self.vector_store.estimate_bytes()
+        self.memory.clear()
+        return freed
+    
+    def get_memory_stats(self) -> Dict[str, Any]:
+        """Get the size of this session's conversation memory"""
+        return self.memory.get_stats()
     
     def get_knowledge_base_info(self) -> Dict[str, Any]:
         """Get information about the knowledge base"""
         return self.vector_store.get_collection_info()
     
+    def get_cache_stats(self) -> Optional[Dict[str, Any]]:
+        """Get hit-rate metrics for the shared answer cache"""
+        if not self.answer_cache:
+            return None
+        return self.answer_cache.get_stats()
+    
+    def get_metrics_summary(self) -> Dict[str, Any]:
+        """Per-stage latency quantiles and request outcomes for this process"""
+        return METRICS.get_summary()
+    
+    def get_recent_profiles(self) -> List[Dict[str, Any]]:
+        """Profiles taken by this process, newest first (profile=True or PROFILE_SAMPLE_RATE)"""
+        return get_profile_store(self.config).get_recent()
+    
     def get_deployment_debug_info(self) -> Dict[str, Any]:
         """Get debugging information for deployment issues"""
+        rate_limiter = get_rate_limiter(self.config)
         debug_info = {
             "current_working_directory": os.getcwd(),
             "data_folder_path": self.config.DATA_FOLDER,
@@ -477,7 +1044,13 @@ Answer:"""
                 "OPENAI_MODEL": os.getenv("OPENAI_MODEL", "NOT_SET"),
                 "PORT": os.getenv("PORT", "NOT_SET"),
                 "PYTHON_VERSION": os.getenv("PYTHON_VERSION", "NOT_SET")
-            }
+            },
+            "conversation_memory": self.get_memory_stats(),
+            "request_coalescing": self.single_flight.get_stats() if self.single_flight else None,
+            "llm_client": self.llm_manager.get_stats(),
+            "rate_limiter": rate_limiter.get_stats() if rate_limiter else None,
+            "recent_requests": METRICS.get_recent_requests()[-10:],
+            "profiles": self.get_recent_profiles()
         }
         
         # Check data folder contents if it exists
@@ -502,29 +1075,29 @@ Answer:"""
     
     # Self-Reflective Agent Methods
     
-    def _extract_energy_preferences(self, context: str) -> str:
+    def _extract_energy_preferences(self, context: str, features: Optional[Set[str]] = None) -> str:
         """Extract information about what energizes or drains Collins"""
-        context_lower = context.lower()
+        features = self._context_features(context, features)
         
         energizing_activities = []
         draining_activities = []
         
         # Look for energizing activities
-        if 'curiosity' in context_lower or 'theoretical puzzles' in context_lower:
+        if 'curiosity' in features or 'theoretical puzzles' in features:
             energizing_activities.append("solving complex theoretical puzzles")
-        if 'machine learning' in context_lower and 'cosmology' in context_lower:
+        if 'machine learning' in features and 'cosmology' in features:
             energizing_activities.append("applying machine learning to cosmological problems")
-        if 'research' in context_lower and 'innovation' in context_lower:
+        if 'research' in features and 'innovation' in features:
             energizing_activities.append("innovative research projects")
-        if 'collaboration' in context_lower and 'team' in context_lower:
+        if 'collaboration' in features and 'team' in features:
             energizing_activities.append("collaborative team environments")
-        if 'diffusion models' in context_lower or '21cm cosmology' in context_lower:
+        if 'diffusion models' in features or '21cm cosmology' in features:
             energizing_activities.append("working on cutting-edge astrophysics research")
         
         # Look for potentially draining activities
-        if 'hard-working' in context_lower:
+        if 'hard-working' in features:
             draining_activities.append("repetitive tasks without intellectual challenge")
-        if 'precision' in context_lower and 'ambition' in context_lower:
+        if 'precision' in features and 'ambition' in features:
             draining_activities.append("work that doesn't push boundaries")
         
         response = "Based on my background and work patterns, "
@@ -539,21 +1112,21 @@ Answer:"""
         
         return response
     
-    def _extract_collaboration_style(self, context: str) -> str:
+    def _extract_collaboration_style(self, context: str, features: Optional[Set[str]] = None) -> str:
         """Extract information about Collins' collaboration preferences"""
-        context_lower = context.lower()
+        features = self._context_features(context, features)
         
         collaboration_traits = []
         
-        if 'hard-working team player' in context_lower:
+        if 'hard-working team player' in features:
             collaboration_traits.append("I'm a dedicated team player who puts in the effort")
-        if 'collaboration' in context_lower:
+        if 'collaboration' in features:
             collaboration_traits.append("I thrive in collaborative environments")
-        if 'curiosity' in context_lower:
+        if 'curiosity' in features:
             collaboration_traits.append("I bring curiosity and intellectual engagement to team projects")
-        if 'machine learning' in context_lower and 'astrophysics' in context_lower:
+        if 'machine learning' in features and 'astrophysics' in features:
             collaboration_traits.append("I excel at bridging technical and scientific domains")
-        if 'precision' in context_lower and 'ambition' in context_lower:
+        if 'precision' in features and 'ambition' in features:
             collaboration_traits.append("I balance precision with ambitious goals in team settings")
         
         if collaboration_traits:
@@ -565,29 +1138,29 @@ Answer:"""
         
         return response
     
-    def _extract_growth_areas(self, context: str) -> str:
+    def _extract_growth_areas(self, context: str, features: Optional[Set[str]] = None) -> str:
         """Extract information about areas where Collins needs to grow"""
-        context_lower = context.lower()
+        features = self._context_features(context, features)
         
         growth_areas = []
         strengths = []
         
         # Identify potential growth areas based on background
-        if 'data scientist' in context_lower and 'astrophysics' in context_lower:
+        if 'data scientist' in features and 'astrophysics' in features:
             growth_areas.append("expanding my knowledge beyond astrophysics into other domains")
-        if 'research' in context_lower and 'diffusion models' in context_lower:
+        if 'research' in features and 'diffusion models' in features:
             growth_areas.append("staying current with rapidly evolving AI/ML technologies")
-        if 'theoretical' in context_lower:
+        if 'theoretical' in features:
             growth_areas.append("developing more practical implementation skills")
-        if 'cosmology' in context_lower:
+        if 'cosmology' in features:
             growth_areas.append("building broader industry experience")
         
         # Identify current strengths
-        if 'machine learning' in context_lower:
+        if 'machine learning' in features:
             strengths.append("strong technical foundation in ML")
-        if 'curiosity' in context_lower:
+        if 'curiosity' in features:
             strengths.append("intellectual curiosity and drive")
-        if 'precision' in context_lower:
+        if 'precision' in features:
             strengths.append("attention to detail and precision")
         
         response = "Areas where I need to grow include "
@@ -604,19 +1177,19 @@ Answer:"""
         
         return response
     
-    def _extract_self_reflection(self, context: str) -> str:
+    def _extract_self_reflection(self, context: str, features: Optional[Set[str]] = None) -> str:
         """Extract general self-reflection insights"""
-        context_lower = context.lower()
+        features = self._context_features(context, features)
         
         insights = []
         
-        if 'curiosity' in context_lower and 'machine learning' in context_lower:
+        if 'curiosity' in features and 'machine learning' in features:
             insights.append("I'm driven by intellectual curiosity and technical innovation")
-        if 'hard-working' in context_lower and 'team player' in context_lower:
+        if 'hard-working' in features and 'team player' in features:
             insights.append("I value dedication and collaboration in my work")
-        if 'precision' in context_lower and 'ambition' in context_lower:
+        if 'precision' in features and 'ambition' in features:
             insights.append("I balance attention to detail with ambitious goals")
-        if 'astrophysics' in context_lower and 'data science' in context_lower:
+        if 'astrophysics' in features and 'data science' in features:
             insights.append("I thrive at the intersection of multiple disciplines")
         
         if insights:
@@ -631,7 +1204,7 @@ Answer:"""
     # Power Agent - Tone/Mode Switcher Methods
     
     def set_mode(self, mode: str) -> str:
-        """Set the current response mode"""
+        """Set the current response mode and re-render the visible history in it"""
         available_modes = {
             "default": "Default conversational mode",
             "interview": "Professional interview mode",
@@ -643,6 +1216,10 @@ Answer:"""
         
         if mode.lower() in available_modes:
             self.current_mode = mode.lower()
+            # Earlier answers are re-rendered from their stored base answers,
+            # without re-running retrieval or the LLM
+            self.memory.rerender(lambda base_response: transform_response(base_response, self.current_mode),
+                                 self.current_mode)
             return f"✅ Mode switched to: {available_modes[mode.lower()]}"
         else:
             return f"❌ Invalid mode. Available modes: {', '.join(available_modes.keys())}"
@@ -653,155 +1230,8 @@ Answer:"""
     
     def get_available_modes(self) -> Dict[str, str]:
         """Get all available modes and their descriptions"""
-        return {
-            "default": "Default conversational mode",
-            "interview": "Professional interview mode - concise, professional, informative",
-            "storytelling": "Personal storytelling mode - longer, reflective, narrative",
-            "fast_facts": "Fast facts mode - bullet points, TL;DR format",
-            "humble_brag": "Humble brag mode - confident self-promotion, still grounded in truth",
-            "code_style": "Code style mode - technical implementation details, code examples, and architectural insights"
-        }
+        return dict(MODE_DESCRIPTIONS)
     
-    def apply_mode_transformation(self, response: str) -> str:
-        """Apply the current mode transformation to a response"""
-        if self.current_mode == "default":
-            return response
-        
-        elif self.current_mode == "interview":
-            return self._transform_to_interview_mode(response)
-        
-        elif self.current_mode == "storytelling":
-            return self._transform_to_storytelling_mode(response)
-        
-        elif self.current_mode == "fast_facts":
-            return self._transform_to_fast_facts_mode(response)
-        
-        elif self.current_mode == "humble_brag":
-            return self._transform_to_humble_brag_mode(response)
-        
-        elif self.current_mode == "code_style":
-            return self._transform_to_code_style_mode(response)
-        
-        return response
-    
-    def _transform_to_interview_mode(self, response: str) -> str:
-        """Transform response to professional interview mode"""
-        # Make it concise and professional
-        response = response.replace("I'm", "I am")
-        response = response.replace("I've", "I have")
-        response = response.replace("I'll", "I will")
-        
-        # Add professional framing
-        if "I am" in response and "data scientist" in response.lower():
-            response = f"Professionally, {response}"
-        
-        # Make it more structured
-        if len(response) > 200:
-            # Split into key points
-            sentences = response.split('. ')
-            if len(sentences) > 2:
-                key_points = sentences[:2]
-                response = '. '.join(key_points) + '.'
-        
-        return response
-    
-    def _transform_to_storytelling_mode(self, response: str) -> str:
-        """Transform response to personal storytelling mode"""
-        # Add narrative elements
-        if "I am" in response:
-            response = response.replace("I am", "Let me tell you about how I became")
-        
-        # Add reflection
-        if "research" in response.lower() or "project" in response.lower():
-            response += " Looking back on this journey, I realize how much I've grown through these experiences."
-        
-        # Add personal connection
-        if "curiosity" in response.lower():
-            response += " This curiosity has been my driving force, pushing me to explore the unknown and challenge conventional thinking."
-        
-        return response
-    
-    def _transform_to_fast_facts_mode(self, response: str) -> str:
-        """Transform response to fast facts/bullet point mode"""
-        # Extract key information and create bullet points
-        facts = []
-        
-        if "data scientist" in response.lower():
-            facts.append("🎯 **Role**: Data Scientist & Astrophysics Researcher")
-        
-        if "machine learning" in response.lower():
-            facts.append("🤖 **Specialty**: Machine Learning applied to cosmology")
-        
-        if "diffusion models" in response.lower():
-            facts.append("🔬 **Research**: Diffusion Models for Neutral Hydrogen Maps")
-        
-        if "21cm cosmology" in response.lower():
-            facts.append("🌌 **Domain**: 21cm Cosmology & Neutral Hydrogen Analysis")
-        
-        if "curiosity" in response.lower():
-            facts.append("💡 **Drive**: Curiosity-driven problem solving")
-        
-        if "collaboration" in response.lower():
-            facts.append("🤝 **Style**: Collaborative team player")
-        
-        if facts:
-            return "**Fast Facts About Collins:**\n\n" + "\n".join(facts)
-        else:
-            # Fallback to bullet points from original response
-            sentences = response.split('. ')
-            bullet_points = [f"• {sentence.strip()}" for sentence in sentences if sentence.strip()]
-            return "**Quick Summary:**\n\n" + "\n".join(bullet_points)
-    
-    def _transform_to_humble_brag_mode(self, response: str) -> str:
-        """Transform response to confident self-promotion mode"""
-        # Add confidence markers
-        response = response.replace("I am", "I'm proud to be")
-        response = response.replace("I work", "I excel at")
-        response = response.replace("I specialize", "I'm recognized for my expertise in")
-        
-        # Add achievement language
-        if "research" in response.lower():
-            response = response.replace("research", "groundbreaking research")
-        
-        if "machine learning" in response.lower():
-            response = response.replace("machine learning", "cutting-edge machine learning")
-        
-        if "cosmology" in response.lower():
-            response = response.replace("cosmology", "advanced cosmology")
-        
-        # Add impact statements
-        if "diffusion models" in response.lower():
-            response += " This work represents a significant advancement in our understanding of cosmic structures."
-        
-        if "curiosity" in response.lower():
-            response += " This intellectual curiosity has consistently led me to innovative solutions and breakthrough discoveries."
-        
-        return response
-    
-    def _transform_to_code_style_mode(self, response: str) -> str:
-        """Transform response to technical implementation-focused mode"""
-        # Add technical framing
-        if "I am" in response:
-            response = response.replace("I am", "From a technical implementation perspective, I am")
-        
-        # Add code-specific language
-        if "diffusion models" in response.lower():
-            response += " In my implementation, I use a ContextU-Net architecture with residual connections, designed for conditional image generation using diffusion processes. The model is specifically tailored for processing 64x64 pixel astronomical images."
-        
-        # Add technical details
-        if "machine learning" in response.lower():
-            response += " My approach involves implementing residual convolutional blocks with batch normalization and ReLU activation, supporting both residual and non-residual modes with dynamic channel adjustment."
-        
-        # Add architectural insights
-        if "research" in response.lower():
-            response += " The architecture includes a downsampling path with 4 levels (UnetDown blocks), upsampling path with skip connections (UnetUp blocks), context embedding for conditional generation, and time embedding for diffusion timesteps."
-        
-        # Add implementation details
-        if "cosmology" in response.lower():
-            response += " For the training process, I implement noise perturbation using a diffusion schedule with beta values from 1e-4 to 0.02, MSE loss between predicted and true noise, and learning rate decay over 200 epochs with batch size 128."
-        
-        # Add evaluation approach
-        if "analysis" in response.lower():
-            response += " My evaluation pipeline includes pixel intensity histograms for comparing real vs generated image distributions, power spectrum analysis for spatial frequency characteristics, and PDF analysis for probability density function comparison."
-        
-        return response
+    def apply_mode_transformation(self, response: str, mode: Optional[str] = None) -> str:
+        """Apply the current (or given) mode transformation to a response"""
+        return transform_response(response, mode or self.current_mode)
@@ -0,0 +1,140 @@
+"""Recall-vs-dimension report for embedding projections.
+
+Embeds the bundled corpus once at the native dimension, then measures how
+well each reduced dimension reproduces the native top-k neighbours for a set
+of representative questions, along with index size and brute-force scan time.
+
+Usage:
+    python colligent_dimension_report.py
+    python colligent_dimension_report.py --dimensions 256 128 64 --k 5 --output report.md
+"""
+import os
+import sys
+import time
+import argparse
+import logging
+from typing import List, Dict, Any
+
+# Add current directory to path for imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from colligent_config import Config
+from colligent_document_processor import DocumentProcessor
+from colligent_embedding_projection import EmbeddingProjector, PROJECTION_METHODS, np
+
+logger = logging.getLogger(__name__)
+
+# Representative questions, mirroring the Quick Questions and tips in the web app
+REPORT_QUERIES = [
+    "What kind of engineer am I?",
+    "What are my strongest technical skills?",
+    "What projects am I most proud of?",
+    "What kind of tasks energize or drain me?",
+    "How do I collaborate best with others?",
+    "Where do I need to grow?",
+    "What is your diffusion model research about?",
+    "What programming languages do you know?",
+    "Tell me about your education and experience",
+    "How is the ContextUnet model trained?",
+    "What is 21cm cosmology?",
+    "How were the generated neutral hydrogen maps evaluated?",
+]
+
+DEFAULT_DIMENSIONS = [384, 256, 192, 128, 96, 64, 32]
+
+
+def load_encoder(config: Config):
+    """Load the sentence-transformers model used by the vector store"""
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(config.EMBEDDING_MODEL)
+
+
+def top_k(corpus: "np.ndarray", queries: "np.ndarray", k: int) -> "np.ndarray":
+    """Brute-force cosine top-k (vectors are unit length)"""
+    scores = queries @ corpus.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def recall_at_k(truth: "np.ndarray", found: "np.ndarray") -> float:
+    """Fraction of the native top-k neighbours recovered, averaged over queries"""
+    hits = [len(set(t) & set(f)) / len(t) for t, f in zip(truth, found)]
+    return float(np.mean(hits))
+
+
+def scan_time_ms(corpus: "np.ndarray", queries: "np.ndarray", k: int, repeats: int = 50) -> float:
+    """Mean brute-force search time per query in milliseconds"""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        top_k(corpus, queries, k)
+    elapsed = time.perf_counter() - start
+    return elapsed / (repeats * len(queries)) * 1000
+
+
+def build_report(config: Config, dimensions: List[int], k: int) -> List[Dict[str, Any]]:
+    """Compute recall, index size and scan time for every method/dimension"""
+    chunks = DocumentProcessor(config).process_documents()
+    if not chunks:
+        raise RuntimeError("No document chunks found - check the data folder")
+
+    encoder = load_encoder(config)
+    corpus = encoder.encode([chunk.page_content for chunk in chunks], normalize_embeddings=True)
+    queries = encoder.encode(REPORT_QUERIES, normalize_embeddings=True)
+    k = min(k, len(chunks))
+    truth = top_k(corpus, queries, k)
+    native_dimension = corpus.shape[1]
+
+    rows = []
+    for method in PROJECTION_METHODS:
+        for dimension in dimensions:
+            if dimension >= native_dimension:
+                projected_corpus, projected_queries = corpus, queries
+                effective = native_dimension
+            else:
+                projector = EmbeddingProjector(dimension, method).fit(corpus)
+                projected_corpus = projector.transform(corpus)
+                projected_queries = projector.transform(queries)
+                effective = projector.output_dimension
+
+            found = top_k(projected_corpus, projected_queries, k)
+            rows.append({
+                "method": method,
+                "dimension": effective,
+                f"recall@{k}": recall_at_k(truth, found),
+                "index_kb": projected_corpus.astype(np.float32).nbytes / 1024,
+                "scan_ms": scan_time_ms(projected_corpus, projected_queries, k),
+            })
+
+    logger.info(f"Evaluated {len(REPORT_QUERIES)} queries over {len(chunks)} chunks")
+    return rows
+
+
+def format_report(rows: List[Dict[str, Any]]) -> str:
+    """Render report rows as a markdown table"""
+    headers = list(rows[0].keys())
+    lines = [
+        "| " + " | ".join(headers) + " |",
+        "| " + " | ".join("---" for _ in headers) + " |",
+    ]
+    for row in rows:
+        cells = [f"{value:.3f}" if isinstance(value, float) else str(value) for value in row.values()]
+        lines.append("| " + " | ".join(cells) + " |")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall-vs-dimension report for embedding projections")
+    parser.add_argument("--dimensions", type=int, nargs="+", default=DEFAULT_DIMENSIONS)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--output", help="Optional markdown file to write the report to")
+    args = parser.parse_args()
+
+    report = format_report(build_report(Config(), args.dimensions, args.k))
+    print(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import os
+import json
 import logging
 from typing import List, Dict, Any
 from pathlib import Path
@@ -55,19 +56,71 @@ except ImportError:
 
 import PyPDF2
 
+from colligent_retrieval import make_chunk_id
+
 logging.basicConfig(level=logging.INFO)
 
+def load_chunking_profile(path: str) -> Dict[str, Any]:
+    """Chunk sizes from a profile written by colligent_chunk_tuner.py, or {} without one.
+    
+    Returns {"default": {"chunk_size", "chunk_overlap"}, "sources": {stem: {...}}},
+    where a stem is a data file name without its extension.
+    """
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            profile = json.load(f)
+        settings = {"sources": {}}
+        if profile.get("default"):
+            settings["default"] = _chunk_settings(profile["default"])
+        for stem, source_settings in (profile.get("sources") or {}).items():
+            settings["sources"][stem] = _chunk_settings(source_settings)
+        return settings
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.error(f"Ignoring invalid chunking profile {path}: {str(e)}")
+        return {}
+
+
+def _chunk_settings(entry: Dict[str, Any]) -> Dict[str, int]:
+    chunk_size, chunk_overlap = int(entry["chunk_size"]), int(entry["chunk_overlap"])
+    if chunk_size <= 0 or not 0 <= chunk_overlap < chunk_size:
+        raise ValueError(f"chunk_overlap must be between 0 and chunk_size, got {chunk_size}/{chunk_overlap}")
+    return {"chunk_size": chunk_size, "chunk_overlap": chunk_overlap}
+
+
 class DocumentProcessor:
     """Handles document loading, text extraction, and chunking"""
     
     def __init__(self, config: Config):
         self.config = config
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=config.CHUNK_SIZE,
-            chunk_overlap=config.CHUNK_OVERLAP,
+        # A tuned profile overrides CHUNK_SIZE/CHUNK_OVERLAP, per source where it has an entry
+        self.chunking_profile = load_chunking_profile(getattr(config, 'CHUNKING_PROFILE_PATH', ''))
+        default = self.chunking_profile.get("default", {})
+        self.text_splitter = self._make_splitter(
+            default.get("chunk_size", config.CHUNK_SIZE),
+            default.get("chunk_overlap", config.CHUNK_OVERLAP)
+        )
+        self.source_splitters = {
+            stem: self._make_splitter(settings["chunk_size"], settings["chunk_overlap"])
+            for stem, settings in self.chunking_profile.get("sources", {}).items()
+        }
+        if self.chunking_profile:
+            logger.info(f"Using chunking profile {config.CHUNKING_PROFILE_PATH}")
+    
+    @staticmethod
+    def _make_splitter(chunk_size: int, chunk_overlap: int):
+        return RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
             length_function=len,
+            add_start_index=True,
         )
     
+    def splitter_for(self, source: str):
+        """The text splitter for a data file, by its name without extension"""
+        return self.source_splitters.get(os.path.splitext(source)[0], self.text_splitter)
+    
     def extract_text_from_pdf(self, file_path: str) -> str:
         """Extract text from a PDF file"""
         try:
@@ -160,7 +213,17 @@ class DocumentProcessor:
             return []
         
         try:
-            chunks = self.text_splitter.split_documents(documents)
+            chunks = []
+            for document in documents:
+                splitter = self.splitter_for(document.metadata.get('source', ''))
+                chunks.extend(splitter.split_documents([document]))
+            for chunk in chunks:
+                # Stable IDs and offsets let retrieval results point back into the source
+                chunk.metadata['chunk_id'] = make_chunk_id(
+                    chunk.metadata.get('source', 'Unknown'),
+                    chunk.metadata.get('start_index'),
+                    chunk.page_content.strip()
+                )
             logger.info(f"Split {len(documents)} documents into {len(chunks)} chunks")
             return chunks
         except Exception as e:
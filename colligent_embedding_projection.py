@@ -0,0 +1,170 @@
+import os
+import logging
+from typing import List, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# numpy ships with sentence-transformers, but keep the import optional like the
+# rest of the vector stack so the app still starts without it
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+    logger.warning("numpy not available, embedding projection disabled")
+
+PROJECTION_METHODS = ("pca", "truncate")
+PROJECTION_FILENAME = "projection.npz"
+
+
+class EmbeddingProjector:
+    """Reduces embedding vectors to a smaller dimension.
+
+    Two methods are supported:
+    - "pca": principal components fitted on the indexed corpus
+    - "truncate": Matryoshka-style truncation to the leading dimensions
+
+    Projected vectors are re-normalized so cosine similarity keeps working.
+    """
+
+    def __init__(self, dimension: int, method: str = "pca"):
+        if method not in PROJECTION_METHODS:
+            raise ValueError(f"Unknown projection method '{method}'. Available: {', '.join(PROJECTION_METHODS)}")
+        if dimension <= 0:
+            raise ValueError("Projection dimension must be positive")
+        self.dimension = dimension
+        self.method = method
+        self.input_dimension = None
+        self.mean = None
+        self.components = None
+
+    @property
+    def is_fitted(self) -> bool:
+        return self.input_dimension is not None
+
+    @property
+    def output_dimension(self) -> int:
+        """Dimension of projected vectors (PCA is capped by the corpus size)"""
+        if self.components is not None:
+            return self.components.shape[0]
+        return self.dimension
+
+    def fit(self, vectors: List[List[float]]) -> "EmbeddingProjector":
+        """Fit the projection on the corpus embeddings"""
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim != 2 or matrix.shape[0] == 0:
+            raise ValueError("Cannot fit projection on an empty corpus")
+
+        self.input_dimension = matrix.shape[1]
+        if self.dimension >= self.input_dimension:
+            logger.warning(f"Projection dimension {self.dimension} >= native {self.input_dimension}, vectors left unchanged")
+            self.method = "truncate"
+            self.dimension = self.input_dimension
+
+        if self.method == "pca":
+            self.mean = matrix.mean(axis=0)
+            centered = matrix - self.mean
+            # Rows of vt are the principal axes, ordered by explained variance
+            _, _, vt = np.linalg.svd(centered, full_matrices=False)
+            n_components = min(self.dimension, vt.shape[0])
+            if n_components < self.dimension:
+                logger.warning(f"Corpus only supports {n_components} PCA components (requested {self.dimension})")
+            self.components = vt[:n_components].astype(np.float32)
+
+        logger.info(f"Fitted {self.method} projection: {self.input_dimension} -> {self.output_dimension} dimensions")
+        return self
+
+    def transform(self, vectors: List[List[float]]) -> "np.ndarray":
+        """Project a batch of vectors and re-normalize them"""
+        if not self.is_fitted:
+            raise RuntimeError("Projection has not been fitted")
+
+        matrix = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        if self.method == "pca":
+            projected = (matrix - self.mean) @ self.components.T
+        else:
+            projected = matrix[:, :self.dimension]
+
+        norms = np.linalg.norm(projected, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return projected / norms
+
+    def save(self, path: str):
+        """Persist the fitted projection next to the index"""
+        arrays = {
+            "method": np.array(self.method),
+            "dimension": np.array(self.dimension),
+            "input_dimension": np.array(self.input_dimension),
+        }
+        if self.method == "pca":
+            arrays["mean"] = self.mean
+            arrays["components"] = self.components
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+        logger.info(f"Saved embedding projection to {path}")
+
+    @classmethod
+    def load(cls, path: str) -> "EmbeddingProjector":
+        """Load a projection saved with save()"""
+        with np.load(path) as data:
+            projector = cls(int(data["dimension"]), str(data["method"]))
+            projector.input_dimension = int(data["input_dimension"])
+            if projector.method == "pca":
+                projector.mean = data["mean"]
+                projector.components = data["components"]
+        return projector
+
+    def get_info(self) -> Dict[str, Any]:
+        return {
+            "method": self.method,
+            "input_dimension": self.input_dimension,
+            "output_dimension": self.output_dimension,
+        }
+
+
+class ProjectedEmbeddings:
+    """Embeddings wrapper that applies an EmbeddingProjector.
+
+    Exposes the same embed_documents/embed_query interface as the LangChain
+    embeddings it wraps, so it can be handed to Chroma directly.
+    """
+
+    def __init__(self, base_embeddings, projector: EmbeddingProjector):
+        self.base_embeddings = base_embeddings
+        self.projector = projector
+        # Corpus vectors already computed while fitting, consumed on indexing
+        self._pending: Dict[str, List[float]] = {}
+
+    def prime(self, texts: List[str], vectors: List[List[float]]):
+        """Remember already-computed base vectors to avoid embedding twice"""
+        self._pending.update(zip(texts, vectors))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        missing = [text for text in texts if text not in self._pending]
+        if missing:
+            self.prime(missing, self.base_embeddings.embed_documents(missing))
+        base_vectors = [self._pending[text] for text in texts]
+        for text in texts:
+            self._pending.pop(text, None)
+        return self.projector.transform(base_vectors).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.projector.transform([self.base_embeddings.embed_query(text)])[0].tolist()
+
+
+def projection_path(index_path: str) -> str:
+    """Location of the persisted projection for an index directory"""
+    return os.path.join(index_path, PROJECTION_FILENAME)
+
+
+def load_projector(index_path: str) -> Optional[EmbeddingProjector]:
+    """Load the projection stored with an index, if any"""
+    path = projection_path(index_path)
+    if not NUMPY_AVAILABLE or not os.path.exists(path):
+        return None
+    try:
+        return EmbeddingProjector.load(path)
+    except Exception as e:
+        logger.error(f"Error loading embedding projection from {path}: {e}")
+        return None
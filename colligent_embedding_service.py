@@ -0,0 +1,180 @@
+"""Embedding model served over local HTTP, shared by worker processes.
+
+Each worker would otherwise load its own copy of the sentence-transformers
+model. The service loads it once, applies the same projection as the live
+index, and answers POST /embed with {"texts": [...]}.
+
+Usage:
+    python colligent_embedding_service.py --port 8766
+"""
+import json
+import time
+import logging
+import argparse
+import threading
+import http.client
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+from urllib.parse import urlsplit
+
+from colligent_config import Config
+from colligent_vector_db import VectorStore
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingServer:
+    """Serves an embeddings object (embed_query/embed_documents) from a background thread"""
+
+    def __init__(self, embeddings, host: str = "127.0.0.1", port: int = 0):
+        self.embeddings = embeddings
+        self.stats = {"requests": 0, "texts": 0, "seconds": 0.0}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "EmbeddingServer":
+        threading.Thread(target=self._server.serve_forever, name="embedding-service", daemon=True).start()
+        return self
+
+    def serve_forever(self):
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        start = time.perf_counter()
+        if len(texts) == 1:
+            vectors = [self.embeddings.embed_query(texts[0])]
+        else:
+            vectors = self.embeddings.embed_documents(texts)
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["texts"] += len(texts)
+            self.stats["seconds"] += time.perf_counter() - start
+        return vectors
+
+    def _make_handler(self):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, payload):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path.rstrip("/") == "/health":
+                    self._send_json(200, dict(service.stats, status="ok"))
+                else:
+                    self._send_json(404, {"error": "Not found"})
+
+            def do_POST(self):
+                if self.path.rstrip("/") != "/embed":
+                    self._send_json(404, {"error": "Not found"})
+                    return
+                try:
+                    request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                    texts = request["texts"]
+                    if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+                        raise ValueError("'texts' must be a list of strings")
+                except (ValueError, KeyError) as e:
+                    self._send_json(400, {"error": str(e)})
+                    return
+                try:
+                    self._send_json(200, {"embeddings": service.embed(texts)})
+                except Exception as e:
+                    logger.error(f"Error embedding {len(texts)} texts: {e}")
+                    self._send_json(500, {"error": str(e)})
+
+        return Handler
+
+
+class EmbeddingClient:
+    """Embeddings interface backed by an EmbeddingServer, with one keep-alive connection per thread"""
+
+    def __init__(self, url: str, timeout: float = 10.0):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return conn
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        body = json.dumps({"texts": texts})
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request("POST", "/embed", body=body, headers={"Content-Type": "application/json"})
+                response = conn.getresponse()
+                payload = json.loads(response.read())
+            except (OSError, http.client.HTTPException):
+                # The service closed an idle keep-alive connection; reconnect once
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+                continue
+            if response.status != 200:
+                raise RuntimeError(f"Embedding service returned {response.status}: {payload.get('error')}")
+            return payload["embeddings"]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts) if texts else []
+
+
+def load_index_embeddings(config) -> Optional[object]:
+    """The embeddings the live index was built with, projection included, or None in fallback mode"""
+    store = VectorStore(config)
+    if not store.load_vector_store():
+        return None
+    return store.embeddings
+
+
+def main():
+    config = Config()
+    parser = argparse.ArgumentParser(description="Serve the knowledge base's embedding model over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=config.EMBEDDING_SERVICE_PORT)
+    args = parser.parse_args()
+
+    embeddings = load_index_embeddings(config)
+    if embeddings is None:
+        parser.exit(1, "No embedding model available (ChromaDB index missing or in fallback mode)\n")
+    server = EmbeddingServer(embeddings, args.host, args.port)
+    print(f"Embedding service listening on {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
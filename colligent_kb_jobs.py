@@ -0,0 +1,186 @@
+import os
+import time
+import logging
+import itertools
+import threading
+from typing import Any, Dict, Optional
+
+from colligent_document_processor import DocumentProcessor
+from colligent_vector_db import VectorStore, IndexBuildCancelled
+from colligent_core import compute_index_version, compute_kb_version
+from colligent_warmup import start_quick_question_warm_up
+
+logger = logging.getLogger(__name__)
+
+# Try to take a cross-process lock on the index directory where supported
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Rebuild stages in the order they run
+STAGES = ("extracting", "splitting", "embedding", "persisting")
+
+
+class RebuildJob:
+    """State of one background knowledge-base rebuild"""
+
+    def __init__(self, job_id: int):
+        self.job_id = job_id
+        self.state = "running"  # running, succeeded, failed or cancelled
+        self.stage = "extracting"
+        self.done = 0
+        self.total = 0
+        self.message = ""
+        self.started = time.time()
+        self.finished: Optional[float] = None
+        self.cancel_event = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self.state == "running"
+
+    def progress(self) -> float:
+        """Overall progress from 0 to 1, counting each stage equally"""
+        if self.state == "succeeded":
+            return 1.0
+        within = self.done / self.total if self.total else 0.0
+        return min(1.0, (STAGES.index(self.stage) + within) / len(STAGES))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "state": self.state,
+            "stage": self.stage,
+            "done": self.done,
+            "total": self.total,
+            "progress": round(self.progress(), 3),
+            "message": self.message,
+            "seconds": round((self.finished or time.time()) - self.started, 1),
+        }
+
+
+class KnowledgeBaseManager:
+    """Rebuilds the knowledge base in one background worker and swaps it in when done.
+
+    Sessions keep answering from their current index during a rebuild. The
+    finished vector store is published once, and every chatbot adopts it on
+    its next request, so the new index and its embedding model are shared.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.job: Optional[RebuildJob] = None
+        self.published: Optional[VectorStore] = None
+        self.published_version: Optional[str] = None
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def start_rebuild(self, chatbot) -> RebuildJob:
+        """Start a rebuild for chatbot's configuration, or return the one already running"""
+        with self._lock:
+            if self.job and self.job.running:
+                return self.job
+            job = self.job = RebuildJob(next(self._ids))
+        threading.Thread(target=self._run, args=(job, chatbot), name="kb-rebuild", daemon=True).start()
+        return job
+
+    def cancel(self) -> bool:
+        """Ask the running rebuild to stop at its next checkpoint"""
+        job = self.job
+        if job and job.running:
+            job.cancel_event.set()
+            return True
+        return False
+
+    def get_status(self) -> Optional[Dict[str, Any]]:
+        """Progress of the running or most recent rebuild"""
+        return self.job.to_dict() if self.job else None
+
+    def adopt(self, chatbot) -> bool:
+        """Switch a chatbot to the latest published knowledge base, if it is not using it yet"""
+        with self._lock:
+            store, version = self.published, self.published_version
+        if store is None or chatbot.vector_store is store:
+            return False
+        chatbot.swap_vector_store(store, version)
+        return True
+
+    def _run(self, job: RebuildJob, chatbot):
+        lock_file = None
+        try:
+            lock_file = self._lock_index()
+            self._build(job, chatbot)
+        except IndexBuildCancelled:
+            job.state = "cancelled"
+            job.message = "Rebuild cancelled; still serving the previous knowledge base"
+            logger.info(f"Knowledge base rebuild {job.job_id} cancelled")
+        except Exception as e:
+            job.state = "failed"
+            job.message = str(e)
+            logger.error(f"Knowledge base rebuild {job.job_id} failed: {e}")
+        finally:
+            job.finished = time.time()
+            if lock_file:
+                lock_file.close()
+
+    def _lock_index(self):
+        """Serialize rebuilds across worker processes sharing VECTOR_DB_PATH"""
+        if fcntl is None:
+            return None
+        os.makedirs(self.config.VECTOR_DB_PATH, exist_ok=True)
+        lock_file = open(os.path.join(self.config.VECTOR_DB_PATH, "rebuild.lock"), "w")
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def _build(self, job: RebuildJob, chatbot):
+        def report(stage: str, done: int = 0, total: int = 0):
+            if job.cancel_event.is_set():
+                raise IndexBuildCancelled()
+            job.stage, job.done, job.total = stage, done, total
+
+        kb_version = compute_kb_version(self.config)
+        processor = DocumentProcessor(self.config)
+
+        report("extracting")
+        documents = processor.load_documents()
+        if not documents:
+            raise RuntimeError(f"No documents found in {self.config.DATA_FOLDER}")
+
+        report("splitting", 0, len(documents))
+        chunks = processor.split_documents(documents)
+        if not chunks:
+            raise RuntimeError("No chunks created from documents")
+
+        # Reuse the session's embedding model instead of loading another copy
+        store = VectorStore(self.config, base_embeddings=chatbot.vector_store.base_embeddings)
+        if not store.create_vector_store(chunks, on_progress=report,
+                                         index_version=compute_index_version(self.config)):
+            raise RuntimeError("Failed to create vector store")
+
+        store.shared = True  # Sessions releasing it do not free it
+        with self._lock:
+            self.published = store
+            self.published_version = kb_version
+        # Answers derived from the old index are no longer trusted
+        if chatbot.answer_cache:
+            chatbot.answer_cache.invalidate()
+        self.adopt(chatbot)
+        start_quick_question_warm_up(chatbot, getattr(self.config, "QUICK_QUESTIONS", []))
+
+        job.state = "succeeded"
+        job.message = f"Rebuilt from {len(documents)} documents ({len(chunks)} chunks)"
+        logger.info(f"Knowledge base rebuild {job.job_id} finished: {job.message}")
+
+
+_shared_manager: Optional[KnowledgeBaseManager] = None
+_shared_manager_lock = threading.Lock()
+
+
+def get_kb_manager(config) -> KnowledgeBaseManager:
+    """Return the process-wide knowledge base manager"""
+    global _shared_manager
+    with _shared_manager_lock:
+        if _shared_manager is None:
+            _shared_manager = KnowledgeBaseManager(config)
+        return _shared_manager
@@ -0,0 +1,68 @@
+from collections import deque
+from typing import Iterable, List, Dict, Set, FrozenSet
+
+
+class KeywordAutomaton:
+    """Aho-Corasick multi-pattern matcher.
+
+    Built once from a fixed set of phrases, it reports every phrase that occurs
+    as a substring of a text in a single linear pass, regardless of how many
+    phrases there are. Matching is case-insensitive.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns = sorted({pattern.lower() for pattern in patterns if pattern})
+        # transitions[state] maps a character to the next state; missing
+        # characters go back to the root, so matching is one dict lookup per char
+        self._transitions: List[Dict[str, int]] = [{}]
+        self._outputs: List[FrozenSet[str]] = []
+        self._build()
+
+    def _build(self):
+        outputs: List[Set[str]] = [set()]
+
+        # Trie of all patterns
+        for pattern in self.patterns:
+            state = 0
+            for char in pattern:
+                next_state = self._transitions[state].get(char)
+                if next_state is None:
+                    next_state = len(self._transitions)
+                    self._transitions.append({})
+                    outputs.append(set())
+                    self._transitions[state][char] = next_state
+                state = next_state
+            outputs[state].add(pattern)
+
+        # Breadth-first pass computing failure links, folding them into the
+        # transition table and merging the outputs of suffix states
+        failure = [0] * len(self._transitions)
+        trie_edges = [dict(edges) for edges in self._transitions]
+        queue = deque(trie_edges[0].values())
+        while queue:
+            state = queue.popleft()
+            outputs[state] |= outputs[failure[state]]
+            for char, child in trie_edges[state].items():
+                queue.append(child)
+                fallback = failure[state]
+                while fallback and char not in trie_edges[fallback]:
+                    fallback = failure[fallback]
+                candidate = trie_edges[fallback].get(char, 0)
+                failure[child] = candidate if candidate != child else 0
+            # Inherit transitions this state lacks from its failure state
+            for char, target in self._transitions[failure[state]].items():
+                self._transitions[state].setdefault(char, target)
+
+        self._outputs = [frozenset(found) for found in outputs]
+
+    def find_all(self, text: str) -> Set[str]:
+        """Return the set of patterns occurring anywhere in text"""
+        found: Set[str] = set()
+        transitions = self._transitions
+        outputs = self._outputs
+        state = 0
+        for char in text.lower():
+            state = transitions[state].get(char, 0)
+            if outputs[state]:
+                found |= outputs[state]
+        return found
@@ -0,0 +1,420 @@
+import time
+import random
+import asyncio
+import logging
+import threading
+import weakref
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, Iterator, AsyncIterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Try to import the OpenAI chat model, but don't fail if it's missing
+try:
+    from langchain_openai import ChatOpenAI
+    LANGCHAIN_OPENAI_AVAILABLE = True
+except ImportError:
+    ChatOpenAI = None
+    LANGCHAIN_OPENAI_AVAILABLE = False
+    logger.warning("langchain_openai not available, LLM client disabled")
+
+# Try to import httpx for shared connection pools, but fall back to per-model clients
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    httpx = None
+    HTTPX_AVAILABLE = False
+    logger.warning("httpx not available, LLM connections will not be pooled across sessions")
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits and server errors
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether an LLM call failure is transient"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES or status >= 500
+    # openai and httpx connection errors and timeouts carry no status
+    name = type(error).__name__
+    return isinstance(error, (TimeoutError, ConnectionError)) or "Timeout" in name or "Connection" in name
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Wait the server asked for in a Retry-After header (seconds form), if any"""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        return max(0.0, float(headers.get("retry-after") or headers.get("Retry-After")))
+    except (TypeError, ValueError):
+        return None  # Missing, or the HTTP-date form, which rate limiters rarely send
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, within an overall deadline"""
+
+    def __init__(self, max_retries: int = 2, base_delay: float = 0.5, max_delay: float = 8.0,
+                 deadline: Optional[float] = 30.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Seconds to sleep before retry number attempt (0-based), at least what the server asked for"""
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return backoff if retry_after is None else max(backoff, retry_after)
+
+
+class LatencyTracker:
+    """Sliding window of successful call latencies"""
+
+    def __init__(self, window: int = 200):
+        self._samples: "deque[float]" = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(p / 100 * len(samples)))]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+class ResilientLLM:
+    """Chat model wrapper adding retries and hedged requests.
+
+    Exposes the invoke/stream/ainvoke/astream methods the chatbot uses. Calls
+    that fail with a transient error are retried with jittered exponential
+    backoff, honoring Retry-After, until the retry deadline would pass. With
+    hedging enabled, a non-streaming call that has not answered
+    within the recent p95 latency gets a second, identical request; whichever
+    finishes first wins. Streams are retried only until the first token.
+    """
+
+    def __init__(self, manager: "LLMClientManager", model_kwargs: Dict[str, Any]):
+        self.manager = manager
+        self.model_kwargs = model_kwargs
+        self._model = None
+        self._async_models: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def close(self):
+        """Drop the built chat models; a session still holding this client rebuilds them on its next call"""
+        with self._lock:
+            self._model = None
+            self._async_models = weakref.WeakKeyDictionary()
+
+    @property
+    def identity(self) -> List[Any]:
+        """Model settings that shape an answer, without the API key"""
+        return [self.model_kwargs.get(name) for name in ("model_name", "temperature", "max_tokens")]
+
+    @property
+    def model(self):
+        """Chat model using the shared synchronous connection pool"""
+        with self._lock:
+            if self._model is None:
+                self._model = self.manager.build_model(self.model_kwargs)
+            return self._model
+
+    def _async_model(self):
+        """Chat model using the running event loop's connection pool"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            model = self._async_models.get(loop)
+            if model is None:
+                model = self.manager.build_model(self.model_kwargs, loop)
+                self._async_models[loop] = model
+            return model
+
+    def invoke(self, messages: List[Any]):
+        return self._with_retries(lambda: self._hedged(lambda: self._timed(self.model.invoke, messages)))
+
+    async def ainvoke(self, messages: List[Any]):
+        attempt, first_attempt = 0, time.monotonic()
+        while True:
+            try:
+                return await self._ahedged(lambda: self._atimed(self._async_model().ainvoke, messages))
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, first_attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    def stream(self, messages: List[Any]) -> Iterator[Any]:
+        attempt, first_attempt = 0, time.monotonic()
+        while True:
+            started = False
+            try:
+                for chunk in self.model.stream(messages):
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                # Tokens already shown cannot be taken back, so only retry before the first one
+                delay = None if started else self._retry_delay(e, attempt, first_attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                time.sleep(delay)
+
+    async def astream(self, messages: List[Any]) -> AsyncIterator[Any]:
+        attempt, first_attempt = 0, time.monotonic()
+        while True:
+            started = False
+            try:
+                async for chunk in self._async_model().astream(messages):
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                delay = None if started else self._retry_delay(e, attempt, first_attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    def _retry_delay(self, error: Exception, attempt: int, first_attempt: float) -> Optional[float]:
+        """Backoff before the next attempt, or None if the error should propagate"""
+        policy = self.manager.retry_policy
+        if attempt >= policy.max_retries or not is_retryable(error):
+            self.manager.count("failures")
+            return None
+        delay = policy.delay(attempt, retry_after_seconds(error))
+        if policy.deadline is not None and time.monotonic() - first_attempt + delay > policy.deadline:
+            logger.warning(f"LLM call failed ({type(error).__name__}: {error}), "
+                           f"not retrying: the next attempt would start past the {policy.deadline:g}s deadline")
+            self.manager.count("failures")
+            return None
+        self.manager.count("retries")
+        logger.warning(f"LLM call failed ({type(error).__name__}: {error}), retrying in {delay:.2f}s")
+        return delay
+
+    def _with_retries(self, call: Callable[[], Any]) -> Any:
+        attempt, first_attempt = 0, time.monotonic()
+        while True:
+            try:
+                return call()
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, first_attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                time.sleep(delay)
+
+    def _timed(self, fn: Callable[..., Any], *args) -> Any:
+        self.manager.count("requests")
+        start = time.perf_counter()
+        result = fn(*args)
+        self.manager.latency.record(time.perf_counter() - start)
+        return result
+
+    async def _atimed(self, fn: Callable[..., Any], *args) -> Any:
+        self.manager.count("requests")
+        start = time.perf_counter()
+        result = await fn(*args)
+        self.manager.latency.record(time.perf_counter() - start)
+        return result
+
+    def _hedged(self, call: Callable[[], Any]) -> Any:
+        delay = self.manager.hedge_delay()
+        if delay is None:
+            return call()
+
+        primary = self.manager.executor.submit(call)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        # The primary is slower than p95; race it against a second request.
+        # A synchronous HTTP call cannot be interrupted, so a loser already
+        # running completes in the background; one still queued is cancelled.
+        self.manager.count("hedges")
+        hedge = self.manager.executor.submit(call)
+        pending = {primary, hedge}
+        error = None
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        if future is hedge:
+                            self.manager.count("hedge_wins")
+                        return future.result()
+                    error = future.exception()
+            raise error
+        finally:
+            for future in pending:
+                future.cancel()
+
+    async def _ahedged(self, factory: Callable[[], Any]) -> Any:
+        delay = self.manager.hedge_delay()
+        if delay is None:
+            return await factory()
+
+        primary = asyncio.ensure_future(factory())
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        self.manager.count("hedges")
+        hedge = asyncio.ensure_future(factory())
+        pending = {primary, hedge}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.manager.count("hedge_wins")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+class LLMClientManager:
+    """Process-wide factory for pooled, resilient chat models.
+
+    All sessions share one keep-alive HTTP connection pool (one per event loop
+    for async calls), one retry policy and one latency window, and sessions
+    with the same API key and model settings share the same ResilientLLM.
+    At most max_clients of those are kept, least recently used first out, so
+    every visitor's key does not stay in memory for the life of the process.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.base_url = getattr(config, "OPENAI_BASE_URL", "") or None
+        self.timeout = getattr(config, "LLM_TIMEOUT_SECONDS", 30)
+        self.max_connections = getattr(config, "LLM_MAX_CONNECTIONS", 20)
+        self.retry_policy = RetryPolicy(
+            max_retries=getattr(config, "LLM_MAX_RETRIES", 2),
+            base_delay=getattr(config, "LLM_RETRY_BASE_DELAY", 0.5),
+            max_delay=getattr(config, "LLM_RETRY_MAX_DELAY", 8.0),
+            deadline=getattr(config, "LLM_RETRY_DEADLINE_SECONDS", 30.0),
+        )
+        self.hedging_enabled = getattr(config, "ENABLE_HEDGED_REQUESTS", False)
+        self.hedge_min_samples = getattr(config, "LLM_HEDGE_MIN_SAMPLES", 20)
+        self.latency = LatencyTracker()
+        self.executor = ThreadPoolExecutor(max_workers=self.max_connections, thread_name_prefix="llm")
+        self._http_client = None
+        self._async_http_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self.max_clients = max(1, getattr(config, "LLM_MAX_CLIENTS", 64))
+        self._llms: "OrderedDict[Tuple, ResilientLLM]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "retries": 0,
+            "failures": 0,
+            "hedges": 0,
+            "hedge_wins": 0,
+        }
+
+    def get_llm(self, api_key: str, model: Optional[str] = None, temperature: Optional[float] = None,
+                max_tokens: Optional[int] = None) -> Optional[ResilientLLM]:
+        """Shared client for the given credentials and settings, or None without one"""
+        if not api_key or not LANGCHAIN_OPENAI_AVAILABLE:
+            return None
+        model_kwargs = {
+            "model_name": model or self.config.OPENAI_MODEL,
+            "temperature": self.config.TEMPERATURE if temperature is None else temperature,
+            "max_tokens": max_tokens or self.config.MAX_TOKENS,
+            "openai_api_key": api_key,
+        }
+        key = tuple(sorted(model_kwargs.items()))
+        with self._lock:
+            llm = self._llms.get(key)
+            if llm is None:
+                llm = ResilientLLM(self, model_kwargs)
+                self._llms[key] = llm
+            self._llms.move_to_end(key)
+            while len(self._llms) > self.max_clients:
+                _, evicted = self._llms.popitem(last=False)
+                evicted.close()
+            return llm
+
+    def build_model(self, model_kwargs: Dict[str, Any], loop: Optional[asyncio.AbstractEventLoop] = None):
+        """Construct a ChatOpenAI bound to the shared connection pool"""
+        kwargs = dict(model_kwargs, timeout=self.timeout, max_retries=0)  # Retries are ours
+        if self.base_url:
+            kwargs["base_url"] = self.base_url
+        if HTTPX_AVAILABLE:
+            if loop is None:
+                kwargs["http_client"] = self._get_http_client()
+            else:
+                kwargs["http_async_client"] = self._get_async_http_client(loop)
+        return ChatOpenAI(**kwargs)
+
+    def _limits(self):
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_connections,
+            keepalive_expiry=30.0,
+        )
+
+    def _get_http_client(self):
+        with self._lock:
+            if self._http_client is None:
+                self._http_client = httpx.Client(limits=self._limits(), timeout=self.timeout)
+            return self._http_client
+
+    def _get_async_http_client(self, loop: asyncio.AbstractEventLoop):
+        # Async connections belong to the loop that opened them
+        with self._lock:
+            client = self._async_http_clients.get(loop)
+            if client is None:
+                client = httpx.AsyncClient(limits=self._limits(), timeout=self.timeout)
+                self._async_http_clients[loop] = client
+            return client
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, once enough latencies are known"""
+        if not self.hedging_enabled or len(self.latency) < self.hedge_min_samples:
+            return None
+        return self.latency.percentile(95)
+
+    def count(self, stat: str):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["clients"] = len(self._llms)
+        p50 = self.latency.percentile(50)
+        p95 = self.latency.percentile(95)
+        stats["latency_p50_ms"] = round(p50 * 1000, 1) if p50 is not None else None
+        stats["latency_p95_ms"] = round(p95 * 1000, 1) if p95 is not None else None
+        stats["hedging_enabled"] = self.hedging_enabled
+        return stats
+
+
+_shared_manager: Optional[LLMClientManager] = None
+_shared_manager_lock = threading.Lock()
+
+
+def get_llm_client_manager(config) -> LLMClientManager:
+    """Return the process-wide LLM client manager shared by all chatbot sessions"""
+    global _shared_manager
+    with _shared_manager_lock:
+        if _shared_manager is None:
+            _shared_manager = LLMClientManager(config)
+        return _shared_manager
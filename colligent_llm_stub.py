@@ -0,0 +1,264 @@
+"""Local OpenAI-compatible chat completions server for testing.
+
+Serves /v1/chat/completions (plain and streamed) and /v1/models with
+injectable latency and errors, so the LLM client's retries and hedging can be
+exercised without an API key. Point the chatbot at it with
+OPENAI_BASE_URL=http://127.0.0.1:8765/v1 and any OPENAI_API_KEY.
+
+Usage:
+    python colligent_llm_stub.py --port 8765 --latency-ms 300 --error-rate 0.1
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+DEFAULT_STUB_CONFIG = {
+    "latency_ms": 200.0,        # Base latency (median for lognormal, mean for exponential)
+    "jitter_ms": 50.0,          # Uniform jitter added on top
+    "latency_distribution": "uniform",  # uniform, lognormal or exponential
+    "latency_sigma": 0.5,       # Spread of the lognormal distribution
+    "slow_rate": 0.0,           # Fraction of requests hit by slow_ms extra latency (tail)
+    "slow_ms": 2000.0,
+    "error_rate": 0.0,          # Fraction of requests answered with error_status
+    "fail_next": 0,             # Requests answered with error_status before error_rate applies again
+    "error_status": 503,
+    "retry_after": None,        # Retry-After seconds sent with injected errors (None: no header)
+    "token_delay_ms": 20.0,     # Delay between streamed chunks
+    "response": "I am a data scientist working at the intersection of machine learning and cosmology.",
+}
+
+LATENCY_DISTRIBUTIONS = ("uniform", "lognormal", "exponential")
+
+
+class StubLLMServer:
+    """OpenAI-compatible stub server running in a background thread.
+
+    Settings can be changed while it runs with configure(), or by POSTing a
+    JSON object to /stub/config.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, seed: Optional[int] = None, **settings):
+        self.settings = dict(DEFAULT_STUB_CONFIG)
+        self.configure(**settings)
+        self.random = random.Random(seed)
+        self.stats = {"requests": 0, "errors": 0, "streams": 0}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def configure(self, **settings):
+        unknown = set(settings) - set(DEFAULT_STUB_CONFIG)
+        if unknown:
+            raise ValueError(f"Unknown stub settings: {sorted(unknown)}")
+        if settings.get("latency_distribution", "uniform") not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"latency_distribution must be one of {LATENCY_DISTRIBUTIONS}")
+        self.settings.update(settings)
+
+    def start(self) -> "StubLLMServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """Serve in the calling thread until interrupted"""
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StubLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _latency(self) -> float:
+        with self._lock:
+            base = self.settings["latency_ms"]
+            distribution = self.settings["latency_distribution"]
+            if distribution == "lognormal":
+                base *= self.random.lognormvariate(0, self.settings["latency_sigma"])
+            elif distribution == "exponential":
+                base = self.random.expovariate(1 / base) if base > 0 else 0.0
+            latency = base + self.random.uniform(0, self.settings["jitter_ms"])
+            if self.random.random() < self.settings["slow_rate"]:
+                latency += self.settings["slow_ms"]
+        return latency / 1000
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            if self.settings["fail_next"] > 0:
+                self.settings["fail_next"] -= 1
+                return True
+            return self.random.random() < self.settings["error_rate"]
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, like the real API
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def handle(self):
+                try:
+                    super().handle()
+                except (BrokenPipeError, ConnectionResetError):
+                    # Clients cancel hedged and timed-out requests mid-response
+                    pass
+
+            def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path.rstrip("/") == "/v1/models":
+                    self._send_json(200, {"object": "list", "data": [{"id": "stub", "object": "model"}]})
+                elif self.path.rstrip("/") == "/stub/stats":
+                    self._send_json(200, dict(stub.stats, settings=stub.settings))
+                else:
+                    self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    request = json.loads(self.rfile.read(length) or b"{}")
+                except json.JSONDecodeError:
+                    self._send_json(400, {"error": {"message": "Invalid JSON", "type": "invalid_request_error"}})
+                    return
+
+                if self.path.rstrip("/") == "/stub/config":
+                    try:
+                        stub.configure(**request)
+                    except ValueError as e:
+                        self._send_json(400, {"error": {"message": str(e), "type": "invalid_request_error"}})
+                        return
+                    self._send_json(200, stub.settings)
+                    return
+                if self.path.rstrip("/") != "/v1/chat/completions":
+                    self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+                    return
+
+                stub._count("requests")
+                time.sleep(stub._latency())
+                if stub._should_fail():
+                    stub._count("errors")
+                    status = int(stub.settings["error_status"])
+                    retry_after = stub.settings["retry_after"]
+                    headers = {"Retry-After": f"{retry_after:g}"} if retry_after is not None else None
+                    self._send_json(status, {"error": {"message": f"Injected error {status}", "type": "server_error"}},
+                                    headers)
+                    return
+
+                model = request.get("model", "stub")
+                if request.get("stream"):
+                    stub._count("streams")
+                    self._stream(model)
+                else:
+                    self._send_json(200, self._completion(model))
+
+            def _completion(self, model: str) -> Dict[str, Any]:
+                text = stub.settings["response"]
+                words = len(text.split())
+                return {
+                    "id": f"chatcmpl-stub-{stub.stats['requests']}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": text},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": words, "total_tokens": words},
+                }
+
+            def _stream(self, model: str):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+
+                def send(delta: Dict[str, Any], finish_reason: Optional[str] = None):
+                    chunk = {
+                        "id": "chatcmpl-stub",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+
+                send({"role": "assistant", "content": ""})
+                for i, word in enumerate(stub.settings["response"].split(" ")):
+                    send({"content": word if i == 0 else " " + word})
+                    time.sleep(stub.settings["token_delay_ms"] / 1000)
+                send({}, "stop")
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local OpenAI-compatible stub LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=DEFAULT_STUB_CONFIG["latency_ms"])
+    parser.add_argument("--jitter-ms", type=float, default=DEFAULT_STUB_CONFIG["jitter_ms"])
+    parser.add_argument("--latency-distribution", choices=LATENCY_DISTRIBUTIONS,
+                        default=DEFAULT_STUB_CONFIG["latency_distribution"])
+    parser.add_argument("--latency-sigma", type=float, default=DEFAULT_STUB_CONFIG["latency_sigma"])
+    parser.add_argument("--slow-rate", type=float, default=DEFAULT_STUB_CONFIG["slow_rate"])
+    parser.add_argument("--slow-ms", type=float, default=DEFAULT_STUB_CONFIG["slow_ms"])
+    parser.add_argument("--error-rate", type=float, default=DEFAULT_STUB_CONFIG["error_rate"])
+    parser.add_argument("--error-status", type=int, default=DEFAULT_STUB_CONFIG["error_status"])
+    parser.add_argument("--retry-after", type=float, default=None,
+                        help="Retry-After seconds to send with injected errors")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server = StubLLMServer(
+        host=args.host, port=args.port, seed=args.seed,
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        latency_distribution=args.latency_distribution, latency_sigma=args.latency_sigma,
+        slow_rate=args.slow_rate, slow_ms=args.slow_ms,
+        error_rate=args.error_rate, error_status=args.error_status, retry_after=args.retry_after,
+    )
+    print(f"Stub LLM server listening on {server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,464 @@
+"""Load generator for the chatbot and the HTTP API.
+
+Drives ContextAwareChatbot.ask_question in-process (against the bundled stub
+LLM by default) or POSTs to a running API, with a configurable concurrency,
+query mix and arrival rate. Reports throughput, error rates and p50/p95/p99
+latency end to end and per pipeline stage.
+
+With --rate, questions arrive as a Poisson process whatever the response
+times (open loop) and latency is measured from each scheduled arrival, so
+queueing behind a saturated server shows up. Without it, --concurrency
+clients ask back to back (closed loop).
+
+Usage:
+    python colligent_load_test.py --concurrency 16 --duration 30 --llm-latency-distribution lognormal
+    python colligent_load_test.py --rate 20 --mix quick=0.3,repeat=0.3,unique=0.4 --output load.json
+    python colligent_load_test.py --url http://127.0.0.1:8000 --rate 50 --duration 60
+"""
+import re
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+import http.client
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from colligent_config import Config, LOG_LEVELS, configure_cli_logging
+from colligent_metrics import METRICS, STAGES, Histogram, RequestTrace, percentile
+from colligent_llm_stub import StubLLMServer, DEFAULT_STUB_CONFIG, LATENCY_DISTRIBUTIONS
+
+logger = logging.getLogger(__name__)
+
+QUERY_KINDS = ("quick", "repeat", "unique")
+DEFAULT_MIX = "quick=0.2,repeat=0.3,unique=0.5"
+
+# Questions about the bundled documents, for the repeat and unique kinds
+DEFAULT_QUESTIONS = [
+    "What is your educational background?",
+    "What did your thesis find?",
+    "Which machine learning models have you trained?",
+    "What programming languages do you use?",
+    "What research have you done in astrophysics?",
+    "Which tools do you use for data analysis?",
+    "What was the best model and how well did it perform?",
+    "What experience do you have with deep learning?",
+]
+
+QUANTILES = (0.50, 0.95, 0.99)
+
+
+class QueryMix:
+    """Draws questions by kind.
+
+    quick questions hit the answer cache once answered, repeat questions come
+    from a small pool so concurrent duplicates coalesce, and unique questions
+    get a suffix so they always run the full pipeline.
+    """
+
+    def __init__(self, weights: Dict[str, float], quick_questions: List[str], questions: List[str],
+                 seed: Optional[int] = None):
+        unknown = set(weights) - set(QUERY_KINDS)
+        if unknown:
+            raise ValueError(f"Unknown query kinds {sorted(unknown)}; use {QUERY_KINDS}")
+        self.kinds = [kind for kind in QUERY_KINDS if weights.get(kind, 0) > 0]
+        if not self.kinds:
+            raise ValueError("The query mix needs at least one kind with a positive weight")
+        self.weights = [weights[kind] for kind in self.kinds]
+        self.pools = {"quick": quick_questions or questions, "repeat": questions, "unique": questions}
+        self.random = random.Random(seed)
+        self._serial = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def parse(spec: str) -> Dict[str, float]:
+        """Parse "quick=0.2,repeat=0.3,unique=0.5" into weights"""
+        weights = {}
+        for part in filter(None, (p.strip() for p in spec.split(","))):
+            kind, _, weight = part.partition("=")
+            try:
+                weights[kind.strip()] = float(weight)
+            except ValueError:
+                raise ValueError(f"Invalid query mix entry {part!r}; expected kind=weight")
+        return weights
+
+    def next(self) -> Tuple[str, str]:
+        with self._lock:
+            kind = self.random.choices(self.kinds, self.weights)[0]
+            question = self.random.choice(self.pools[kind])
+            self._serial += 1
+            serial = self._serial
+        if kind == "unique":
+            question = f"{question} (load test {serial})"
+        return kind, question
+
+
+class ChatbotTarget:
+    """Asks a ContextAwareChatbot in this process; stage timings come from each request's trace"""
+
+    name = "in-process"
+
+    def __init__(self, chatbot):
+        self.chatbot = chatbot
+        self._local = threading.local()
+        METRICS.add_listener(self._on_trace)
+
+    def _on_trace(self, trace: RequestTrace):
+        # Traces are recorded in the thread that asked, right before ask_question returns
+        self._local.trace = trace
+
+    def ask(self, question: str) -> Tuple[Optional[str], Dict[str, float], Optional[str]]:
+        """Return (error, stage seconds, response path) for one question"""
+        self._local.trace = None
+        session = self.chatbot.fork_session()  # No shared history between simulated users
+        result = session.ask_question(question)
+        trace = self._local.trace
+        error = result.get("error")
+        return (f"error: {error}" if error else None), (trace.stages if trace else {}), (trace.path if trace else None)
+
+    def server_stages(self) -> Optional[Dict[str, Histogram]]:
+        return None
+
+    def close(self):
+        METRICS.remove_listener(self._on_trace)
+
+
+def scrape_stage_histograms(text: str) -> Dict[str, Histogram]:
+    """Rebuild per-stage histograms from the API's Prometheus text"""
+    cumulative: Dict[str, List[Tuple[float, int]]] = {}
+    sums: Dict[str, float] = {}
+    for line in text.splitlines():
+        match = re.match(r'colligent_stage_seconds_(bucket|sum)\{stage="([^"]+)"(?:,le="([^"]+)")?\} (\S+)', line)
+        if not match:
+            continue
+        kind, stage, bound, value = match.groups()
+        if kind == "sum":
+            sums[stage] = float(value)
+        elif bound != "+Inf":
+            cumulative.setdefault(stage, []).append((float(bound), int(value)))
+        else:
+            cumulative.setdefault(stage, []).append((float("inf"), int(value)))
+
+    histograms = {}
+    for stage, buckets in cumulative.items():
+        histogram = Histogram(tuple(bound for bound, _ in buckets[:-1]))
+        previous = 0
+        for i, (_, count) in enumerate(buckets):
+            histogram.counts[i] = count - previous
+            previous = count
+        histogram.count = previous
+        histogram.sum = sums.get(stage, 0.0)
+        histograms[stage] = histogram
+    return histograms
+
+
+def subtract_histograms(after: Dict[str, Histogram], before: Dict[str, Histogram]) -> Dict[str, Histogram]:
+    """Observations made between two scrapes"""
+    delta = {}
+    for stage, histogram in after.items():
+        earlier = before.get(stage)
+        if earlier is not None:
+            difference = Histogram(histogram.buckets)
+            difference.counts = [a - b for a, b in zip(histogram.counts, earlier.counts)]
+            difference.count = histogram.count - earlier.count
+            difference.sum = histogram.sum - earlier.sum
+            histogram = difference
+        if histogram.count:
+            delta[stage] = histogram
+    return delta
+
+
+class HTTPTarget:
+    """POSTs questions to a running API over one keep-alive connection per client thread.
+
+    Stage latencies are the server's own histograms, scraped from /metrics
+    before and after the run. Behind several workers that is one worker's view.
+    """
+
+    name = "http"
+
+    def __init__(self, url: str, timeout: float = 60.0):
+        parts = urlsplit(url)
+        self.url = url.rstrip("/")
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self._local = threading.local()
+        self._before = self._scrape()
+
+    def _request(self, method: str, path: str, body: Optional[str] = None) -> Tuple[int, bytes]:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            conn.request(method, path, body=body, headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+            return response.status, response.read()
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            self._local.conn = None
+            raise
+
+    def _scrape(self) -> Dict[str, Histogram]:
+        try:
+            status, body = self._request("GET", "/metrics")
+        except (OSError, http.client.HTTPException) as e:
+            raise ConnectionError(f"Cannot reach {self.url}: {e}")
+        return scrape_stage_histograms(body.decode("utf-8")) if status == 200 else {}
+
+    def ask(self, question: str) -> Tuple[Optional[str], Dict[str, float], Optional[str]]:
+        try:
+            status, body = self._request("POST", "/ask", json.dumps({"question": question}))
+        except (OSError, http.client.HTTPException) as e:
+            return f"connection: {type(e).__name__}", {}, None
+        if status != 200:
+            return f"HTTP {status}", {}, None
+        return None, {}, "cache" if json.loads(body).get("cached") else "computed"
+
+    def server_stages(self) -> Optional[Dict[str, Histogram]]:
+        return subtract_histograms(self._scrape(), self._before)
+
+    def close(self):
+        pass
+
+
+def run_load(target, mix: QueryMix, duration: float, concurrency: int, rate: Optional[float] = None,
+             max_requests: Optional[int] = None, seed: Optional[int] = None) -> Tuple[List[Dict[str, Any]], float]:
+    """Send questions for duration seconds (or max_requests); return the samples and elapsed seconds"""
+    samples: List[Dict[str, Any]] = []
+    lock = threading.Lock()
+    start = time.perf_counter()
+    deadline = start + duration
+    issued = iter(range(max_requests)) if max_requests else None
+
+    def take_turn() -> bool:
+        if time.perf_counter() >= deadline:
+            return False
+        if issued is not None:
+            with lock:
+                return next(issued, None) is not None
+        return True
+
+    def one(scheduled: float):
+        kind, question = mix.next()
+        try:
+            error, stages, path = target.ask(question)
+        except Exception as e:
+            error, stages, path = f"exception: {type(e).__name__}", {}, None
+        sample = {"kind": kind, "latency": time.perf_counter() - scheduled, "error": error,
+                  "stages": stages, "path": path}
+        with lock:
+            samples.append(sample)
+
+    if rate:
+        # Open loop: arrivals do not wait for responses; a full pool queues them
+        arrivals = random.Random(seed)
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="load") as pool:
+            scheduled = start
+            while True:
+                scheduled += arrivals.expovariate(rate)
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                if not take_turn():
+                    break
+                pool.submit(one, scheduled)
+    else:
+        def client():
+            while take_turn():
+                one(time.perf_counter())
+
+        threads = [threading.Thread(target=client, name=f"load-{i}") for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return samples, time.perf_counter() - start
+
+
+def _quantiles_ms(values: List[float]) -> Dict[str, float]:
+    summary = {"count": len(values), "mean_ms": round(sum(values) / len(values) * 1000, 2)}
+    for q in QUANTILES:
+        summary[f"p{int(q * 100)}_ms"] = round(percentile(values, q) * 1000, 2)
+    return summary
+
+
+def _histogram_quantiles_ms(histogram: Histogram) -> Dict[str, float]:
+    summary = {"count": histogram.count, "mean_ms": round(histogram.sum / histogram.count * 1000, 2)}
+    for q in QUANTILES:
+        summary[f"p{int(q * 100)}_ms"] = round(histogram.quantile(q) * 1000, 2)
+    return summary
+
+
+def summarize(samples: List[Dict[str, Any]], elapsed: float,
+              server_stages: Optional[Dict[str, Histogram]] = None) -> Dict[str, Any]:
+    """Throughput, error rates and latency quantiles of a run"""
+    errors = [s for s in samples if s["error"]]
+    ok = [s for s in samples if not s["error"]]
+    by_kind = {}
+    for kind in QUERY_KINDS:
+        of_kind = [s for s in samples if s["kind"] == kind]
+        if of_kind:
+            by_kind[kind] = {
+                "requests": len(of_kind),
+                "error_rate": round(sum(1 for s in of_kind if s["error"]) / len(of_kind), 4),
+                "latency": _quantiles_ms([s["latency"] for s in of_kind]),
+            }
+
+    if server_stages is not None:
+        stages = {stage: _histogram_quantiles_ms(h) for stage, h in server_stages.items()}
+        stage_source = "server histograms (bucket-interpolated)"
+    else:
+        timings: Dict[str, List[float]] = {}
+        for sample in ok:
+            for stage, seconds in sample["stages"].items():
+                timings.setdefault(stage, []).append(seconds)
+        stages = {stage: _quantiles_ms(timings[stage]) for stage in timings}
+        stage_source = "request traces"
+    order = {name: i for i, name in enumerate(STAGES)}
+    stages = dict(sorted(stages.items(), key=lambda item: order.get(item[0], len(STAGES))))
+
+    return {
+        "requests": len(samples),
+        "elapsed_seconds": round(elapsed, 2),
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        "error_rate": round(len(errors) / len(samples), 4) if samples else 0.0,
+        "errors": dict(Counter(s["error"] for s in errors)),
+        "paths": dict(Counter(s["path"] or "unknown" for s in ok)),
+        "latency": _quantiles_ms([s["latency"] for s in ok]) if ok else {},
+        "by_kind": by_kind,
+        "stages": stages,
+        "stage_source": stage_source,
+    }
+
+
+def print_report(summary: Dict[str, Any]):
+    print(f"\n{summary['requests']} requests in {summary['elapsed_seconds']}s: "
+          f"{summary['throughput_rps']} answers/s, error rate {summary['error_rate']:.2%}")
+    for error, count in summary["errors"].items():
+        print(f"  {count:>6}  {error}")
+    if summary["paths"]:
+        print("Paths: " + ", ".join(f"{path} {count}" for path, count in summary["paths"].items()))
+
+    header = f"{'':<16} {'count':>7} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+
+    def row(name: str, q: Dict[str, float]) -> str:
+        return (f"{name:<16} {q['count']:>7} {q['mean_ms']:>9.1f} {q['p50_ms']:>9.1f} "
+                f"{q['p95_ms']:>9.1f} {q['p99_ms']:>9.1f}")
+
+    print(f"\nEnd to end (including queueing)\n{header}")
+    if summary["latency"]:
+        print(row("all", summary["latency"]))
+    for kind, stats in summary["by_kind"].items():
+        print(row(kind, stats["latency"]) + f"   errors {stats['error_rate']:.2%}")
+    if summary["stages"]:
+        print(f"\nStages, from {summary['stage_source']}\n{header}")
+        for stage, q in summary["stages"].items():
+            print(row(stage, q))
+
+
+def _load_questions(path: str) -> List[str]:
+    """One question per line, or JSONL with a "question" field"""
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                questions.append(json.loads(line)["question"] if line.startswith("{") else line)
+    return questions
+
+
+def build_chatbot_target(config: Config, args) -> Tuple[ChatbotTarget, Optional[StubLLMServer]]:
+    """Load the knowledge base in-process, pointing the chatbot at the stub LLM unless told otherwise"""
+    from colligent_core import ContextAwareChatbot
+
+    stub = None
+    if args.llm == "stub":
+        stub = StubLLMServer(
+            seed=args.seed,
+            latency_ms=args.llm_latency_ms, jitter_ms=args.llm_jitter_ms,
+            latency_distribution=args.llm_latency_distribution, latency_sigma=args.llm_latency_sigma,
+            slow_rate=args.llm_slow_rate, slow_ms=args.llm_slow_ms, error_rate=args.llm_error_rate,
+        ).start()
+        config.OPENAI_BASE_URL = stub.base_url
+        config.OPENAI_API_KEY = "stub"
+    elif args.llm == "none":
+        config.OPENAI_API_KEY = ""
+    if args.no_cache:
+        config.ENABLE_ANSWER_CACHE = False
+    config.ANSWER_CACHE_PATH = ""  # Never write load-test answers to a persisted cache
+
+    chatbot = ContextAwareChatbot(config)
+    if not chatbot.initialize_knowledge_base():
+        raise RuntimeError("Failed to initialize knowledge base")
+    if args.llm == "stub" and not chatbot.llm:
+        logger.warning("LLM client unavailable; measuring the fallback path without the stub")
+    return ChatbotTarget(chatbot), stub
+
+
+def main():
+    config = Config()
+    parser = argparse.ArgumentParser(description="Load-test the chatbot in-process or over the HTTP API")
+    parser.add_argument("--url", help="Base URL of a running API; default is in-process")
+    parser.add_argument("--concurrency", type=int, default=8, help="Clients (closed loop) or the in-flight limit")
+    parser.add_argument("--rate", type=float, help="Open-loop Poisson arrival rate in questions per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to send questions for")
+    parser.add_argument("--requests", type=int, help="Stop after this many questions")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Query kind weights, from {QUERY_KINDS}")
+    parser.add_argument("--questions", help="Question file (text lines or JSONL) for the repeat and unique kinds")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--output", help="Write the summary as JSON to this file")
+    parser.add_argument("--log-level", choices=LOG_LEVELS, default="WARNING")
+
+    local = parser.add_argument_group("in-process target")
+    local.add_argument("--llm", choices=("stub", "config", "none"), default="stub",
+                       help="stub LLM server, the configured OpenAI settings, or fallback answers only")
+    local.add_argument("--no-cache", action="store_true", help="Disable the answer cache")
+    local.add_argument("--llm-latency-ms", type=float, default=DEFAULT_STUB_CONFIG["latency_ms"])
+    local.add_argument("--llm-jitter-ms", type=float, default=DEFAULT_STUB_CONFIG["jitter_ms"])
+    local.add_argument("--llm-latency-distribution", choices=LATENCY_DISTRIBUTIONS,
+                       default=DEFAULT_STUB_CONFIG["latency_distribution"])
+    local.add_argument("--llm-latency-sigma", type=float, default=DEFAULT_STUB_CONFIG["latency_sigma"])
+    local.add_argument("--llm-slow-rate", type=float, default=DEFAULT_STUB_CONFIG["slow_rate"])
+    local.add_argument("--llm-slow-ms", type=float, default=DEFAULT_STUB_CONFIG["slow_ms"])
+    local.add_argument("--llm-error-rate", type=float, default=DEFAULT_STUB_CONFIG["error_rate"])
+    args = parser.parse_args()
+
+    # Per-request INFO lines would drown the report
+    configure_cli_logging(args.log_level)
+    try:
+        weights = QueryMix.parse(args.mix)
+        questions = _load_questions(args.questions) if args.questions else DEFAULT_QUESTIONS
+        mix = QueryMix(weights, getattr(config, "QUICK_QUESTIONS", []), questions, seed=args.seed)
+    except (ValueError, OSError, KeyError) as e:
+        parser.error(str(e))
+
+    stub = None
+    if args.url:
+        target = HTTPTarget(args.url)
+    else:
+        target, stub = build_chatbot_target(config, args)
+    mode = f"open loop at {args.rate}/s" if args.rate else "closed loop"
+    print(f"Load testing {target.name} target: {mode}, concurrency {args.concurrency}, mix {args.mix}")
+
+    try:
+        samples, elapsed = run_load(target, mix, args.duration, args.concurrency, args.rate, args.requests, args.seed)
+        summary = summarize(samples, elapsed, target.server_stages())
+    finally:
+        target.close()
+        if stub:
+            stub.stop()
+
+    summary["settings"] = {key: value for key, value in vars(args).items() if value is not None}
+    print_report(summary)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import re
+import sys
+import time
+import itertools
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Callable
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+@dataclass(slots=True)
+class TurnRecord:
+    """One question/answer exchange, without the retrieved context"""
+    turn_id: int
+    query: str
+    response: str
+    sources: List[str] = field(default_factory=list)
+    mode: str = "default"
+    timestamp: float = 0.0
+    base_response: Optional[str] = None  # Untransformed answer, re-rendered on mode switch
+    nbytes: int = 0
+
+    def __post_init__(self):
+        if self.base_response is None:
+            self.base_response = self.response
+        self.nbytes = self._measure()
+
+    def _measure(self) -> int:
+        # In default mode the rendered and base answers are the same object
+        base_bytes = 0 if self.base_response is self.response else sys.getsizeof(self.base_response)
+        return (
+            sys.getsizeof(self)
+            + sys.getsizeof(self.query)
+            + sys.getsizeof(self.response)
+            + base_bytes
+            + sys.getsizeof(self.sources)
+            + sum(sys.getsizeof(source) for source in self.sources)
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "turn_id": self.turn_id,
+            "query": self.query,
+            "response": self.response,
+            "sources": list(self.sources),
+            "mode": self.mode,
+            "timestamp": self.timestamp,
+            "base_response": self.base_response,
+        }
+
+
+class ConversationMemory:
+    """Bounded per-session conversation store.
+
+    Recent turns live in a ring buffer of compact TurnRecords. When the buffer
+    exceeds max_turns or max_bytes, the oldest turns are folded into a rolling
+    plain-text summary that is itself capped at summary_max_chars.
+    """
+
+    def __init__(self, max_turns: int = 20, max_bytes: int = 64 * 1024, summary_max_chars: int = 1500):
+        self.max_turns = max_turns
+        self.max_bytes = max_bytes
+        self.summary_max_chars = summary_max_chars
+        self.turns: "deque[TurnRecord]" = deque()
+        self.summary = ""
+        self.folded_turns = 0
+        self._turn_bytes = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def add_turn(self, query: str, response: str, sources: Optional[List[str]] = None,
+                 mode: str = "default", base_response: Optional[str] = None) -> TurnRecord:
+        """Record a turn, folding old turns into the summary to stay within limits"""
+        record = TurnRecord(
+            turn_id=next(self._ids),
+            query=query,
+            response=response,
+            sources=list(sources or []),
+            mode=mode,
+            timestamp=time.time(),
+            base_response=base_response,
+        )
+        with self._lock:
+            self.turns.append(record)
+            self._turn_bytes += record.nbytes
+            # Always keep the newest turn, even if it alone exceeds the byte cap
+            while len(self.turns) > 1 and (len(self.turns) > self.max_turns or self.size_bytes() > self.max_bytes):
+                self._fold(self.turns.popleft())
+        return record
+
+    def _fold(self, record: TurnRecord):
+        """Fold a turn into the rolling summary, keeping the most recent text"""
+        self._turn_bytes -= record.nbytes
+        self.folded_turns += 1
+
+        first_sentence = _SENTENCE_END.split(record.response.strip(), 1)[0]
+        line = f"- Q: {record.query[:100]} A: {first_sentence[:200]}"
+        summary = f"{self.summary}\n{line}" if self.summary else line
+        if len(summary) > self.summary_max_chars:
+            # Drop whole leading lines so the summary stays readable
+            summary = summary[-self.summary_max_chars:]
+            summary = summary[summary.find("\n") + 1:] if "\n" in summary else summary
+        self.summary = summary
+
+    def rerender(self, render: Callable[[str], str], mode: str):
+        """Re-render every stored turn from its base answer, e.g. after a mode switch"""
+        with self._lock:
+            for record in self.turns:
+                if record.mode == mode:
+                    continue
+                response = render(record.base_response)
+                # Share the base string when the mode leaves the answer unchanged
+                record.response = record.base_response if response == record.base_response else response
+                record.mode = mode
+                self._turn_bytes -= record.nbytes
+                record.nbytes = record._measure()
+                self._turn_bytes += record.nbytes
+            while len(self.turns) > 1 and self.size_bytes() > self.max_bytes:
+                self._fold(self.turns.popleft())
+
+    def size_bytes(self) -> int:
+        """Approximate memory held by the stored turns and summary"""
+        return self._turn_bytes + sys.getsizeof(self.summary)
+
+    def get_history(self, last_n: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Recent turns as plain dicts, oldest first; only the newest last_n if given"""
+        with self._lock:
+            records = self.turns
+            if last_n is not None:
+                records = itertools.islice(self.turns, max(0, len(self.turns) - last_n), None)
+            return [record.to_dict() for record in records]
+
+    def __len__(self) -> int:
+        return len(self.turns)
+
+    def clear(self):
+        with self._lock:
+            self.turns.clear()
+            self.summary = ""
+            self.folded_turns = 0
+            self._turn_bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "turns": len(self.turns),
+            "folded_turns": self.folded_turns,
+            "summary_chars": len(self.summary),
+            "bytes": self.size_bytes(),
+            "max_bytes": self.max_bytes,
+        }
@@ -0,0 +1,313 @@
+import time
+import inspect
+import logging
+import functools
+import threading
+from bisect import bisect_left
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds, from sub-millisecond cache hits to slow LLM calls
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Pipeline stages in the order they run, for display
+STAGES = ("cache_lookup", "embedding", "search", "rerank", "packing", "first_token", "generation",
+          "mode_transform", "cache_store", "total")
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram, as exposed to Prometheus"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate a quantile by linear interpolation within its bucket"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Exact quantile of raw samples (nearest rank), for benchmarks that keep every sample"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class RequestTrace:
+    """Timings and outcome of one question"""
+
+    __slots__ = ("kind", "started", "stages", "path", "coalesced", "context_tokens", "response_tokens")
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.started = time.time()
+        self.stages: Dict[str, float] = {}
+        self.path: Optional[str] = None
+        self.coalesced = False
+        self.context_tokens = 0
+        self.response_tokens = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "started": self.started,
+            "stages_ms": {stage: round(seconds * 1000, 2) for stage, seconds in self.stages.items()},
+            "path": self.path,
+            "coalesced": self.coalesced,
+            "context_tokens": self.context_tokens,
+            "response_tokens": self.response_tokens,
+        }
+
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("colligent_request_trace", default=None)
+
+
+class MetricsCollector:
+    """In-process aggregation of per-stage latencies and request outcomes.
+
+    Recording a stage is a perf_counter pair and a histogram update under one
+    lock, a few microseconds against stages measured in milliseconds.
+    """
+
+    def __init__(self, recent_requests: int = 50):
+        self.enabled = True
+        self._stages: Dict[str, Histogram] = {}
+        self._paths: Counter = Counter()
+        self._counters: Counter = Counter()
+        self._recent: "deque[RequestTrace]" = deque(maxlen=recent_requests)
+        self._listeners: List[Callable[[RequestTrace], None]] = []
+        self._lock = threading.Lock()
+
+    def observe_stage(self, stage: str, seconds: float):
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def record_request(self, trace: RequestTrace):
+        with self._lock:
+            self._paths[trace.path or "error"] += 1
+            self._counters["coalesced"] += trace.coalesced
+            self._counters["context_tokens"] += trace.context_tokens
+            self._counters["response_tokens"] += trace.response_tokens
+            self._recent.append(trace)
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(trace)
+
+    def add_listener(self, listener: Callable[[RequestTrace], None]):
+        """Call listener with every finished request trace (e.g. a load test keeping all samples)"""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[RequestTrace], None]):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def get_summary(self) -> Dict[str, Any]:
+        """Per-stage counts and latency quantiles in milliseconds, plus outcomes"""
+        with self._lock:
+            stages = {}
+            for stage in sorted(self._stages, key=lambda name: STAGES.index(name) if name in STAGES else len(STAGES)):
+                histogram = self._stages[stage]
+                stages[stage] = {
+                    "count": histogram.count,
+                    "mean_ms": round(histogram.sum / histogram.count * 1000, 2),
+                    "p50_ms": round(histogram.quantile(0.5) * 1000, 2),
+                    "p95_ms": round(histogram.quantile(0.95) * 1000, 2),
+                }
+            return {
+                "stages": stages,
+                "paths": dict(self._paths),
+                "coalesced": self._counters["coalesced"],
+                "context_tokens": self._counters["context_tokens"],
+                "response_tokens": self._counters["response_tokens"],
+            }
+
+    def get_recent_requests(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [trace.to_dict() for trace in self._recent]
+
+    def render_prometheus(self) -> str:
+        """Metrics in the Prometheus text exposition format"""
+        lines = [
+            "# HELP colligent_stage_seconds Time spent in each question-answering stage.",
+            "# TYPE colligent_stage_seconds histogram",
+        ]
+        with self._lock:
+            for stage, histogram in sorted(self._stages.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'colligent_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'colligent_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'colligent_stage_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+                lines.append(f'colligent_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+
+            lines += [
+                "# HELP colligent_requests_total Questions answered, by response path.",
+                "# TYPE colligent_requests_total counter",
+            ]
+            lines += [f'colligent_requests_total{{path="{path}"}} {count}' for path, count in sorted(self._paths.items())]
+            for name, help_text in (
+                ("coalesced", "Questions answered by joining an identical in-flight question."),
+                ("context_tokens", "Retrieved context tokens sent to the answer stage."),
+                ("response_tokens", "Tokens in returned answers."),
+            ):
+                lines += [
+                    f"# HELP colligent_{name}_total {help_text}",
+                    f"# TYPE colligent_{name}_total counter",
+                    f"colligent_{name}_total {self._counters[name]}",
+                ]
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsCollector()
+
+
+def observe(name: str, seconds: float):
+    """Record a stage duration in the collector and the current request trace"""
+    if not METRICS.enabled:
+        return
+    METRICS.observe_stage(name, seconds)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.stages[name] = trace.stages.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a pipeline stage into the collector and the current request trace"""
+    if not METRICS.enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+@contextmanager
+def track_request(kind: str = "ask") -> Iterator[Optional[RequestTrace]]:
+    """Trace one question; stages timed inside it are attributed to the request"""
+    if not METRICS.enabled:
+        yield None
+        return
+    trace = RequestTrace(kind)
+    token = _current_trace.set(trace)
+    start = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        elapsed = time.perf_counter() - start
+        trace.stages["total"] = elapsed
+        METRICS.observe_stage("total", elapsed)
+        METRICS.record_request(trace)
+        try:
+            _current_trace.reset(token)
+        except ValueError:
+            # A generator finished in a different context than it started in
+            pass
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+def traced(kind: str) -> Callable:
+    """Decorate a question-answering entry point (plain, async or generator) with track_request"""
+    def decorator(fn):
+        if inspect.isasyncgenfunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                with track_request(kind):
+                    async for item in fn(*args, **kwargs):
+                        yield item
+        elif inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with track_request(kind):
+                    return (yield from fn(*args, **kwargs))
+        elif inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                with track_request(kind):
+                    return await fn(*args, **kwargs)
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with track_request(kind):
+                    return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0].rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = METRICS.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+_metrics_server: Optional[ThreadingHTTPServer] = None
+_metrics_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0") -> Optional[ThreadingHTTPServer]:
+    """Serve /metrics from a background thread, once per process"""
+    global _metrics_server
+    with _metrics_server_lock:
+        if _metrics_server is None and port:
+            try:
+                _metrics_server = ThreadingHTTPServer((host, port), _MetricsHandler)
+                _metrics_server.daemon_threads = True
+                threading.Thread(target=_metrics_server.serve_forever, name="metrics-server", daemon=True).start()
+                logger.info(f"Serving Prometheus metrics on http://{host}:{port}/metrics")
+            except OSError as e:
+                logger.error(f"Could not start metrics server on port {port}: {e}")
+        return _metrics_server
+
+
+def configure_metrics(config):
+    """Apply the metrics settings and start the endpoint if a port is configured"""
+    METRICS.enabled = getattr(config, "ENABLE_METRICS", True)
+    if METRICS.enabled:
+        start_metrics_server(getattr(config, "METRICS_PORT", 0))
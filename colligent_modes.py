@@ -0,0 +1,160 @@
+import re
+from typing import List, Dict, Tuple, Set, Callable
+
+from colligent_keyword_matcher import KeywordAutomaton
+
+# Power Agent response modes and their descriptions
+MODE_DESCRIPTIONS = {
+    "default": "Default conversational mode",
+    "interview": "Professional interview mode - concise, professional, informative",
+    "storytelling": "Personal storytelling mode - longer, reflective, narrative",
+    "fast_facts": "Fast facts mode - bullet points, TL;DR format",
+    "humble_brag": "Humble brag mode - confident self-promotion, still grounded in truth",
+    "code_style": "Code style mode - technical implementation details, code examples, and architectural insights"
+}
+
+
+class ModeTranslator:
+    """Applies a set of literal replacements in a single left-to-right pass.
+
+    All patterns are compiled into one regex alternation (longest first), so
+    the text is scanned once no matter how many rules a mode has.
+    """
+
+    def __init__(self, replacements: List[Tuple[str, str]]):
+        self.replacements = dict(replacements)
+        if self.replacements:
+            alternation = "|".join(re.escape(old) for old in sorted(self.replacements, key=len, reverse=True))
+            self._pattern = re.compile(alternation)
+        else:
+            self._pattern = None
+
+    def translate(self, text: str) -> str:
+        if not self._pattern:
+            return text
+        return self._pattern.sub(lambda match: self.replacements[match.group(0)], text)
+
+
+# Sentences appended when a phrase occurs in the answer, in order
+STORYTELLING_SUFFIXES = [
+    (("research", "project"), " Looking back on this journey, I realize how much I've grown through these experiences."),
+    (("curiosity",), " This curiosity has been my driving force, pushing me to explore the unknown and challenge conventional thinking."),
+]
+
+HUMBLE_BRAG_SUFFIXES = [
+    (("diffusion models",), " This work represents a significant advancement in our understanding of cosmic structures."),
+    (("curiosity",), " This intellectual curiosity has consistently led me to innovative solutions and breakthrough discoveries."),
+]
+
+CODE_STYLE_SUFFIXES = [
+    (("diffusion models",), " In my implementation, I use a ContextU-Net architecture with residual connections, designed for conditional image generation using diffusion processes. The model is specifically tailored for processing 64x64 pixel astronomical images."),
+    (("machine learning",), " My approach involves implementing residual convolutional blocks with batch normalization and ReLU activation, supporting both residual and non-residual modes with dynamic channel adjustment."),
+    (("research",), " The architecture includes a downsampling path with 4 levels (UnetDown blocks), upsampling path with skip connections (UnetUp blocks), context embedding for conditional generation, and time embedding for diffusion timesteps."),
+    (("cosmology",), " For the training process, I implement noise perturbation using a diffusion schedule with beta values from 1e-4 to 0.02, MSE loss between predicted and true noise, and learning rate decay over 200 epochs with batch size 128."),
+    (("analysis",), " My evaluation pipeline includes pixel intensity histograms for comparing real vs generated image distributions, power spectrum analysis for spatial frequency characteristics, and PDF analysis for probability density function comparison."),
+]
+
+FAST_FACTS = [
+    ("data scientist", "🎯 **Role**: Data Scientist & Astrophysics Researcher"),
+    ("machine learning", "🤖 **Specialty**: Machine Learning applied to cosmology"),
+    ("diffusion models", "🔬 **Research**: Diffusion Models for Neutral Hydrogen Maps"),
+    ("21cm cosmology", "🌌 **Domain**: 21cm Cosmology & Neutral Hydrogen Analysis"),
+    ("curiosity", "💡 **Drive**: Curiosity-driven problem solving"),
+    ("collaboration", "🤝 **Style**: Collaborative team player"),
+]
+
+# Compiled once per process
+INTERVIEW_TRANSLATOR = ModeTranslator([("I'm", "I am"), ("I've", "I have"), ("I'll", "I will")])
+STORYTELLING_TRANSLATOR = ModeTranslator([("I am", "Let me tell you about how I became")])
+HUMBLE_BRAG_TRANSLATOR = ModeTranslator([
+    ("I am", "I'm proud to be"),
+    ("I work", "I excel at"),
+    ("I specialize", "I'm recognized for my expertise in"),
+    ("research", "groundbreaking research"),
+    ("machine learning", "cutting-edge machine learning"),
+    ("cosmology", "advanced cosmology"),
+])
+CODE_STYLE_TRANSLATOR = ModeTranslator([("I am", "From a technical implementation perspective, I am")])
+
+# Every phrase any mode reacts to, found in one pass over the answer. None of
+# the replacements add or remove these phrases, so detecting them on the base
+# answer matches detecting them after translation.
+RESPONSE_FEATURE_MATCHER = KeywordAutomaton(
+    [phrase for rules in (STORYTELLING_SUFFIXES, HUMBLE_BRAG_SUFFIXES, CODE_STYLE_SUFFIXES) for phrases, _ in rules for phrase in phrases]
+    + [phrase for phrase, _ in FAST_FACTS]
+)
+
+
+def _append_suffixes(response: str, features: Set[str], suffixes) -> str:
+    additions = [suffix for phrases, suffix in suffixes if any(phrase in features for phrase in phrases)]
+    return response + "".join(additions)
+
+
+def _interview(response: str, features: Set[str]) -> str:
+    """Concise and professional"""
+    response = INTERVIEW_TRANSLATOR.translate(response)
+
+    # Add professional framing
+    if "I am" in response and "data scientist" in features:
+        response = f"Professionally, {response}"
+
+    # Make it more structured: keep the first two sentences of long answers
+    if len(response) > 200:
+        sentences = response.split('. ')
+        if len(sentences) > 2:
+            response = '. '.join(sentences[:2]) + '.'
+
+    return response
+
+
+def _storytelling(response: str, features: Set[str]) -> str:
+    """Narrative and reflective"""
+    return _append_suffixes(STORYTELLING_TRANSLATOR.translate(response), features, STORYTELLING_SUFFIXES)
+
+
+def _fast_facts(response: str, features: Set[str]) -> str:
+    """Bullet points and TL;DR"""
+    facts = [fact for phrase, fact in FAST_FACTS if phrase in features]
+    if facts:
+        return "**Fast Facts About Collins:**\n\n" + "\n".join(facts)
+
+    # Fallback to bullet points from original response
+    sentences = response.split('. ')
+    bullet_points = [f"• {sentence.strip()}" for sentence in sentences if sentence.strip()]
+    return "**Quick Summary:**\n\n" + "\n".join(bullet_points)
+
+
+def _humble_brag(response: str, features: Set[str]) -> str:
+    """Confident self-promotion"""
+    return _append_suffixes(HUMBLE_BRAG_TRANSLATOR.translate(response), features, HUMBLE_BRAG_SUFFIXES)
+
+
+def _code_style(response: str, features: Set[str]) -> str:
+    """Technical and implementation-focused"""
+    return _append_suffixes(CODE_STYLE_TRANSLATOR.translate(response), features, CODE_STYLE_SUFFIXES)
+
+
+MODE_TRANSFORMS: Dict[str, Callable[[str, Set[str]], str]] = {
+    "interview": _interview,
+    "storytelling": _storytelling,
+    "fast_facts": _fast_facts,
+    "humble_brag": _humble_brag,
+    "code_style": _code_style,
+}
+
+
+def transform_response(response: str, mode: str) -> str:
+    """Render a base answer in the given mode"""
+    transform = MODE_TRANSFORMS.get(mode)
+    if not transform:
+        return response
+    return transform(response, RESPONSE_FEATURE_MATCHER.find_all(response))
+
+
+def render_all_modes(response: str) -> Dict[str, str]:
+    """Render a base answer in every mode, detecting its features once"""
+    features = RESPONSE_FEATURE_MATCHER.find_all(response)
+    rendered = {mode: response for mode in MODE_DESCRIPTIONS}
+    for mode, transform in MODE_TRANSFORMS.items():
+        rendered[mode] = transform(response, features)
+    return rendered
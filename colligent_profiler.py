@@ -0,0 +1,215 @@
+import os
+import sys
+import time
+import random
+import inspect
+import logging
+import functools
+import itertools
+import threading
+from collections import Counter, deque
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Wall-clock sampling profiler for one thread.
+
+    A background thread snapshots the target thread's stack every interval
+    and counts identical stacks, which is cheap enough to leave on for a
+    single request. Stacks are cut at root_frame, so only frames below the
+    profiled call are kept; samples taken while the thread is outside it
+    (e.g. a streaming consumer between tokens) are counted as such.
+    """
+
+    def __init__(self, interval: float = 0.005, root_frame=None, thread_id: Optional[int] = None):
+        self.interval = interval
+        self.root_frame = root_frame
+        self.thread_id = thread_id or threading.get_ident()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self._started = 0.0
+
+    def start(self) -> "SamplingProfiler":
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self._started
+
+    def __enter__(self) -> "SamplingProfiler":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None or self._stop.is_set():
+                # Thread gone, or stopped while we waited for the GIL
+                return
+            self._sample(frame)
+
+    def _sample(self, frame):
+        labels = []
+        while frame is not None and frame is not self.root_frame:
+            labels.append(_frame_label(frame))
+            frame = frame.f_back
+        if self.root_frame is not None and frame is None:
+            stack = "[outside request]"
+        else:
+            stack = ";".join(reversed(labels)) or "[idle]"
+        self.stacks[stack] += 1
+        self.samples += 1
+
+    def to_collapsed(self) -> str:
+        """Stacks in the collapsed format read by flamegraph.pl and speedscope"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top_functions(self, n: int = 10) -> List[Dict[str, Any]]:
+        """Functions with the most samples at the top of the stack"""
+        leaves: Counter = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return [
+            {"function": leaf, "samples": count, "share": round(count / self.samples, 3)}
+            for leaf, count in leaves.most_common(n)
+        ]
+
+
+class ProfileStore:
+    """Decides which requests to profile and keeps their collapsed-stack files"""
+
+    def __init__(self, directory: str, sample_rate: float = 0.0, interval_ms: float = 5.0, max_files: int = 50):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.interval = interval_ms / 1000
+        self.max_files = max_files
+        self._recent: "deque[Dict[str, Any]]" = deque(maxlen=max_files)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def should_profile(self, requested: bool = False) -> bool:
+        return requested or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    def save(self, kind: str, label: str, profiler: SamplingProfiler) -> Optional[Dict[str, Any]]:
+        """Write a profile to disk and remember it for the debug panel"""
+        with self._lock:
+            profile_id = next(self._ids)
+        filename = f"{time.strftime('%Y%m%d-%H%M%S')}-{kind}-{os.getpid()}-{profile_id}.folded"
+        path = os.path.join(self.directory, filename)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(profiler.to_collapsed())
+        except OSError as e:
+            logger.error(f"Error writing profile {path}: {e}")
+            return None
+
+        record = {
+            "kind": kind,
+            "label": label[:100],
+            "path": path,
+            "samples": profiler.samples,
+            "duration_ms": round(profiler.duration * 1000, 1),
+            "created": time.time(),
+            "top_functions": profiler.top_functions(),
+        }
+        with self._lock:
+            self._recent.append(record)
+        self._prune()
+        logger.info(f"Profiled {kind} '{record['label']}': {profiler.samples} samples "
+                    f"over {record['duration_ms']} ms -> {path}")
+        return record
+
+    def _prune(self):
+        """Keep only the newest max_files profiles on disk"""
+        try:
+            files = sorted(
+                (os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith(".folded")),
+                key=os.path.getmtime,
+            )
+            for path in files[:-self.max_files]:
+                os.remove(path)
+        except OSError as e:
+            logger.warning(f"Error pruning profiles in {self.directory}: {e}")
+
+    def get_recent(self) -> List[Dict[str, Any]]:
+        """Profiles taken by this process, newest first, whose files still exist"""
+        with self._lock:
+            recent = list(self._recent)
+        return [record for record in reversed(recent) if os.path.exists(record["path"])]
+
+
+_shared_store: Optional[ProfileStore] = None
+_shared_store_lock = threading.Lock()
+
+
+def get_profile_store(config) -> ProfileStore:
+    """Return the process-wide profile store"""
+    global _shared_store
+    with _shared_store_lock:
+        if _shared_store is None:
+            _shared_store = ProfileStore(
+                directory=getattr(config, "PROFILE_DIR", "profiles"),
+                sample_rate=getattr(config, "PROFILE_SAMPLE_RATE", 0.0),
+                interval_ms=getattr(config, "PROFILE_INTERVAL_MS", 5.0),
+                max_files=getattr(config, "PROFILE_MAX_FILES", 50),
+            )
+        return _shared_store
+
+
+def profiled(kind: str) -> Callable:
+    """Profile a chatbot method when asked to with profile=True, or by sampling.
+
+    The wrapped method accepts an extra profile keyword argument; the first
+    positional argument, if any, labels the profile (e.g. the question).
+    """
+    def decorator(fn):
+        def begin(chatbot, requested, args, root_frame):
+            store = get_profile_store(chatbot.config)
+            if not store.should_profile(requested):
+                return None, None
+            label = str(args[0]) if args else kind
+            return store, (label, SamplingProfiler(store.interval, root_frame=root_frame).start())
+
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def wrapper(self, *args, profile: bool = False, **kwargs):
+                store, active = begin(self, profile, args, sys._getframe())
+                if store is None:
+                    return (yield from fn(self, *args, **kwargs))
+                label, profiler = active
+                try:
+                    return (yield from fn(self, *args, **kwargs))
+                finally:
+                    profiler.stop()
+                    store.save(kind, label, profiler)
+        else:
+            @functools.wraps(fn)
+            def wrapper(self, *args, profile: bool = False, **kwargs):
+                store, active = begin(self, profile, args, sys._getframe())
+                if store is None:
+                    return fn(self, *args, **kwargs)
+                label, profiler = active
+                try:
+                    return fn(self, *args, **kwargs)
+                finally:
+                    profiler.stop()
+                    store.save(kind, label, profiler)
+        return wrapper
+    return decorator
@@ -0,0 +1,251 @@
+import os
+import time
+import sqlite3
+import logging
+import ipaddress
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Budgets a request can be charged to
+LLM_BUDGET = "llm"      # Answers that call the LLM and cost money
+CACHE_BUDGET = "cache"  # Answers served from the cache or the local fallback engine
+
+
+def parse_trusted_proxies(value) -> List[ipaddress._BaseNetwork]:
+    """Networks from a comma-separated string (or list) of proxy IPs and CIDRs; invalid entries are skipped"""
+    entries = value.split(",") if isinstance(value, str) else (value or [])
+    networks = []
+    for entry in entries:
+        entry = str(entry).strip()
+        if not entry:
+            continue
+        try:
+            networks.append(ipaddress.ip_network(entry, strict=False))
+        except ValueError:
+            logger.error(f"Ignoring invalid trusted proxy {entry!r}")
+    return networks
+
+
+def _is_trusted(address: str, networks: Iterable[ipaddress._BaseNetwork]) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in networks)
+
+
+def resolve_client_address(peer: Optional[str], forwarded_for: Optional[str],
+                           trusted_proxies: List[ipaddress._BaseNetwork]) -> Optional[str]:
+    """The address to rate-limit a request by.
+
+    X-Forwarded-For is written by the client as much as by proxies, so it is
+    only read when the connection comes from a trusted proxy (or, where the
+    peer is unknown, when trusted proxies are configured at all). The client
+    is then the rightmost hop that no trusted proxy added; anything to its
+    left is whatever the client chose to send. Returns None when there is
+    neither a usable peer nor a trusted header.
+    """
+    if not trusted_proxies or (peer is not None and not _is_trusted(peer, trusted_proxies)):
+        return peer
+    hops = [hop.strip() for hop in (forwarded_for or "").split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not _is_trusted(hop, trusted_proxies):
+            return hop
+    return hops[0] if hops else peer
+
+
+class MemoryBucketStore:
+    """Token buckets held in this process.
+
+    Each client and budget pair is two floats, refilled lazily from the time
+    elapsed since the last request, so a check is O(1) regardless of how
+    many requests a client has made. Buckets that have refilled completely
+    carry no information and are dropped now and then to bound memory.
+    """
+
+    def __init__(self):
+        self._buckets: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, capacity: float, now: Optional[float] = None) -> float:
+        """Take one token; return 0 if allowed, else seconds until one is available"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [capacity, now]
+            tokens = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            if tokens >= 1:
+                bucket[0] = tokens - 1
+                wait = 0.0
+            else:
+                bucket[0] = tokens
+                wait = (1 - tokens) / rate
+            return wait
+
+    def prune(self, max_idle_seconds: float = 600):
+        """Drop buckets idle long enough to have refilled"""
+        now = time.monotonic()
+        with self._lock:
+            idle = [key for key, (_, updated) in self._buckets.items() if now - updated > max_idle_seconds]
+            for key in idle:
+                del self._buckets[key]
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class SQLiteBucketStore:
+    """Token buckets in a SQLite file, shared by every process that opens it.
+
+    Each take is one short IMMEDIATE transaction, which serializes the
+    read-refill-write across worker processes. Timestamps are wall-clock
+    time, since monotonic clocks are not comparable between processes.
+    """
+
+    def __init__(self, path: str, timeout: float = 5.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_buckets "
+                "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, rate: float, capacity: float, now: Optional[float] = None) -> float:
+        """Take one token; return 0 if allowed, else seconds until one is available"""
+        now = time.time() if now is None else now
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?", (key,)).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + max(0.0, now - row[1]) * rate)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            if not wait:
+                tokens -= 1
+            conn.execute(
+                "INSERT INTO rate_limit_buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def prune(self, max_idle_seconds: float = 600):
+        """Delete buckets idle long enough to have refilled"""
+        conn = self._connect()
+        conn.execute("DELETE FROM rate_limit_buckets WHERE updated < ?", (time.time() - max_idle_seconds,))
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM rate_limit_buckets").fetchone()[0]
+
+
+class RateLimiter:
+    """Per-client token-bucket limits with separate LLM and cache budgets.
+
+    The LLM budget allows requests_per_minute answers that call the LLM, with
+    bursts up to the same number; cache-served answers cost nothing upstream
+    and get cache_multiplier times as much. Every prune_every checks, buckets
+    idle for over max_idle_seconds are pruned from the store, so one-off
+    client IDs do not accumulate.
+    """
+
+    def __init__(self, requests_per_minute: int = 20, cache_multiplier: float = 5.0, store=None,
+                 prune_every: int = 1000, max_idle_seconds: float = 600):
+        self.budgets = {
+            LLM_BUDGET: float(requests_per_minute),
+            CACHE_BUDGET: float(requests_per_minute * cache_multiplier),
+        }
+        self.store = store if store is not None else MemoryBucketStore()
+        self.prune_every = max(1, prune_every)
+        # A bucket refills completely within a minute, so pruning sooner than that would reset limits
+        self.max_idle_seconds = max(max_idle_seconds, 60.0)
+        self.stats = {"allowed": 0, "limited": 0, "errors": 0}
+        self._stats_lock = threading.Lock()
+        self._checks = 0
+
+    def check(self, client_id: str, budget: str = LLM_BUDGET) -> Tuple[bool, float]:
+        """Charge one request to a client's budget; return (allowed, retry_after_seconds)"""
+        per_minute = self.budgets[budget]
+        try:
+            wait = self.store.take(f"{budget}:{client_id}", per_minute / 60, per_minute)
+        except sqlite3.Error as e:
+            # Fail open: a locked or broken database should not take the app down
+            logger.error(f"Rate limit store error for {client_id}: {e}")
+            self._count("errors")
+            return True, 0.0
+        self._count("allowed" if not wait else "limited")
+        if self._count_check() % self.prune_every == 0:
+            self.prune()
+        return not wait, wait
+
+    def prune(self):
+        try:
+            self.store.prune(self.max_idle_seconds)
+        except sqlite3.Error as e:
+            logger.error(f"Could not prune rate limit buckets: {e}")
+
+    def _count(self, stat: str):
+        with self._stats_lock:
+            self.stats[stat] += 1
+
+    def _count_check(self) -> int:
+        with self._stats_lock:
+            self._checks += 1
+            return self._checks
+
+    def get_stats(self) -> Dict[str, object]:
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats.update({
+            "backend": type(self.store).__name__,
+            "llm_per_minute": self.budgets[LLM_BUDGET],
+            "cache_per_minute": self.budgets[CACHE_BUDGET],
+        })
+        return stats
+
+
+_shared_limiter: Optional[RateLimiter] = None
+_shared_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter(config) -> Optional[RateLimiter]:
+    """Return the process-wide rate limiter, or None if rate limiting is disabled"""
+    global _shared_limiter
+    if not getattr(config, "ENABLE_RATE_LIMITING", False):
+        return None
+    with _shared_limiter_lock:
+        if _shared_limiter is None:
+            store = None
+            db_path = getattr(config, "RATE_LIMIT_DB_PATH", "")
+            if db_path:
+                try:
+                    store = SQLiteBucketStore(db_path)
+                    logger.info(f"Sharing rate limits through {db_path}")
+                except (sqlite3.Error, OSError) as e:
+                    logger.error(f"Could not open rate limit database {db_path}, limiting per process: {e}")
+            _shared_limiter = RateLimiter(
+                requests_per_minute=getattr(config, "MAX_REQUESTS_PER_MINUTE", 20),
+                cache_multiplier=getattr(config, "RATE_LIMIT_CACHE_MULTIPLIER", 5.0),
+                store=store,
+                prune_every=getattr(config, "RATE_LIMIT_PRUNE_EVERY", 1000),
+            )
+        return _shared_limiter
@@ -0,0 +1,205 @@
+import re
+import math
+import time
+import logging
+import threading
+from collections import Counter
+from dataclasses import replace
+from typing import List, Dict, Any, Optional
+
+from colligent_retrieval import RetrievalResult
+
+logger = logging.getLogger(__name__)
+
+# Try to import the cross-encoder, but rerank lexically without it
+try:
+    from sentence_transformers import CrossEncoder
+    CROSS_ENCODER_AVAILABLE = True
+except ImportError:
+    CrossEncoder = None
+    CROSS_ENCODER_AVAILABLE = False
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+# Words too common to say anything about relevance
+STOPWORDS = frozenset("""
+a about am an and are as at be by can do does for from had has have how i in is it its me my of on or
+so than that the their them they this to was we were what when where which who why will with you your
+""".split())
+
+# Weights of the normalized features in the combined rerank score
+DENSE_WEIGHT = 0.5
+BM25_WEIGHT = 0.35
+PROXIMITY_WEIGHT = 0.15
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens"""
+    return _WORD.findall(text.lower())
+
+
+def query_terms(query: str) -> List[str]:
+    """Distinct content words of a query, in order"""
+    return list(dict.fromkeys(token for token in tokenize(query) if token not in STOPWORDS))
+
+
+def proximity_score(tokens: List[str], terms: List[str]) -> float:
+    """How completely and how tightly a chunk covers the query terms.
+
+    Finds the shortest window containing every distinct query term that
+    occurs in the chunk; the score is (terms found / query terms) times
+    (terms found / window length), so 1.0 means all terms side by side.
+    """
+    wanted = set(terms)
+    positions = [(i, token) for i, token in enumerate(tokens) if token in wanted]
+    found = len({token for _, token in positions})
+    if not found:
+        return 0.0
+
+    # Classic minimum covering window over the term positions
+    best = len(tokens)
+    counts: Counter = Counter()
+    covered = 0
+    left = 0
+    for right, (position, token) in enumerate(positions):
+        counts[token] += 1
+        if counts[token] == 1:
+            covered += 1
+        while covered == found:
+            start, left_token = positions[left]
+            best = min(best, position - start + 1)
+            counts[left_token] -= 1
+            if counts[left_token] == 0:
+                covered -= 1
+            left += 1
+    return (found / len(terms)) * (found / best)
+
+
+class LexicalReranker:
+    """Reorders an over-fetched candidate set with cheap CPU features.
+
+    Each candidate's dense retrieval score is combined with BM25 (statistics
+    taken over the candidate set) and a term-proximity score. If a local
+    cross-encoder is configured, it then reorders the leading candidates,
+    scoring only as many pairs as its measured speed allows within the
+    latency budget.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, cross_encoder_model: str = "",
+                 latency_budget_ms: float = 150, cross_encoder_candidates: int = 10):
+        self.k1 = k1
+        self.b = b
+        self.cross_encoder_model = cross_encoder_model
+        self.latency_budget = latency_budget_ms / 1000
+        self.cross_encoder_candidates = cross_encoder_candidates
+        self._cross_encoder = None
+        self._seconds_per_pair: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def rerank(self, query: str, results: List[RetrievalResult], top_n: int) -> List[RetrievalResult]:
+        """Return the top_n results, best first, with rerank_score set"""
+        terms = query_terms(query)
+        if not results or not terms:
+            return results[:top_n]
+
+        scored = sorted(zip(self._lexical_scores(terms, results), results), key=lambda pair: pair[0], reverse=True)
+        reranked = [replace(result, rerank_score=round(score, 4)) for score, result in scored]
+
+        if self.cross_encoder_model:
+            reranked = self._cross_encode(query, reranked)
+        return reranked[:top_n]
+
+    def _lexical_scores(self, terms: List[str], results: List[RetrievalResult]) -> List[float]:
+        docs = [tokenize(result.text) for result in results]
+        n = len(docs)
+        avg_len = sum(len(doc) for doc in docs) / n or 1.0
+        doc_freq = Counter(term for doc in docs for term in set(doc) & set(terms))
+
+        bm25 = []
+        proximity = []
+        for doc in docs:
+            tf = Counter(doc)
+            score = 0.0
+            for term in terms:
+                if not tf[term]:
+                    continue
+                idf = math.log(1 + (n - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5))
+                score += idf * tf[term] * (self.k1 + 1) / (tf[term] + self.k1 * (1 - self.b + self.b * len(doc) / avg_len))
+            bm25.append(score)
+            proximity.append(proximity_score(doc, terms))
+
+        dense = _min_max([result.score for result in results])
+        bm25 = _min_max(bm25)
+        return [
+            DENSE_WEIGHT * d + BM25_WEIGHT * l + PROXIMITY_WEIGHT * p
+            for d, l, p in zip(dense, bm25, proximity)
+        ]
+
+    def _load_cross_encoder(self):
+        with self._lock:
+            if self._cross_encoder is None and CROSS_ENCODER_AVAILABLE:
+                try:
+                    model = CrossEncoder(self.cross_encoder_model)
+                    # Time one pair so the first real call can respect the budget
+                    start = time.perf_counter()
+                    model.predict([("warm up", "warm up")])
+                    self._seconds_per_pair = time.perf_counter() - start
+                    self._cross_encoder = model
+                    logger.info(f"Loaded cross-encoder {self.cross_encoder_model} "
+                                f"({self._seconds_per_pair * 1000:.1f} ms/pair)")
+                except Exception as e:
+                    logger.error(f"Error loading cross-encoder {self.cross_encoder_model}: {e}")
+                    self.cross_encoder_model = ""
+            return self._cross_encoder
+
+    def _cross_encode(self, query: str, results: List[RetrievalResult]) -> List[RetrievalResult]:
+        model = self._load_cross_encoder()
+        if model is None:
+            return results
+
+        affordable = int(self.latency_budget / self._seconds_per_pair) if self._seconds_per_pair else 0
+        count = min(len(results), self.cross_encoder_candidates, affordable)
+        if count < 2:
+            return results
+
+        start = time.perf_counter()
+        scores = model.predict([(query, result.text) for result in results[:count]])
+        elapsed = time.perf_counter() - start
+        # Moving average of the per-pair cost sizes the next call
+        self._seconds_per_pair = 0.8 * self._seconds_per_pair + 0.2 * elapsed / count
+
+        head = sorted(zip(scores, results[:count]), key=lambda pair: pair[0], reverse=True)
+        head = [replace(result, rerank_score=round(1 / (1 + math.exp(-float(score))), 4)) for score, result in head]
+        return head + results[count:]
+
+    def get_info(self) -> Dict[str, Any]:
+        return {
+            "cross_encoder": self.cross_encoder_model or None,
+            "cross_encoder_ms_per_pair": round(self._seconds_per_pair * 1000, 2) if self._seconds_per_pair else None,
+            "latency_budget_ms": self.latency_budget * 1000,
+        }
+
+
+def _min_max(values: List[float]) -> List[float]:
+    low, high = min(values), max(values)
+    if high == low:
+        return [1.0 if high > 0 else 0.0] * len(values)
+    return [(value - low) / (high - low) for value in values]
+
+
+_shared_reranker: Optional[LexicalReranker] = None
+_shared_reranker_lock = threading.Lock()
+
+
+def get_reranker(config) -> Optional[LexicalReranker]:
+    """Return the process-wide reranker, so a cross-encoder is loaded once"""
+    global _shared_reranker
+    if not getattr(config, "ENABLE_RERANKING", False):
+        return None
+    with _shared_reranker_lock:
+        if _shared_reranker is None:
+            _shared_reranker = LexicalReranker(
+                cross_encoder_model=getattr(config, "RERANK_CROSS_ENCODER_MODEL", ""),
+                latency_budget_ms=getattr(config, "RERANK_LATENCY_BUDGET_MS", 150),
+            )
+        return _shared_reranker
@@ -0,0 +1,84 @@
+import hashlib
+from dataclasses import dataclass, field, asdict
+from typing import List, Dict, Any, Optional
+
+from colligent_tokens import format_context
+
+
+@dataclass(slots=True)
+class RetrievalResult:
+    """A retrieved chunk with its provenance and relevance score"""
+    chunk_id: str
+    source: str
+    score: float
+    text: str
+    start: Optional[int] = None
+    end: Optional[int] = None
+    rerank_score: Optional[float] = None  # Set when the reranker reordered the candidates
+
+    @classmethod
+    def from_document(cls, doc, score: float) -> "RetrievalResult":
+        """Build a result from a LangChain document and its relevance score"""
+        metadata = doc.metadata or {}
+        source = metadata.get('source', 'Unknown')
+        text = doc.page_content.strip()
+        start = metadata.get('start_index')
+        chunk_id = metadata.get('chunk_id') or make_chunk_id(source, start, text)
+        end = start + len(doc.page_content) if start is not None else None
+        return cls(chunk_id=chunk_id, source=source, score=float(score), text=text, start=start, end=end)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def make_chunk_id(source: str, start: Optional[int], text: str) -> str:
+    """Stable identifier for a chunk of a source document"""
+    digest = hashlib.sha1(f"{source}\0{start}\0{text}".encode("utf-8")).hexdigest()
+    return digest[:12]
+
+
+def context_header(rank: int, source: str) -> str:
+    """Header placed above each chunk in the prompt"""
+    return f"Source {rank} ({source}):"
+
+
+@dataclass
+class RetrievedContext:
+    """The chunks selected for a question, packed into the token budget"""
+    results: List[RetrievalResult] = field(default_factory=list)
+    tokens: int = 0
+    error: Optional[str] = None
+
+    def __bool__(self) -> bool:
+        return bool(self.results)
+
+    @property
+    def sources(self) -> List[str]:
+        """Unique source documents, in rank order"""
+        return list(dict.fromkeys(result.source for result in self.results))
+
+    @property
+    def plain_text(self) -> str:
+        """Chunk texts without headers, for the local fallback engine"""
+        return "\n\n".join(result.text for result in self.results)
+
+    def format_for_prompt(self) -> str:
+        """Render the chunks with their source headers for the LLM prompt"""
+        return format_context(
+            [(context_header(rank, result.source), result.text) for rank, result in enumerate(self.results, 1)]
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "results": [result.to_dict() for result in self.results],
+            "tokens": self.tokens,
+            "error": self.error,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RetrievedContext":
+        return cls(
+            results=[RetrievalResult(**result) for result in data.get("results", [])],
+            tokens=data.get("tokens", 0),
+            error=data.get("error"),
+        )
@@ -0,0 +1,279 @@
+"""Retrieval quality-vs-latency benchmark over the golden question set.
+
+Every question in golden_questions.jsonl lists short passages from data/
+that answer it. For each retrieval configuration (chunk size/overlap,
+retriever, rerank on/off, k), the benchmark reports recall@k (share of a
+question's passages found in the top k chunks), MRR, the mean tokens those
+chunks would add to the prompt, and per-query latency.
+
+Retrievers:
+    keyword  the vector store's fallback (query words contained in the chunk)
+    bm25     BM25 over all chunks
+    dense    cosine similarity of EMBEDDING_MODEL embeddings (needs sentence-transformers)
+    hybrid   reciprocal rank fusion of dense and bm25
+
+Usage:
+    python colligent_retrieval_benchmark.py
+    python colligent_retrieval_benchmark.py --chunking 500:100 1000:200 1500:300 --k 3 5 --output retrieval.md
+"""
+import re
+import copy
+import json
+import math
+import time
+import logging
+import argparse
+from collections import Counter
+from dataclasses import replace
+from typing import Any, Dict, List, Optional, Tuple
+
+from colligent_config import Config, configure_cli_logging
+from colligent_document_processor import DocumentProcessor
+from colligent_dimension_report import format_report
+from colligent_metrics import percentile
+from colligent_reranker import LexicalReranker, tokenize, query_terms
+from colligent_retrieval import RetrievalResult
+from colligent_tokens import count_tokens
+from colligent_vector_db import rank_by_keywords
+
+logger = logging.getLogger(__name__)
+
+# Dense retrieval needs the embedding model; the other retrievers run anywhere
+try:
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+    DENSE_AVAILABLE = True
+except ImportError:
+    np = None
+    SentenceTransformer = None
+    DENSE_AVAILABLE = False
+
+METHODS = ("keyword", "bm25", "dense", "hybrid")
+DENSE_METHODS = ("dense", "hybrid")
+DEFAULT_CHUNKING = ["500:100", "1000:200", "1500:300"]
+DEFAULT_KS = [1, 3, 5]
+RRF_K = 60  # Reciprocal rank fusion constant
+
+
+def normalize(text: str) -> str:
+    """Lowercase words joined by single spaces, so passages match across PDF and text extraction"""
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+def load_golden_set(path: str) -> List[Dict[str, Any]]:
+    """Golden questions as dicts with question, passages and (optionally) id and sources"""
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                if not record.get("question") or not record.get("passages"):
+                    raise ValueError(f"{path}: every record needs a question and passages")
+                record["normalized_passages"] = [normalize(p) for p in record["passages"]]
+                questions.append(record)
+    return questions
+
+
+class BM25Index:
+    """BM25 over a fixed list of texts (statistics over the whole corpus, unlike the reranker's)"""
+
+    def __init__(self, texts: List[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.docs = [Counter(tokenize(text)) for text in texts]
+        self.lengths = [sum(doc.values()) for doc in self.docs]
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 1.0
+        doc_freq = Counter(term for doc in self.docs for term in doc)
+        n = len(self.docs)
+        self.idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in doc_freq.items()}
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        terms = [term for term in query_terms(query) if term in self.idf]
+        scores = []
+        for i, (doc, length) in enumerate(zip(self.docs, self.lengths)):
+            score = 0.0
+            for term in terms:
+                tf = doc[term]
+                if tf:
+                    score += self.idf[term] * tf * (self.k1 + 1) / (
+                        tf + self.k1 * (1 - self.b + self.b * length / self.avg_length))
+            if score > 0:
+                scores.append((i, score))
+        scores.sort(key=lambda pair: pair[1], reverse=True)
+        return scores[:k]
+
+
+class ChunkedCorpus:
+    """The documents split with one chunking configuration, indexed for every retriever"""
+
+    def __init__(self, config: Config, documents: List[Any], chunk_size: int, chunk_overlap: int, encoder=None):
+        chunk_config = copy.copy(config)
+        chunk_config.CHUNK_SIZE = chunk_size
+        chunk_config.CHUNK_OVERLAP = chunk_overlap
+        chunk_config.CHUNKING_PROFILE_PATH = ""  # Exactly the chunking under test, not a tuned profile
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.chunks = DocumentProcessor(chunk_config).split_documents(documents)
+        if not self.chunks:
+            raise RuntimeError(f"No chunks created with chunk size {chunk_size} and overlap {chunk_overlap}")
+        texts = [chunk.page_content for chunk in self.chunks]
+        self.normalized = [normalize(text) for text in texts]
+        self.lowered = [text.lower() for text in texts]
+        self.tokens = [count_tokens(text, config.OPENAI_MODEL) for text in texts]
+        self.results = [RetrievalResult.from_document(chunk, 0.0) for chunk in self.chunks]
+        self.position = {result.chunk_id: i for i, result in enumerate(self.results)}
+        self.bm25 = BM25Index(texts)
+        self.encoder = encoder
+        self.embeddings = encoder.encode(texts, normalize_embeddings=True) if encoder is not None else None
+
+    def embed(self, query: str):
+        return self.encoder.encode([query], normalize_embeddings=True)[0]
+
+    def search(self, method: str, query: str, k: int) -> List[Tuple[int, float]]:
+        """Top k (chunk index, score) pairs from one retriever"""
+        if method == "keyword":
+            words = max(len(query.split()), 1)
+            return [(i, score / words) for i, score in rank_by_keywords(self.lowered, query, k)]
+        if method == "bm25":
+            return self.bm25.search(query, k)
+        if method == "dense":
+            similarities = self.embeddings @ self.embed(query)
+            return [(int(i), float(similarities[i])) for i in np.argsort(-similarities)[:k]]
+        if method == "hybrid":
+            depth = max(k, 50)
+            fused = Counter()
+            for ranking in (self.search("dense", query, depth), self.bm25.search(query, depth)):
+                for rank, (i, _) in enumerate(ranking):
+                    fused[i] += 1 / (RRF_K + rank + 1)
+            return fused.most_common(k)
+        raise ValueError(f"Unknown retriever {method!r}; use {METHODS}")
+
+    def retrieve(self, method: str, query: str, k: int, reranker: Optional[LexicalReranker] = None,
+                 candidates: int = 50) -> List[int]:
+        """Chunk indexes of the top k, optionally over-fetched and reranked like the chatbot does"""
+        if reranker is None:
+            return [i for i, _ in self.search(method, query, k)]
+        ranked = self.search(method, query, max(k, candidates))
+        results = [replace(self.results[i], score=score) for i, score in ranked]
+        return [self.position[result.chunk_id] for result in reranker.rerank(query, results, k)]
+
+
+def score_ranking(corpus: ChunkedCorpus, ranking: List[int], passages: List[str], k: int) -> Tuple[float, float, int]:
+    """recall@k, reciprocal rank of the first relevant chunk, and context tokens of the top k"""
+    top = ranking[:k]
+    found = {p for p in passages for i in top if p in corpus.normalized[i]}
+    reciprocal_rank = 0.0
+    for rank, i in enumerate(top, 1):
+        if any(p in corpus.normalized[i] for p in passages):
+            reciprocal_rank = 1 / rank
+            break
+    return len(found) / len(passages), reciprocal_rank, sum(corpus.tokens[i] for i in top)
+
+
+def evaluate_corpus(corpus: ChunkedCorpus, golden: List[Dict[str, Any]], methods: List[str], ks: List[int],
+                    rerank_options: List[bool], reranker: LexicalReranker, candidates: int) -> List[Dict[str, Any]]:
+    """One row per retriever, rerank setting and k for an already chunked corpus"""
+    rows = []
+    depth = max(ks)
+    for method in methods:
+        for rerank in rerank_options:
+            rankings, latencies = [], []
+            for item in golden:
+                start = time.perf_counter()
+                rankings.append(corpus.retrieve(method, item["question"], depth,
+                                                reranker if rerank else None, candidates))
+                latencies.append(time.perf_counter() - start)
+            for k in ks:
+                scores = [score_ranking(corpus, ranking, item["normalized_passages"], k)
+                          for ranking, item in zip(rankings, golden)]
+                rows.append({
+                    "chunking": f"{corpus.chunk_size}/{corpus.chunk_overlap}",
+                    "chunks": len(corpus.chunks),
+                    "retriever": method,
+                    "rerank": "on" if rerank else "off",
+                    "k": k,
+                    "recall@k": sum(s[0] for s in scores) / len(scores),
+                    "mrr": sum(s[1] for s in scores) / len(scores),
+                    "context_tokens": sum(s[2] for s in scores) / len(scores),
+                    "latency_ms": sum(latencies) / len(latencies) * 1000,
+                    "p95_ms": percentile(latencies, 0.95) * 1000,
+                })
+    return rows
+
+
+def parse_chunking(spec: str) -> Tuple[int, int]:
+    """Parse "size:overlap" """
+    size, _, overlap = spec.partition(":")
+    chunk_size, chunk_overlap = int(size), int(overlap or 0)
+    if chunk_size <= 0 or not 0 <= chunk_overlap < chunk_size:
+        raise ValueError(f"Invalid chunking {spec!r}; expected size:overlap with 0 <= overlap < size")
+    return chunk_size, chunk_overlap
+
+
+def load_dense_encoder(config: Config, methods: List[str]):
+    """The embedding model if a dense retriever was asked for and can run, else None"""
+    if not any(method in DENSE_METHODS for method in methods):
+        return None
+    if not DENSE_AVAILABLE:
+        logger.warning("sentence-transformers not available; skipping the dense and hybrid retrievers")
+        return None
+    return SentenceTransformer(config.EMBEDDING_MODEL)
+
+
+def run_benchmark(config: Config, golden: List[Dict[str, Any]], chunkings: List[Tuple[int, int]],
+                  methods: List[str], ks: List[int], rerank_options: List[bool]) -> List[Dict[str, Any]]:
+    documents = DocumentProcessor(config).load_documents()
+    if not documents:
+        raise RuntimeError(f"No documents found in {config.DATA_FOLDER}")
+    encoder = load_dense_encoder(config, methods)
+    if encoder is None:
+        methods = [method for method in methods if method not in DENSE_METHODS]
+    reranker = LexicalReranker(
+        cross_encoder_model=getattr(config, "RERANK_CROSS_ENCODER_MODEL", ""),
+        latency_budget_ms=getattr(config, "RERANK_LATENCY_BUDGET_MS", 150),
+    )
+    candidates = getattr(config, "RERANK_CANDIDATES", 50)
+
+    rows = []
+    for chunk_size, chunk_overlap in chunkings:
+        corpus = ChunkedCorpus(config, documents, chunk_size, chunk_overlap, encoder)
+        rows += evaluate_corpus(corpus, golden, methods, ks, rerank_options, reranker, candidates)
+        logger.info(f"Evaluated chunking {chunk_size}/{chunk_overlap} ({len(corpus.chunks)} chunks)")
+    return rows
+
+
+def main():
+    config = Config()
+    parser = argparse.ArgumentParser(description="Retrieval quality-vs-latency benchmark over the golden set")
+    parser.add_argument("--golden", default=config.GOLDEN_QUESTIONS_PATH)
+    parser.add_argument("--chunking", nargs="+", default=DEFAULT_CHUNKING + [f"{config.CHUNK_SIZE}:{config.CHUNK_OVERLAP}"],
+                        help="Chunk size:overlap pairs to compare")
+    parser.add_argument("--methods", nargs="+", choices=METHODS, default=list(METHODS))
+    parser.add_argument("--k", type=int, nargs="+", default=DEFAULT_KS)
+    parser.add_argument("--rerank", nargs="+", choices=("off", "on"), default=["off", "on"])
+    parser.add_argument("--output", help="Optional markdown file to write the table to")
+    parser.add_argument("--json", help="Optional JSON file for the raw rows")
+    args = parser.parse_args()
+
+    configure_cli_logging(logging.WARNING)
+    try:
+        golden = load_golden_set(args.golden)
+        chunkings = list(dict.fromkeys(parse_chunking(spec) for spec in args.chunking))
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    rows = run_benchmark(config, golden, chunkings, args.methods, sorted(set(args.k)),
+                         [option == "on" for option in args.rerank])
+    report = format_report(rows)
+    print(f"{len(golden)} golden questions\n")
+    print(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
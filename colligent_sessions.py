@@ -0,0 +1,138 @@
+import gc
+import sys
+import time
+import logging
+import threading
+from typing import Any, Dict, Iterable, MutableMapping, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def release_value(value: Any) -> int:
+    """Release a session-state value and return the approximate bytes it held.
+
+    Objects with a release() method (the chatbot) free their own resources and
+    report them; containers are sized shallowly through their items.
+    """
+    if hasattr(value, "release"):
+        try:
+            return value.release()
+        except Exception as e:
+            logger.error(f"Error releasing {type(value).__name__}: {e}")
+            return 0
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(release_value(k) + release_value(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(release_value(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class SessionRegistry:
+    """Tracks the last activity of every UI session and evicts idle ones.
+
+    A session only notices its own timeout when its script reruns, so an
+    abandoned tab would keep its chatbot, embedding model and history alive
+    forever. The reaper thread removes the configured session-state keys
+    from sessions idle longer than the timeout; the session's next rerun then
+    sees the usual expiry message.
+    """
+
+    def __init__(self, timeout_seconds: float, interval_seconds: float = 60, evict_keys: Iterable[str] = ()):
+        self.timeout = timeout_seconds
+        self.interval = interval_seconds
+        self.evict_keys = tuple(evict_keys)
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+        self._evicted_ids: Dict[str, float] = {}
+        self.stats = {"evicted": 0, "reclaimed_bytes": 0, "reaps": 0}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def touch(self, session_id: str, state: MutableMapping):
+        """Record activity for a session and keep a handle on its state"""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                self._sessions[session_id] = {"state": state, "last_active": time.monotonic()}
+            else:
+                entry["state"] = state
+                entry["last_active"] = time.monotonic()
+
+    def was_evicted(self, session_id: str) -> bool:
+        with self._lock:
+            return session_id in self._evicted_ids
+
+    def reap(self, now: Optional[float] = None) -> int:
+        """Evict every session idle longer than the timeout; return how many were evicted"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            expired = [(session_id, entry["state"]) for session_id, entry in self._sessions.items()
+                       if now - entry["last_active"] > self.timeout]
+            for session_id, _ in expired:
+                del self._sessions[session_id]
+                self._evicted_ids[session_id] = now
+            # Remember evicted ids only as long as a tab could plausibly come back
+            for session_id in [sid for sid, when in self._evicted_ids.items() if now - when > 24 * 3600]:
+                del self._evicted_ids[session_id]
+            self.stats["reaps"] += 1
+
+        reclaimed = 0
+        for session_id, state in expired:
+            reclaimed += self._evict(session_id, state)
+        if expired:
+            gc.collect()
+            with self._lock:
+                self.stats["evicted"] += len(expired)
+                self.stats["reclaimed_bytes"] += reclaimed
+            logger.info(f"Evicted {len(expired)} idle sessions, reclaiming about {reclaimed / 1e6:.1f} MB")
+        return len(expired)
+
+    def _evict(self, session_id: str, state: MutableMapping) -> int:
+        reclaimed = 0
+        for key in self.evict_keys:
+            try:
+                if key in state:
+                    value = state[key]
+                    del state[key]
+                    reclaimed += release_value(value)
+            except Exception as e:
+                # The session may already be gone from the UI server
+                logger.debug(f"Could not evict {key} from session {session_id}: {e}")
+        return reclaimed
+
+    def start(self) -> "SessionRegistry":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="session-reaper", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.reap()
+            except Exception as e:
+                logger.error(f"Error reaping idle sessions: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, live=len(self._sessions), timeout_seconds=self.timeout)
+
+
+_shared_registry: Optional[SessionRegistry] = None
+_shared_registry_lock = threading.Lock()
+
+
+def get_session_registry(config, evict_keys: Iterable[str] = ()) -> SessionRegistry:
+    """Return the process-wide session registry, starting its reaper on first use"""
+    global _shared_registry
+    with _shared_registry_lock:
+        if _shared_registry is None:
+            _shared_registry = SessionRegistry(
+                timeout_seconds=getattr(config, "SESSION_TIMEOUT_MINUTES", 30) * 60,
+                interval_seconds=getattr(config, "SESSION_REAP_INTERVAL_SECONDS", 60),
+                evict_keys=evict_keys,
+            ).start()
+        return _shared_registry
@@ -0,0 +1,233 @@
+import os
+import json
+import hashlib
+import mmap
+import shutil
+import logging
+from typing import Any, Dict, List, Optional
+
+from colligent_retrieval import RetrievalResult
+from colligent_vector_db import l2_relevance_score, rank_by_keywords
+
+logger = logging.getLogger(__name__)
+
+# numpy memory-maps the shared embedding matrix; without it workers search by keyword
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+SHARED_INDEX_DIRNAME = "shared"
+METADATA_FILENAME = "metadata.json"
+TEXTS_FILENAME = "texts.bin"
+OFFSETS_FILENAME = "offsets.npy"
+EMBEDDINGS_FILENAME = "embeddings.npy"
+
+
+class _Chunk:
+    """Minimal document for RetrievalResult.from_document"""
+    __slots__ = ("page_content", "metadata")
+
+    def __init__(self, page_content: str, metadata: Dict[str, Any]):
+        self.page_content = page_content
+        self.metadata = metadata
+
+
+def _collect_chunks(vector_store):
+    """Texts, metadata and (if indexed) embeddings of every chunk in a loaded vector store"""
+    if getattr(vector_store, "vector_db", None) is not None:
+        data = vector_store.vector_db.get(include=["documents", "metadatas", "embeddings"])
+        return data["documents"], [m or {} for m in data["metadatas"]], data.get("embeddings")
+    docs = vector_store.fallback_docs
+    return [doc.page_content for doc in docs], [dict(doc.metadata or {}) for doc in docs], None
+
+
+def _build_id(vector_store, texts: List[str]) -> str:
+    """Names the index build that was loaded: its directory, or a hash of the in-memory fallback texts"""
+    index_path = getattr(vector_store, "index_path", None)
+    if index_path:
+        return os.path.basename(os.path.normpath(index_path))
+    digest = hashlib.sha256()
+    for text in texts:
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\0")
+    return f"fallback-{digest.hexdigest()[:16]}"
+
+
+def _prune_exports(shared_root: str, current: str, keep: int = 2):
+    """Delete all but the newest keep exports; workers mapping an older one keep their pages until they exit"""
+    exports = [name for name in os.listdir(shared_root) if ".tmp-" not in name]
+    exports.sort(key=lambda name: os.path.getmtime(os.path.join(shared_root, name)))
+    for name in exports[:-keep]:
+        if os.path.join(shared_root, name) != current:
+            shutil.rmtree(os.path.join(shared_root, name), ignore_errors=True)
+
+
+def export_shared_index(vector_store, root: str, kb_version: str) -> str:
+    """Write a loaded knowledge base as flat files that worker processes memory-map.
+
+    Texts go into one UTF-8 blob with an offsets array, and embeddings into a
+    normalized float32 matrix, so every worker maps the same pages instead of
+    holding its own copy. Exports are keyed by KB version and the index build
+    they were read from, so a rebuilt index is exported again; each is
+    written once.
+    """
+    texts, metadatas, embeddings = _collect_chunks(vector_store)
+    directory = os.path.join(root, SHARED_INDEX_DIRNAME, f"{kb_version}-{_build_id(vector_store, texts)}")
+    if os.path.exists(os.path.join(directory, METADATA_FILENAME)):
+        return directory
+
+    tmp = f"{directory}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    encoded = [text.encode("utf-8") for text in texts]
+    with open(os.path.join(tmp, TEXTS_FILENAME), "wb") as f:
+        for blob in encoded:
+            f.write(blob)
+    offsets = [0]
+    for blob in encoded:
+        offsets.append(offsets[-1] + len(blob))
+
+    dimension = 0
+    if NUMPY_AVAILABLE:
+        np.save(os.path.join(tmp, OFFSETS_FILENAME), np.asarray(offsets, dtype=np.int64))
+        if embeddings is not None and len(embeddings):
+            matrix = np.asarray(embeddings, dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            np.save(os.path.join(tmp, EMBEDDINGS_FILENAME), matrix / np.maximum(norms, 1e-12))
+            dimension = matrix.shape[1]
+    else:
+        with open(os.path.join(tmp, OFFSETS_FILENAME + ".json"), "w") as f:
+            json.dump(offsets, f)
+
+    with open(os.path.join(tmp, METADATA_FILENAME), "w", encoding="utf-8") as f:
+        json.dump({
+            "kb_version": kb_version,
+            "count": len(texts),
+            "dimension": dimension,
+            "embedding_model": getattr(vector_store.config, "EMBEDDING_MODEL", None),
+            "metadatas": metadatas,
+        }, f)
+
+    try:
+        os.replace(tmp, directory)
+    except OSError:
+        # Another process exported the same version first
+        shutil.rmtree(tmp, ignore_errors=True)
+    _prune_exports(os.path.dirname(directory), directory)
+    logger.info(f"Exported shared index with {len(texts)} chunks ({dimension}-d) to {directory}")
+    return directory
+
+
+class SharedIndexStore:
+    """Read-only vector store over an exported shared index.
+
+    Implements the parts of VectorStore the chatbot uses. Query embeddings
+    come from the given embeddings object (typically an EmbeddingClient for
+    the shared embedding service); without one, or if it fails, search falls
+    back to keyword matching like VectorStore does.
+    """
+
+    shared = True  # Pages are shared between processes, nothing to free per session
+
+    def __init__(self, config, directory: str, embeddings=None):
+        self.config = config
+        self.directory = directory
+        self.base_embeddings = embeddings
+        self.embeddings = embeddings
+        self.fallback_docs: List[Any] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.count = 0
+        self._texts = None
+        self._offsets = None
+        self._matrix = None
+        self._lowered: Optional[List[str]] = None
+
+    def load_vector_store(self, index_version: Optional[str] = None) -> bool:
+        """Memory-map the exported files; the supervisor exported the current build, so the version is not checked"""
+        try:
+            with open(os.path.join(self.directory, METADATA_FILENAME), encoding="utf-8") as f:
+                info = json.load(f)
+            self.metadatas = info["metadatas"]
+            self.count = info["count"]
+            if not self.count:
+                logger.error(f"Shared index {self.directory} is empty")
+                return False
+            with open(os.path.join(self.directory, TEXTS_FILENAME), "rb") as f:
+                self._texts = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if NUMPY_AVAILABLE:
+                self._offsets = np.load(os.path.join(self.directory, OFFSETS_FILENAME), mmap_mode="r")
+                embeddings_path = os.path.join(self.directory, EMBEDDINGS_FILENAME)
+                if os.path.exists(embeddings_path):
+                    self._matrix = np.load(embeddings_path, mmap_mode="r")
+            else:
+                with open(os.path.join(self.directory, OFFSETS_FILENAME + ".json")) as f:
+                    self._offsets = json.load(f)
+            logger.info(f"Mapped shared index {self.directory} ({self.count} chunks)")
+            return True
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"Error loading shared index from {self.directory}: {e}")
+            return False
+
+    def create_vector_store(self, documents, on_progress=None) -> bool:
+        logger.error("Shared indexes are read-only; rebuild in the supervisor and restart the workers")
+        return False
+
+    def _text(self, i: int) -> str:
+        return self._texts[int(self._offsets[i]):int(self._offsets[i + 1])].decode("utf-8")
+
+    def _result(self, i: int, score: float) -> RetrievalResult:
+        return RetrievalResult.from_document(_Chunk(self._text(i), self.metadatas[i]), score)
+
+    def embed_query(self, query: str) -> Optional[List[float]]:
+        if self._matrix is None or self.embeddings is None:
+            return None
+        try:
+            return self.embeddings.embed_query(query)
+        except Exception as e:
+            logger.error(f"Error embedding query: {e}")
+            return None
+
+    def embed_queries(self, queries: List[str]) -> Optional[List[List[float]]]:
+        if self._matrix is None or self.embeddings is None:
+            return None
+        try:
+            return self.embeddings.embed_documents(queries)
+        except Exception as e:
+            logger.error(f"Error embedding {len(queries)} queries: {e}")
+            return None
+
+    def search_with_scores(self, query: str, k: int = 5,
+                           query_embedding: Optional[List[float]] = None) -> List[RetrievalResult]:
+        """Search for similar chunks, returning typed results with relevance scores"""
+        if query_embedding is None:
+            query_embedding = self.embed_query(query)
+        if query_embedding is not None and self._matrix is not None:
+            vector = np.asarray(query_embedding, dtype=np.float32)
+            vector /= max(float(np.linalg.norm(vector)), 1e-12)
+            similarities = self._matrix @ vector
+            top = np.argsort(-similarities)[:k]
+            # Chroma's squared L2 distance between unit vectors is 2 - 2cos; scoring it the same way
+            # keeps MIN_RELEVANCE_SCORE dropping the same chunks as a single-process VectorStore
+            return [self._result(i, l2_relevance_score(2.0 - 2.0 * float(similarities[i]))) for i in top]
+
+        if self._lowered is None:
+            # Keyword search needs every text; decode them once per process
+            self._lowered = [self._text(i).lower() for i in range(self.count)]
+        query_word_count = max(len(query.split()), 1)
+        return [self._result(i, score / query_word_count) for i, score in rank_by_keywords(self._lowered, query, k)]
+
+    def get_collection_info(self) -> Dict[str, Any]:
+        return {
+            "collection_name": "shared_index",
+            "document_count": self.count,
+            "embedding_model": getattr(self.config, "EMBEDDING_MODEL", None),
+            "index_type": "Shared memory-mapped index" + (" (keyword search)" if self._matrix is None else ""),
+            "path": self.directory,
+        }
+
+    def estimate_bytes(self) -> int:
+        return 0
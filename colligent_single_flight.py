@@ -0,0 +1,144 @@
+import json
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from colligent_answer_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+
+def make_flight_key(query: str, mode: str, kb_version: Optional[str], llm_identity: Optional[list] = None) -> str:
+    """Requests with the same key are answered by a single computation.
+
+    llm_identity is the answering model's settings, or None for the fallback
+    engine, so a session with an LLM never waits on a fallback answer.
+    """
+    return json.dumps([normalize_query(query), mode, kb_version, llm_identity])
+
+
+class SingleFlight:
+    """Process-wide in-flight request coalescing.
+
+    The first caller for a key becomes the leader and computes the result;
+    callers arriving while it is still running become followers and wait for
+    the leader's result instead of repeating the work. Results are not kept
+    once the flight lands; the answer cache covers later repeats. Followers
+    that wait longer than wait_timeout compute the result themselves.
+    """
+
+    def __init__(self, wait_timeout: Optional[float] = 60.0):
+        self.wait_timeout = wait_timeout
+        self._flights: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "leaders": 0,
+            "followers": 0,
+            "follower_timeouts": 0,
+        }
+
+    def join(self, key: str) -> Tuple[Future, bool]:
+        """Join the flight for key, returning (future, True if this caller leads)"""
+        with self._lock:
+            future = self._flights.get(key)
+            if future is not None:
+                self._stats["followers"] += 1
+                return future, False
+            future = Future()
+            self._flights[key] = future
+            self._stats["leaders"] += 1
+            return future, True
+
+    def complete(self, key: str, future: Future, result: Any = None, error: Optional[BaseException] = None):
+        """Land the leader's flight, handing its result or error to the followers"""
+        with self._lock:
+            if self._flights.get(key) is future:
+                del self._flights[key]
+        if error is None:
+            future.set_result(result)
+        elif isinstance(error, Exception):
+            future.set_exception(error)
+        else:
+            # Cancellation or generator close in the leader is not the followers' failure
+            future.set_exception(RuntimeError(f"Coalesced request was abandoned by its leader: {error!r}"))
+
+    def wait(self, key: str, future: Future) -> Optional[Any]:
+        """Block until the leader lands; None if it took longer than wait_timeout"""
+        try:
+            return future.result(timeout=self.wait_timeout)
+        except FutureTimeoutError:
+            self._count_timeout(key)
+            return None
+
+    async def await_result(self, key: str, future: Future) -> Optional[Any]:
+        """Asyncio counterpart of wait"""
+        try:
+            # Shield so a cancelled follower does not cancel the leader's future
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.wait_timeout)
+        except asyncio.TimeoutError:
+            self._count_timeout(key)
+            return None
+
+    def do(self, key: str, fn: Callable[..., Any], *args, **kwargs) -> Tuple[Any, bool]:
+        """Run fn once per concurrent key, returning (result, True if shared from a leader)"""
+        future, leader = self.join(key)
+        if not leader:
+            result = self.wait(key, future)
+            if result is not None:
+                return result, True
+            return fn(*args, **kwargs), False
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self.complete(key, future, error=e)
+            raise
+        self.complete(key, future, result)
+        return result, False
+
+    async def ado(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Asyncio counterpart of do; factory creates the coroutine to await"""
+        future, leader = self.join(key)
+        if not leader:
+            result = await self.await_result(key, future)
+            if result is not None:
+                return result, True
+            return await factory(), False
+
+        try:
+            result = await factory()
+        except BaseException as e:
+            self.complete(key, future, error=e)
+            raise
+        self.complete(key, future, result)
+        return result, False
+
+    def _count_timeout(self, key: str):
+        with self._lock:
+            self._stats["follower_timeouts"] += 1
+        logger.warning(f"Timed out waiting for coalesced request {key}, computing it independently")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._flights)
+        return stats
+
+
+_shared_flight: Optional[SingleFlight] = None
+_shared_flight_lock = threading.Lock()
+
+
+def get_single_flight(config) -> Optional[SingleFlight]:
+    """Return the process-wide coalescing layer shared by all chatbot sessions"""
+    global _shared_flight
+    if not getattr(config, "ENABLE_REQUEST_COALESCING", False):
+        return None
+    with _shared_flight_lock:
+        if _shared_flight is None:
+            _shared_flight = SingleFlight(
+                wait_timeout=getattr(config, "COALESCE_WAIT_TIMEOUT_SECONDS", 60) or None
+            )
+        return _shared_flight
@@ -0,0 +1,126 @@
+import re
+import logging
+from functools import lru_cache
+from typing import List, Tuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# Try to import tiktoken for exact OpenAI token counts, but fall back to an estimate
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+    logger.warning("tiktoken not available, estimating token counts from characters")
+
+# Average characters per token for English text with OpenAI tokenizers
+CHARS_PER_TOKEN = 4
+
+# Context windows of the chat models this app is configured with
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-4": 8192,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+}
+DEFAULT_CONTEXT_WINDOW = 4096
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+# Blank line between chunks in the prompt context
+CONTEXT_SEPARATOR = "\n"
+
+
+@lru_cache(maxsize=8)
+def _get_encoding(model: str):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model: str = "gpt-3.5-turbo") -> int:
+    """Count tokens with the model's tokenizer (estimated without tiktoken)"""
+    if not text:
+        return 0
+    if TIKTOKEN_AVAILABLE:
+        return len(_get_encoding(model).encode(text))
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def get_context_window(model: str) -> int:
+    """Context window size for a model, matching dated variants by prefix"""
+    for name in sorted(MODEL_CONTEXT_WINDOWS, key=len, reverse=True):
+        if model.startswith(name):
+            return MODEL_CONTEXT_WINDOWS[name]
+    return DEFAULT_CONTEXT_WINDOW
+
+
+def trim_to_sentences(text: str, max_tokens: int, model: str = "gpt-3.5-turbo") -> Tuple[str, int]:
+    """Keep whole leading sentences of text that fit in max_tokens.
+
+    Returns the trimmed text and its token count; empty if not even the first
+    sentence fits.
+    """
+    kept = []
+    used = 0
+    for sentence in _SENTENCE_END.split(text.strip()):
+        # Count the separating space with the sentence it precedes
+        tokens = count_tokens(sentence if not kept else " " + sentence, model)
+        if used + tokens > max_tokens:
+            break
+        kept.append(sentence)
+        used += tokens
+    return " ".join(kept), used
+
+
+def format_chunk(header: str, text: str) -> str:
+    """One chunk as it appears in the prompt context"""
+    return f"{header}\n{text}\n"
+
+
+def format_context(chunks: List[Tuple[str, str]]) -> str:
+    """The prompt context for (header, text) chunks; pack_chunks counts exactly this"""
+    return CONTEXT_SEPARATOR.join(format_chunk(header, text) for header, text in chunks)
+
+
+def pack_chunks(chunks: List[Tuple[str, str]], budget: int, model: str = "gpt-3.5-turbo",
+                min_partial_tokens: int = 40) -> Tuple[List[Tuple[str, str]], int]:
+    """Pack (header, text) chunks, in ranked order, into a token budget.
+
+    Whole chunks are added while they fit. The first chunk that does not fit is
+    trimmed at a sentence boundary if at least min_partial_tokens remain, and
+    packing stops there. Each chunk is counted as rendered by format_context,
+    separator included. Returns the packed chunks and the tokens of their
+    rendered context.
+    """
+    packed = []
+    used = 0
+    for header, text in chunks:
+        separator = CONTEXT_SEPARATOR if packed else ""
+        chunk_tokens = count_tokens(separator + format_chunk(header, text), model)
+        if used + chunk_tokens <= budget:
+            packed.append((header, text))
+            used += chunk_tokens
+            continue
+
+        # The text of a trimmed chunk sits between its header line and a closing newline
+        framing_tokens = count_tokens(separator + header + "\n", model) + count_tokens("\n", model)
+        remaining = budget - used - framing_tokens
+        if remaining >= min_partial_tokens:
+            partial, _ = trim_to_sentences(text, remaining, model)
+            if partial:
+                packed.append((header, partial))
+        break
+
+    return packed, count_tokens(format_context(packed), model)
+
+
+def get_effective_budget(configured_budget: int, model: str, max_output_tokens: int,
+                         reserved_tokens: int = 500, query: Optional[str] = None) -> int:
+    """Shrink the configured context budget to what fits in the model window"""
+    available = get_context_window(model) - max_output_tokens - reserved_tokens
+    if query:
+        available -= count_tokens(query, model)
+    return max(0, min(configured_budget, available))
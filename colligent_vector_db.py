@@ -1,7 +1,11 @@
 import os
+import math
+import time
+import uuid
+import shutil
 import logging
 import sys
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Optional, Union, Callable
 
 # Add current directory to path for imports
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -45,26 +49,116 @@ except ImportError:
     SENTENCE_TRANSFORMERS_AVAILABLE = False
     logger.warning("SentenceTransformers not available, using fallback")
 
+from colligent_retrieval import RetrievalResult
+from colligent_embedding_projection import (
+    EmbeddingProjector, ProjectedEmbeddings, NUMPY_AVAILABLE, load_projector, projection_path
+)
+
 
 def is_chromadb_available():
     """Check if ChromaDB is available"""
     return CHROMADB_AVAILABLE
 
+
+# Each build goes into its own index-* directory under VECTOR_DB_PATH; this
+# file names the live one, so a finished build is swapped in with one rename
+INDEX_POINTER_FILENAME = "CURRENT"
+# Written into each build: the fingerprint of the documents and settings it was built from
+INDEX_VERSION_FILENAME = "index_version"
+
+
+class IndexBuildCancelled(Exception):
+    """Raised from a build progress callback to abandon the build"""
+
+
+def current_index_path(root: str) -> str:
+    """Directory of the live index: the one CURRENT names, else root itself (older layout)"""
+    try:
+        with open(os.path.join(root, INDEX_POINTER_FILENAME), encoding="utf-8") as f:
+            name = f.read().strip()
+        if name and os.path.isdir(os.path.join(root, name)):
+            return os.path.join(root, name)
+    except OSError:
+        pass
+    return root
+
+
+def read_index_version(index_path: str) -> Optional[str]:
+    """The version recorded in an index build, or None for builds that predate it"""
+    try:
+        with open(os.path.join(index_path, INDEX_VERSION_FILENAME), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def new_index_path(root: str) -> str:
+    """A fresh directory name for a build; names sort by creation time"""
+    return os.path.join(root, f"index-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{uuid.uuid4().hex[:6]}")
+
+
+def publish_index(root: str, index_path: str, keep: int = 2):
+    """Atomically make index_path the live index and delete all but the newest keep builds.
+    
+    The previous build is kept so sessions still reading it are not cut off.
+    """
+    pointer = os.path.join(root, INDEX_POINTER_FILENAME)
+    tmp = f"{pointer}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(os.path.basename(index_path))
+    os.replace(tmp, pointer)
+    
+    builds = sorted(name for name in os.listdir(root) if name.startswith("index-"))
+    for name in builds[:-keep]:
+        if os.path.join(root, name) != index_path:
+            discard_index(os.path.join(root, name))
+
+
+def discard_index(index_path: str):
+    """Delete an unfinished or superseded build"""
+    shutil.rmtree(index_path, ignore_errors=True)
+
+
+def l2_relevance_score(squared_distance: float) -> float:
+    """Relevance of a Chroma "l2" distance (squared Euclidean), as the langchain Chroma wrapper scores it"""
+    return 1.0 - squared_distance / math.sqrt(2)
+
+
+def rank_by_keywords(lowered_texts: List[str], query: str, k: int = 5) -> List[tuple]:
+    """Rank texts by how many query words they contain, returning (index, score) pairs for the top k"""
+    query_words = query.lower().split()
+    relevant = []
+    for i, content_lower in enumerate(lowered_texts):
+        relevance_score = sum(1 for word in query_words if word in content_lower)
+        if relevance_score > 0:
+            relevant.append((i, relevance_score))
+    
+    # Sort by relevance and return top k
+    relevant.sort(key=lambda x: x[1], reverse=True)
+    return relevant[:k]
+
+
 class VectorStore:
     """Vector database operations with robust fallback system"""
     
-    def __init__(self, config):
+    def __init__(self, config, base_embeddings=None):
         self.config = config
         self.embeddings = None
+        self.base_embeddings = None
+        self.projector = None
         self.vector_db = None
+        self.index_path = None
+        self.shared = False  # Published to every session by a background rebuild
         self.fallback_docs = []
         
         try:
             if CHROMADB_AVAILABLE:
                 logger.info("Initializing VectorStore with ChromaDB")
-                self.embeddings = HuggingFaceEmbeddings(
+                # An already loaded embedding model can be shared, e.g. by a background rebuild
+                self.embeddings = base_embeddings or HuggingFaceEmbeddings(
                     model_name=self.config.EMBEDDING_MODEL
                 )
+                self.base_embeddings = self.embeddings
                 logger.info("Embeddings created successfully")
             else:
                 logger.warning("ChromaDB not available, using fallback mode")
@@ -78,12 +172,56 @@ class VectorStore:
         logger.info("Setting up fallback document storage")
         self.fallback_docs = []
     
-    def create_vector_store(self, documents: List[Document]) -> bool:
-        """Create vector store with robust fallback"""
+    def _projection_enabled(self) -> bool:
+        """Whether index-time dimensionality reduction is configured"""
+        dimension = getattr(self.config, 'EMBEDDING_DIMENSION', 0)
+        return bool(dimension) and NUMPY_AVAILABLE and self.base_embeddings is not None
+    
+    def _projection_matches(self, projector: Optional[EmbeddingProjector]) -> bool:
+        """Whether an index's stored projection is the one EMBEDDING_DIMENSION/EMBEDDING_PROJECTION ask for"""
+        if not self._projection_enabled():
+            return projector is None
+        if projector is None:
+            return False
+        dimension = self.config.EMBEDDING_DIMENSION
+        if projector.input_dimension and dimension >= projector.input_dimension:
+            # Fitting leaves vectors at their native size when asked for as many dimensions or more
+            return projector.dimension == projector.input_dimension
+        method = getattr(self.config, 'EMBEDDING_PROJECTION', 'pca')
+        return projector.dimension == dimension and projector.method == method
+    
+    def _fit_projection(self, documents: List[Document]):
+        """Fit the configured projection on the corpus and wrap the embeddings"""
+        texts = [doc.page_content for doc in documents]
+        base_vectors = self.base_embeddings.embed_documents(texts)
+        
+        self.projector = EmbeddingProjector(
+            self.config.EMBEDDING_DIMENSION,
+            getattr(self.config, 'EMBEDDING_PROJECTION', 'pca')
+        ).fit(base_vectors)
+        
+        projected = ProjectedEmbeddings(self.base_embeddings, self.projector)
+        # Reuse the vectors computed for fitting when the index is built
+        projected.prime(texts, base_vectors)
+        self.embeddings = projected
+    
+    def create_vector_store(self, documents: List[Document],
+                            on_progress: Optional[Callable[[str, int, int], None]] = None,
+                            batch_size: int = 64, index_version: Optional[str] = None) -> bool:
+        """Build a new index from documents and make it the live one.
+        
+        The index is written to a fresh directory and only published once
+        complete, so readers of the previous index are never disturbed. If
+        given, on_progress(stage, done, total) is called as chunks are
+        embedded and when persisting; it may raise IndexBuildCancelled.
+        index_version is recorded in the build for load_vector_store to check.
+        """
+        on_progress = on_progress or (lambda stage, done, total: None)
+        index_path = None
         try:
             if not CHROMADB_AVAILABLE:
                 logger.warning("ChromaDB not available, using fallback storage")
-                return self._fallback_create_store(documents)
+                return self._fallback_create_store(documents, on_progress)
             
             if not documents:
                 logger.error("No documents provided for vector store creation")
@@ -91,52 +229,106 @@ class VectorStore:
             
             logger.info(f"Creating ChromaDB vector store with {len(documents)} documents")
             
-            # Create ChromaDB vector store
-            vector_db = Chroma(
-                documents=documents,
-                embedding=self.embeddings,
-                persist_directory=self.config.VECTOR_DB_PATH
-            )
+            if self._projection_enabled():
+                self._fit_projection(documents)
+            else:
+                self.projector = None
+                self.embeddings = self.base_embeddings
+            
+            # Create ChromaDB vector store, embedding in batches to report progress
+            root = self.config.VECTOR_DB_PATH
+            os.makedirs(root, exist_ok=True)
+            index_path = new_index_path(root)
+            vector_db = Chroma(persist_directory=index_path, embedding_function=self.embeddings)
+            on_progress("embedding", 0, len(documents))
+            for start in range(0, len(documents), batch_size):
+                batch = documents[start:start + batch_size]
+                vector_db.add_documents(batch)
+                on_progress("embedding", start + len(batch), len(documents))
             
             # Persist the vector store
+            on_progress("persisting", 0, 1)
             vector_db.persist()
+            if self.projector:
+                self.projector.save(projection_path(index_path))
+            if index_version:
+                with open(os.path.join(index_path, INDEX_VERSION_FILENAME), "w", encoding="utf-8") as f:
+                    f.write(index_version)
+            on_progress("persisting", 1, 1)
+            publish_index(root, index_path)
             
             self.vector_db = vector_db
-            logger.info("ChromaDB vector store created successfully")
+            self.index_path = index_path
+            logger.info(f"ChromaDB vector store created successfully in {index_path}")
             return True
             
+        except IndexBuildCancelled:
+            if index_path:
+                discard_index(index_path)
+            raise
         except Exception as e:
             logger.error(f"Failed to create ChromaDB vector store: {e}")
+            if index_path:
+                discard_index(index_path)
             logger.info("Falling back to simple document storage")
-            return self._fallback_create_store(documents)
+            return self._fallback_create_store(documents, on_progress)
     
-    def _fallback_create_store(self, documents: List[Document]) -> bool:
+    def _fallback_create_store(self, documents: List[Document],
+                               on_progress: Optional[Callable[[str, int, int], None]] = None) -> bool:
         """Fallback storage when ChromaDB fails"""
         try:
             logger.info(f"Creating fallback storage with {len(documents)} documents")
+            if on_progress:
+                on_progress("embedding", len(documents), len(documents))
             self.fallback_docs = documents
             logger.info("Fallback storage created successfully")
             return True
+        except IndexBuildCancelled:
+            raise
         except Exception as e:
             logger.error(f"Failed to create fallback storage: {e}")
             return False
     
-    def load_vector_store(self) -> bool:
-        """Load existing vector store with fallback"""
+    def load_vector_store(self, index_version: Optional[str] = None) -> bool:
+        """Load existing vector store with fallback.
+        
+        With index_version, an index built from other documents or settings
+        is not loaded, so the caller rebuilds it.
+        """
         try:
             if not CHROMADB_AVAILABLE:
                 logger.info("ChromaDB not available, checking fallback storage")
                 return len(self.fallback_docs) > 0
             
-            if not os.path.exists(self.config.VECTOR_DB_PATH):
+            index_path = current_index_path(self.config.VECTOR_DB_PATH)
+            if not os.path.exists(index_path):
                 logger.info("No existing vector store found")
                 return False
+            built_version = read_index_version(index_path)
+            if index_version and built_version != index_version:
+                logger.info(f"Index in {index_path} was built from other documents or settings "
+                            f"({built_version or 'unversioned'}, now {index_version}); it will be rebuilt")
+                return False
             
-            logger.info("Loading existing ChromaDB vector store")
+            logger.info(f"Loading existing ChromaDB vector store from {index_path}")
+            projector = load_projector(index_path)
+            if not self._projection_matches(projector):
+                stored = f"{projector.method} to {projector.dimension}" if projector else "no projection"
+                logger.error(f"Index in {index_path} was built with {stored}, but EMBEDDING_DIMENSION is "
+                             f"{getattr(self.config, 'EMBEDDING_DIMENSION', 0)}; it will be rebuilt")
+                return False
+            self.projector = projector
+            if self.projector and self.base_embeddings is not None:
+                # Queries must be projected exactly like the indexed vectors
+                self.embeddings = ProjectedEmbeddings(self.base_embeddings, self.projector)
+                logger.info(f"Using {self.projector.method} projection to {self.projector.output_dimension} dimensions")
+            else:
+                self.embeddings = self.base_embeddings
             self.vector_db = Chroma(
-                persist_directory=self.config.VECTOR_DB_PATH,
+                persist_directory=index_path,
                 embedding_function=self.embeddings
             )
+            self.index_path = index_path
             logger.info("Existing vector store loaded successfully")
             return True
             
@@ -145,12 +337,37 @@ class VectorStore:
             logger.info("Falling back to simple storage")
             return len(self.fallback_docs) > 0
     
-    def search_similar(self, query: str, k: int = 5) -> List[Document]:
+    def embed_query(self, query: str) -> Optional[List[float]]:
+        """Embed a query the same way search_similar does (None in fallback mode)"""
+        if not (CHROMADB_AVAILABLE and self.vector_db and self.embeddings):
+            return None
+        try:
+            return self.embeddings.embed_query(query)
+        except Exception as e:
+            logger.error(f"Error embedding query: {e}")
+            return None
+    
+    def embed_queries(self, queries: List[str]) -> Optional[List[List[float]]]:
+        """Embed many queries in one model call, as embed_query would one by one (None in fallback mode)"""
+        if not (CHROMADB_AVAILABLE and self.vector_db and self.embeddings):
+            return None
+        try:
+            return self.embeddings.embed_documents(queries)
+        except Exception as e:
+            logger.error(f"Error embedding {len(queries)} queries: {e}")
+            return None
+    
+    def search_similar(self, query: str, k: int = 5, query_embedding: Optional[List[float]] = None) -> List[Document]:
         """Search for similar documents with fallback"""
         try:
             if CHROMADB_AVAILABLE and self.vector_db:
                 logger.info(f"Searching ChromaDB for: {query[:50]}...")
-                results = self.vector_db.similarity_search(query, k=k)
+                if query_embedding is None and self.projector:
+                    query_embedding = self.embeddings.embed_query(query)
+                if query_embedding is not None:
+                    results = self.vector_db.similarity_search_by_vector(query_embedding, k=k)
+                else:
+                    results = self.vector_db.similarity_search(query, k=k)
                 logger.info(f"Found {len(results)} similar documents")
                 return results
             else:
@@ -162,29 +379,58 @@ class VectorStore:
             logger.info("Using fallback search due to error")
             return self._fallback_search(query, k)
     
+    def search_with_scores(self, query: str, k: int = 5,
+                           query_embedding: Optional[List[float]] = None) -> List[RetrievalResult]:
+        """Search for similar chunks, returning typed results with relevance scores"""
+        try:
+            if CHROMADB_AVAILABLE and self.vector_db:
+                logger.info(f"Searching ChromaDB with scores for: {query[:50]}...")
+                if query_embedding is None and self.projector:
+                    query_embedding = self.embeddings.embed_query(query)
+                if query_embedding is not None:
+                    # Chroma returns distances for vector queries; convert them the
+                    # same way it does for text queries
+                    relevance_fn = self.vector_db._select_relevance_score_fn()
+                    scored = [
+                        (doc, relevance_fn(distance))
+                        for doc, distance in self.vector_db.similarity_search_by_vector_with_relevance_scores(query_embedding, k=k)
+                    ]
+                else:
+                    scored = self.vector_db.similarity_search_with_relevance_scores(query, k=k)
+                results = [RetrievalResult.from_document(doc, score) for doc, score in scored]
+                logger.info(f"Found {len(results)} similar chunks")
+                return results
+            else:
+                logger.info("Using fallback search with scores")
+                return self._fallback_search_with_scores(query, k)
+                
+        except Exception as e:
+            logger.error(f"Error in scored similarity search: {e}")
+            logger.info("Using fallback search due to error")
+            return self._fallback_search_with_scores(query, k)
+    
     def _fallback_search(self, query: str, k: int = 5) -> List[Document]:
         """Simple fallback search when vector search fails"""
+        return [doc for doc, _ in self._fallback_ranked(query, k)]
+    
+    def _fallback_search_with_scores(self, query: str, k: int = 5) -> List[RetrievalResult]:
+        """Fallback search scored by the fraction of query words found in each chunk"""
+        query_word_count = max(len(query.split()), 1)
+        return [
+            RetrievalResult.from_document(doc, score / query_word_count)
+            for doc, score in self._fallback_ranked(query, k)
+        ]
+    
+    def _fallback_ranked(self, query: str, k: int = 5) -> List[tuple]:
+        """Rank fallback documents by keyword overlap, returning (doc, score) pairs"""
         try:
             if not self.fallback_docs:
                 logger.warning("No documents available for fallback search")
                 return []
             
             # Simple keyword-based search as fallback
-            query_lower = query.lower()
-            relevant_docs = []
-            
-            for doc in self.fallback_docs:
-                content_lower = doc.page_content.lower()
-                # Check if query words appear in document
-                query_words = query_lower.split()
-                relevance_score = sum(1 for word in query_words if word in content_lower)
-                
-                if relevance_score > 0:
-                    relevant_docs.append((doc, relevance_score))
-            
-            # Sort by relevance and return top k
-            relevant_docs.sort(key=lambda x: x[1], reverse=True)
-            results = [doc for doc, score in relevant_docs[:k]]
+            ranked = rank_by_keywords([doc.page_content.lower() for doc in self.fallback_docs], query, k)
+            results = [(self.fallback_docs[i], score) for i, score in ranked]
             
             logger.info(f"Fallback search found {len(results)} relevant documents")
             return results
@@ -193,6 +439,18 @@ class VectorStore:
             logger.error(f"Error in fallback search: {e}")
             return []
     
+    def estimate_bytes(self) -> int:
+        """Approximate memory held by this store's fallback documents and embedding model"""
+        total = sum(sys.getsizeof(doc.page_content) for doc in self.fallback_docs)
+        # HuggingFaceEmbeddings keeps the SentenceTransformer model in .client
+        model = getattr(self.base_embeddings, "client", None)
+        if model is not None and hasattr(model, "parameters"):
+            try:
+                total += sum(p.numel() * p.element_size() for p in model.parameters())
+            except Exception as e:
+                logger.debug(f"Could not size embedding model: {e}")
+        return total
+    
     def get_collection_info(self) -> Dict[str, Any]:
         """Get collection information with fallback"""
         try:
@@ -200,12 +458,15 @@ class VectorStore:
                 # Try to get ChromaDB collection info
                 try:
                     collection = self.vector_db._collection
-                    return {
+                    info = {
                         'collection_name': collection.name,
                         'document_count': collection.count(),
                         'embedding_model': self.config.EMBEDDING_MODEL,
                         'index_type': 'ChromaDB'
                     }
+                    if self.projector:
+                        info['embedding_projection'] = self.projector.get_info()
+                    return info
                 except Exception as e:
                     logger.warning(f"Could not get ChromaDB collection info: {e}")
                     return self._fallback_collection_info()
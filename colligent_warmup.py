@@ -0,0 +1,72 @@
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Set
+
+from colligent_modes import MODE_DESCRIPTIONS
+
+logger = logging.getLogger(__name__)
+
+# KB versions with a warm-up currently running in this process
+_running: Set[str] = set()
+_running_lock = threading.Lock()
+
+
+def _is_warm(chatbot, question: str) -> bool:
+    """Whether every mode of a question is already cached for the current KB"""
+    for mode in MODE_DESCRIPTIONS:
+        cached = chatbot.answer_cache.peek(question, mode, chatbot.kb_version)
+        if not cached or (cached.get("path") == "fallback" and chatbot.llm):
+            return False
+    return True
+
+
+def warm_up_quick_questions(chatbot, questions: List[str]) -> Dict[str, Any]:
+    """Precompute answers to the Quick Questions in every mode.
+
+    Each question is retrieved and answered once; all mode variants are
+    derived from that base answer and stored in the shared answer cache for
+    the chatbot's current KB version. Questions already cached are skipped, so
+    running this again after a rebuild only recomputes what was invalidated.
+    """
+    stats = {"questions": len(questions), "computed": 0, "skipped": 0, "failed": 0, "seconds": 0.0}
+    if not chatbot.answer_cache or not chatbot.kb_version:
+        logger.info("Answer cache or knowledge base unavailable, skipping warm-up")
+        return stats
+
+    start = time.perf_counter()
+    for question in questions:
+        if _is_warm(chatbot, question):
+            stats["skipped"] += 1
+            continue
+        try:
+            path = chatbot.precompute_answers(question)
+            stats["computed" if path in ("llm", "fallback") else "failed"] += 1
+        except Exception as e:
+            logger.error(f"Error warming up '{question}': {e}")
+            stats["failed"] += 1
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    logger.info(f"Quick Question warm-up finished: {stats}")
+    return stats
+
+
+def start_quick_question_warm_up(chatbot, questions: List[str]) -> Optional[threading.Thread]:
+    """Run the warm-up in a background thread, once per KB version at a time"""
+    if not getattr(chatbot.config, "ENABLE_QUICK_QUESTION_WARMUP", False):
+        return None
+    kb_version = chatbot.kb_version
+    with _running_lock:
+        if not kb_version or kb_version in _running:
+            return None
+        _running.add(kb_version)
+
+    def run():
+        try:
+            warm_up_quick_questions(chatbot, questions)
+        finally:
+            with _running_lock:
+                _running.discard(kb_version)
+
+    thread = threading.Thread(target=run, name="quick-question-warmup", daemon=True)
+    thread.start()
+    return thread
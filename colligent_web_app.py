@@ -1,14 +1,35 @@
 import streamlit as st
 import os
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 import time
 
 from colligent_config import Config
 from colligent_core import ContextAwareChatbot
+from colligent_warmup import start_quick_question_warm_up
+from colligent_metrics import configure_metrics
+from colligent_rate_limiter import (
+    get_rate_limiter, parse_trusted_proxies, resolve_client_address, LLM_BUDGET, CACHE_BUDGET
+)
+from colligent_sessions import get_session_registry
+from colligent_kb_jobs import get_kb_manager
 import re
 import time
 from datetime import datetime, timedelta
 
+# Request headers identify clients behind a proxy; the helper is private in this Streamlit version
+try:
+    from streamlit.web.server.websocket_headers import _get_websocket_headers
+except ImportError:
+    _get_websocket_headers = None
+
+try:
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+except ImportError:
+    get_script_run_ctx = None
+
+# Per-session state freed when a session is abandoned; small UI flags are kept
+SESSION_STATE_EVICT_KEYS = ('chatbot', 'turn_html', 'pending_question', 'api_key')
+
 # Page configuration
 st.set_page_config(
     page_title="Collins' Personal AI Assistant",
@@ -104,26 +125,31 @@ def validate_input(text: str, max_length: int = 1000) -> bool:
     
     return True
 
-def check_rate_limit(user_id: str = "default") -> bool:
-    """Check if user has exceeded rate limit"""
-    if 'rate_limit' not in st.session_state:
-        st.session_state.rate_limit = {}
-    
-    current_time = time.time()
-    user_requests = st.session_state.rate_limit.get(user_id, [])
-    
-    # Remove requests older than 1 minute
-    user_requests = [req_time for req_time in user_requests if current_time - req_time < 60]
-    
-    # Check if user has exceeded limit (30 requests per minute)
-    if len(user_requests) >= 30:
-        return False
-    
-    # Add current request
-    user_requests.append(current_time)
-    st.session_state.rate_limit[user_id] = user_requests
-    
-    return True
+def get_client_id() -> str:
+    """Identify the client across sessions and tabs: the IP a trusted proxy saw, else the session"""
+    trusted_proxies = parse_trusted_proxies(Config().TRUSTED_PROXIES)
+    if trusted_proxies:
+        headers = (_get_websocket_headers() if _get_websocket_headers else None) or {}
+        # Streamlit does not expose the peer address; TRUSTED_PROXIES means the app is only reachable through them
+        address = resolve_client_address(None, headers.get("X-Forwarded-For"), trusted_proxies)
+        if address:
+            return address
+    ctx = get_script_run_ctx() if get_script_run_ctx else None
+    return f"session:{ctx.session_id}" if ctx else "anonymous"
+
+def check_rate_limit(question: str) -> Optional[float]:
+    """Charge a question to the client's rate limit; return seconds to wait if it is exceeded"""
+    limiter = get_rate_limiter(Config())
+    if limiter is None:
+        return None
+    # Answers that would call the LLM draw on the smaller budget
+    budget = LLM_BUDGET if st.session_state.chatbot.needs_llm(question) else CACHE_BUDGET
+    client_id = get_client_id()
+    allowed, retry_after = limiter.check(client_id, budget)
+    if allowed:
+        return None
+    log_suspicious_activity("rate_limited", f"client={client_id} budget={budget}")
+    return retry_after
 
 def sanitize_output(text: str) -> str:
     """Sanitize output to prevent XSS"""
@@ -157,15 +183,20 @@ def log_suspicious_activity(action: str, details: str = ""):
         print(log_entry)  # In production, use proper logging
 
 def initialize_chatbot():
-    """Initialize the chatbot"""
-    if 'chatbot' not in st.session_state:
+    """Initialize the chatbot, or switch it to a knowledge base rebuilt since the last run"""
+    if 'chatbot' in st.session_state:
+        get_kb_manager(Config()).adopt(st.session_state.chatbot)
+    else:
         config = Config()
+        configure_metrics(config)
         st.session_state.chatbot = ContextAwareChatbot(config)
         
         # Initialize knowledge base
         with st.spinner("Initializing knowledge base..."):
             success = st.session_state.chatbot.initialize_knowledge_base()
             if success:
+                # Precompute the Quick Questions so clicks are served from the cache
+                start_quick_question_warm_up(st.session_state.chatbot, config.QUICK_QUESTIONS)
                 st.success("Knowledge base initialized successfully!")
             else:
                 st.error("Failed to initialize knowledge base. Please check your documents.")
@@ -174,29 +205,108 @@ def display_chat_message(message: Dict[str, Any], is_user: bool = False):
     """Display a chat message"""
     if is_user:
         # Sanitize user input
-        safe_query = sanitize_output(message['query'])
-        st.markdown(f"""
+        st.markdown(render_user_html(sanitize_output(message['query'])), unsafe_allow_html=True)
+    else:
+        safe_response = sanitize_output(message['response'])
+        st.markdown(render_assistant_html(safe_response, message.get('sources')), unsafe_allow_html=True)
+
+def render_user_html(query: str) -> str:
+    """Build the HTML for a user message"""
+    return f"""
         <div class="chat-message user-message">
             <strong>You:</strong><br>
-            {safe_query}
+            {query}
         </div>
-        """, unsafe_allow_html=True)
-    else:
-        st.markdown(f"""
+        """
+
+def render_assistant_html(response: str, sources: Optional[List[str]] = None) -> str:
+    """Build the HTML for an assistant message and its sources"""
+    html = f"""
         <div class="chat-message assistant-message">
             <strong>Assistant:</strong><br>
-            {message['response']}
+            {response}
         </div>
-        """, unsafe_allow_html=True)
-        
-        # Display sources if available
-        if 'sources' in message and message['sources']:
-            sources_text = ", ".join(message['sources'])
-            st.markdown(f"""
+        """
+    
+    # Display sources if available
+    if sources:
+        sources_text = ", ".join(sources)
+        html += f"""
             <div class="source-info">
                 📚 Sources: {sources_text}
             </div>
-            """, unsafe_allow_html=True)
+            """
+    return html
+
+def get_turn_html(turn: Dict[str, Any], safe_response: Optional[str] = None) -> Tuple[str, str]:
+    """HTML for a question and its answer, sanitized and built once per turn and mode"""
+    cache = st.session_state.setdefault('turn_html', {})
+    key = (turn['turn_id'], turn['mode'])
+    html = cache.get(key)
+    if html is None:
+        if safe_response is None:
+            safe_response = sanitize_output(turn['response'])
+        html = (render_user_html(sanitize_output(turn['query'])),
+                render_assistant_html(safe_response, turn.get('sources')))
+        cache[key] = html
+    return html
+
+def display_chat_history(chatbot: ContextAwareChatbot):
+    """Show the newest turns from cached HTML, with older turns loaded a page at a time"""
+    page_size = getattr(Config, 'CHAT_VISIBLE_TURNS', 10)
+    visible = st.session_state.setdefault('visible_turns', page_size)
+    total = chatbot.get_conversation_length()
+    
+    if total > visible:
+        if st.button(f"Show {min(page_size, total - visible)} earlier messages", key="show_earlier_turns"):
+            st.session_state.visible_turns = visible + page_size
+            st.rerun()
+    
+    turns = chatbot.get_conversation_history(last_n=visible)
+    for turn in turns:
+        user_html, assistant_html = get_turn_html(turn)
+        st.markdown(user_html, unsafe_allow_html=True)
+        st.markdown(assistant_html, unsafe_allow_html=True)
+    
+    # Drop HTML for turns that were cleared or folded into the summary
+    cache = st.session_state.get('turn_html', {})
+    if len(cache) > len(turns):
+        shown = {(turn['turn_id'], turn['mode']) for turn in turns}
+        for key in [key for key in cache if key not in shown]:
+            del cache[key]
+
+def queue_question(question: str):
+    """Queue a question; it is shown and its answer streamed on the next run"""
+    st.session_state.pending_question = question
+
+def stream_answer(question: str, show_context: bool = False):
+    """Stream the chatbot's answer into the chat area as tokens arrive"""
+    placeholder = st.empty()
+    placeholder.markdown(render_assistant_html("<em>Thinking...</em>"), unsafe_allow_html=True)
+    
+    partial = ""
+    sources = []
+    result = {}
+    # Profile this answer if requested from the debug section
+    profile = st.session_state.pop('profile_next_question', False)
+    for event in st.session_state.chatbot.ask_question_stream(question, include_context=show_context, profile=profile):
+        if event['type'] == 'sources':
+            sources = event['sources']
+        elif event['type'] == 'token':
+            partial += event['content']
+            placeholder.markdown(render_assistant_html(sanitize_output(partial) + " ▌", sources), unsafe_allow_html=True)
+        elif event['type'] == 'done':
+            result = event
+    
+    # The final answer may differ from the raw tokens once the mode is applied
+    safe_response = sanitize_output(result.get('response', partial))
+    placeholder.markdown(render_assistant_html(safe_response, result.get('sources', sources)), unsafe_allow_html=True)
+    
+    # Cache the new turn's HTML now, so the history never sanitizes it again
+    if 'error' not in result:
+        latest = st.session_state.chatbot.get_conversation_history(last_n=1)
+        if latest and latest[0]['query'] == question:
+            get_turn_html(latest[0], safe_response)
 
 def main():
     """Main application function"""
@@ -220,6 +330,15 @@ def main():
     # Update last activity
     st.session_state.last_activity = datetime.now()
     
+    # Register activity with the reaper, which frees this session's chatbot if it is abandoned
+    ctx = get_script_run_ctx() if get_script_run_ctx else None
+    if ctx:
+        registry = get_session_registry(config, SESSION_STATE_EVICT_KEYS)
+        if registry.was_evicted(ctx.session_id):
+            st.error("⏰ Session expired. Please refresh the page.")
+            st.stop()
+        registry.touch(ctx.session_id, ctx.session_state)
+    
     # Header
     st.markdown('<h1 class="main-header">🤖 ColliGent</h1>', unsafe_allow_html=True)
     st.markdown('<h3 style="text-align: center;">Hi, I\'m Collins! Ask me anything.</h3>', unsafe_allow_html=True)
@@ -257,6 +376,25 @@ def main():
                     st.success("✅ Knowledge Base Loaded")
                     st.info(f"📚 Documents: {kb_info.get('document_count', 0)}")
                     st.info(f"🔧 Model: {kb_info.get('embedding_model', 'N/A')}")
+                    cache_stats = st.session_state.chatbot.get_cache_stats()
+                    if cache_stats:
+                        st.info(f"⚡ Answer cache: {cache_stats['hit_rate']:.0%} hit rate "
+                                f"({cache_stats['exact_hits']} exact, {cache_stats['semantic_hits']} similar, "
+                                f"{cache_stats['entries']} cached)")
+                    metrics = st.session_state.chatbot.get_metrics_summary()
+                    if metrics['stages']:
+                        st.markdown("**⏱️ Latency by stage**")
+                        st.table({
+                            "stage": list(metrics['stages']),
+                            "count": [s['count'] for s in metrics['stages'].values()],
+                            "p50 ms": [s['p50_ms'] for s in metrics['stages'].values()],
+                            "p95 ms": [s['p95_ms'] for s in metrics['stages'].values()],
+                        })
+                        paths = ", ".join(f"{path}: {count}" for path, count in metrics['paths'].items())
+                        st.caption(f"Answer paths: {paths}")
+                    sessions = get_session_registry(config, SESSION_STATE_EVICT_KEYS).get_stats()
+                    st.caption(f"Sessions: {sessions['live']} live, {sessions['evicted']} evicted "
+                               f"({sessions['reclaimed_bytes'] / 1e6:.1f} MB reclaimed)")
                 else:
                     st.error(f"❌ Error: {kb_info['error']}")
         
@@ -276,9 +414,8 @@ def main():
             if api_key and api_key != st.session_state.get('api_key', ''):
                 st.session_state.api_key = api_key
                 os.environ['OPENAI_API_KEY'] = api_key
-                # Reinitialize chatbot with new API key
-                config = Config()
-                st.session_state.chatbot = ContextAwareChatbot(config)
+                # Swap the LLM client in place, keeping the knowledge base and conversation
+                st.session_state.chatbot.set_api_key(api_key)
                 st.success("API key updated!")
             
             # Show context option
@@ -319,18 +456,27 @@ def main():
             if st.button("🗑️ Clear Chat", type="secondary", key="clear_chat_btn"):
                 if 'chatbot' in st.session_state:
                     st.session_state.chatbot.clear_conversation_history()
-                st.session_state.messages = []
+                st.session_state.pop('visible_turns', None)
                 st.rerun()
             
-            # Rebuild knowledge base button
-            if st.button("🔄 Rebuild KB", type="secondary", key="rebuild_kb_btn"):
-                with st.spinner("Rebuilding knowledge base..."):
-                    success = st.session_state.chatbot.initialize_knowledge_base(force_rebuild=True)
-                    if success:
-                        st.success("Knowledge base rebuilt!")
-                    else:
-                        st.error("Failed to rebuild knowledge base.")
-                st.rerun()
+            # Rebuild knowledge base in the background; questions are answered from the old one meanwhile
+            kb_manager = get_kb_manager(config)
+            rebuild = kb_manager.get_status()
+            if rebuild and rebuild['state'] == 'running':
+                st.progress(rebuild['progress'], text=f"Rebuilding knowledge base: {rebuild['stage']}...")
+                if st.button("✖️ Cancel rebuild", type="secondary", key="cancel_rebuild_btn"):
+                    kb_manager.cancel()
+                    st.rerun()
+            else:
+                if st.button("🔄 Rebuild KB", type="secondary", key="rebuild_kb_btn"):
+                    kb_manager.start_rebuild(st.session_state.chatbot)
+                    st.rerun()
+                if rebuild and rebuild['state'] == 'succeeded':
+                    st.success(f"Knowledge base rebuilt! {rebuild['message']}")
+                elif rebuild and rebuild['state'] == 'cancelled':
+                    st.info(rebuild['message'])
+                elif rebuild and rebuild['state'] == 'failed':
+                    st.error(f"Failed to rebuild knowledge base: {rebuild['message']}")
             
             # Quick tips
             st.markdown("### 💡 Quick Tips")
@@ -351,6 +497,22 @@ def main():
                 if 'chatbot' in st.session_state:
                     debug_info = st.session_state.chatbot.get_deployment_debug_info()
                     
+                    memory_stats = debug_info.get('conversation_memory', {})
+                    st.info(f"🧠 Session memory: {memory_stats.get('bytes', 0) / 1024:.1f} KB of "
+                            f"{memory_stats.get('max_bytes', 0) / 1024:.0f} KB "
+                            f"({memory_stats.get('turns', 0)} turns, {memory_stats.get('folded_turns', 0)} summarized)")
+                    
+                    st.checkbox("🔬 Profile my next question", key="profile_next_question")
+                    profiles = debug_info.get('profiles', [])
+                    if profiles:
+                        labels = [f"{p['kind']}: {p['label']} ({p['duration_ms']} ms, {p['samples']} samples)" for p in profiles]
+                        selected = profiles[labels.index(st.selectbox("Recent profiles", labels))]
+                        st.table(selected['top_functions'])
+                        with open(selected['path'], 'rb') as f:
+                            st.download_button("Download collapsed stacks", f.read(),
+                                               file_name=os.path.basename(selected['path']),
+                                               help="Open in speedscope.app or render with flamegraph.pl")
+                    
                     st.json(debug_info)
                     
                     # Provide helpful suggestions based on debug info
@@ -369,10 +531,6 @@ def main():
     
     # Main chat area
     with col2:
-        # Initialize messages in session state
-        if 'messages' not in st.session_state:
-            st.session_state.messages = []
-        
         # Mode selection with icons and descriptions (moved to bottom)
         mode_options = {
             "default": {"icon": "💬", "name": "Default", "desc": "Natural conversational tone"},
@@ -392,74 +550,17 @@ def main():
         
         with qcol1:
             if st.button("What kind of engineer am I?", key="q1"):
-                # Process the question directly
-                user_message = {
-                    'query': "What kind of engineer am I?",
-                    'is_user': True
-                }
-                st.session_state.messages.append(user_message)
-                
-                with st.spinner("Thinking..."):
-                    response = st.session_state.chatbot.ask_question(
-                        "What kind of engineer am I?", 
-                        include_context=show_context
-                    )
-                    
-                    assistant_message = {
-                        'query': "What kind of engineer am I?",
-                        'response': response['response'],
-                        'sources': response.get('sources', []),
-                        'is_user': False
-                    }
-                    st.session_state.messages.append(assistant_message)
+                queue_question(Config.QUICK_QUESTIONS[0])
                 st.rerun()
         
         with qcol2:
             if st.button("What are my strongest technical skills?", key="q2"):
-                # Process the question directly
-                user_message = {
-                    'query': "What are my strongest technical skills?",
-                    'is_user': True
-                }
-                st.session_state.messages.append(user_message)
-                
-                with st.spinner("Thinking..."):
-                    response = st.session_state.chatbot.ask_question(
-                        "What are my strongest technical skills?", 
-                        include_context=show_context
-                    )
-                    
-                    assistant_message = {
-                        'query': "What are my strongest technical skills?",
-                        'response': response['response'],
-                        'sources': response.get('sources', []),
-                        'is_user': False
-                    }
-                    st.session_state.messages.append(assistant_message)
+                queue_question(Config.QUICK_QUESTIONS[1])
                 st.rerun()
         
         with qcol3:
             if st.button("What projects am I most proud of?", key="q3"):
-                # Process the question directly
-                user_message = {
-                    'query': "What projects am I most proud of?",
-                    'is_user': True
-                }
-                st.session_state.messages.append(user_message)
-                
-                with st.spinner("Thinking..."):
-                    response = st.session_state.chatbot.ask_question(
-                        "What projects am I most proud of?", 
-                        include_context=show_context
-                    )
-                    
-                    assistant_message = {
-                        'query': "What projects am I most proud of?",
-                        'response': response['response'],
-                        'sources': response.get('sources', []),
-                        'is_user': False
-                    }
-                    st.session_state.messages.append(assistant_message)
+                queue_question(Config.QUICK_QUESTIONS[2])
                 st.rerun()
         
         # Second row - Self-reflective questions
@@ -468,79 +569,38 @@ def main():
         
         with rcol1:
             if st.button("What energizes or drains me?", key="r1"):
-                # Process the question directly
-                user_message = {
-                    'query': "What kind of tasks energize or drain me?",
-                    'is_user': True
-                }
-                st.session_state.messages.append(user_message)
-                
-                with st.spinner("Reflecting..."):
-                    response = st.session_state.chatbot.ask_question(
-                        "What kind of tasks energize or drain me?", 
-                        include_context=show_context
-                    )
-                    
-                    assistant_message = {
-                        'query': "What kind of tasks energize or drain me?",
-                        'response': response['response'],
-                        'sources': response.get('sources', []),
-                        'is_user': False
-                    }
-                    st.session_state.messages.append(assistant_message)
+                queue_question(Config.QUICK_QUESTIONS[3])
                 st.rerun()
         
         with rcol2:
             if st.button("How do I collaborate best?", key="r2"):
-                # Process the question directly
-                user_message = {
-                    'query': "How do I collaborate best with others?",
-                    'is_user': True
-                }
-                st.session_state.messages.append(user_message)
-                
-                with st.spinner("Reflecting..."):
-                    response = st.session_state.chatbot.ask_question(
-                        "How do I collaborate best with others?", 
-                        include_context=show_context
-                    )
-                    
-                    assistant_message = {
-                        'query': "How do I collaborate best with others?",
-                        'response': response['response'],
-                        'sources': response.get('sources', []),
-                        'is_user': False
-                    }
-                    st.session_state.messages.append(assistant_message)
+                queue_question(Config.QUICK_QUESTIONS[4])
                 st.rerun()
         
         with rcol3:
             if st.button("Where do I need to grow?", key="r3"):
-                # Process the question directly
-                user_message = {
-                    'query': "Where do I need to grow?",
-                    'is_user': True
-                }
-                st.session_state.messages.append(user_message)
-                
-                with st.spinner("Reflecting..."):
-                    response = st.session_state.chatbot.ask_question(
-                        "Where do I need to grow?", 
-                        include_context=show_context
-                    )
-                    
-                    assistant_message = {
-                        'query': "Where do I need to grow?",
-                        'response': response['response'],
-                        'sources': response.get('sources', []),
-                        'is_user': False
-                    }
-                    st.session_state.messages.append(assistant_message)
+                queue_question(Config.QUICK_QUESTIONS[5])
                 st.rerun()
         
-        # Display chat history
-        for message in st.session_state.messages:
-            display_chat_message(message, is_user=message.get('is_user', False))
+        # Display chat history; older turns are folded into a summary by the chatbot
+        summary = st.session_state.chatbot.get_conversation_summary()
+        if summary:
+            with st.expander("Earlier in this conversation"):
+                st.text(summary)
+        
+        display_chat_history(st.session_state.chatbot)
+        
+        # Stream the answer to a newly asked question in place; typed and Quick Questions
+        # alike are charged to the rate limit here, once
+        pending_question = st.session_state.pop('pending_question', None)
+        if pending_question:
+            retry_after = check_rate_limit(pending_question)
+            if retry_after is not None:
+                st.error(f"⚠️ Rate limit exceeded. Please wait {max(1, round(retry_after))}s before sending another message.")
+            else:
+                display_chat_message({'query': pending_question}, is_user=True)
+                stream_answer(pending_question, show_context)
+                st.rerun()
         
         # Chat input with mode indicator
         with st.container():
@@ -596,38 +656,8 @@ def main():
                     st.error("❌ Invalid input detected. Please check your message and try again.")
                     st.rerun()
                 
-                # Rate limiting check
-                if not check_rate_limit():
-                    st.error("⚠️ Rate limit exceeded. Please wait a moment before sending another message.")
-                    st.rerun()
-                
-                # Add user message to history
-                user_message = {
-                    'query': user_input,
-                    'is_user': True
-                }
-                st.session_state.messages.append(user_message)
-                
-                # Get chatbot response
-                with st.spinner("Thinking..."):
-                    response = st.session_state.chatbot.ask_question(
-                        user_input, 
-                        include_context=show_context
-                    )
-                    
-                    # Sanitize response
-                    safe_response = sanitize_output(response['response'])
-                    
-                    # Add assistant response to history
-                    assistant_message = {
-                        'query': user_input,
-                        'response': safe_response,
-                        'sources': response.get('sources', []),
-                        'is_user': False
-                    }
-                    st.session_state.messages.append(assistant_message)
-                
-                # Use form_submit_button to clear input properly
+                # Answer is streamed below the chat history on the next run, after the rate limit check
+                queue_question(user_input)
                 st.rerun()
         
         # Footer
@@ -637,6 +667,12 @@ def main():
             Collins' Personal AI Assistant | Powered by RAG Technology
         </div>
         """, unsafe_allow_html=True)
+    
+    # Refresh rebuild progress while it is on screen
+    rebuild = get_kb_manager(config).get_status()
+    if st.session_state.show_help and rebuild and rebuild['state'] == 'running':
+        time.sleep(1)
+        st.rerun()
 
 if __name__ == "__main__":
     main()
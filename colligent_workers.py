@@ -0,0 +1,288 @@
+"""Multi-process deployment of the HTTP API.
+
+One Python process answers questions on one core at a time. The supervisor
+here loads the knowledge base once, exports it as a read-only memory-mapped
+index, hosts the single embedding service, and starts N worker processes that
+all accept on one pre-bound listening socket, so the kernel balances
+connections between them. Dead workers are replaced.
+
+Usage:
+    python colligent_workers.py serve --workers 4 --port 8000
+    python colligent_workers.py bench --workers 1 2 4 --duration 10 --concurrency 16
+"""
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import asyncio
+import logging
+import argparse
+import http.client
+import multiprocessing
+from typing import Any, Dict, List, Optional
+
+from colligent_config import Config, configure_cli_logging
+from colligent_core import ContextAwareChatbot
+from colligent_api import ColliGentAPI
+from colligent_metrics import percentile
+from colligent_shared_index import SharedIndexStore, export_shared_index
+from colligent_embedding_service import EmbeddingServer, EmbeddingClient
+
+logger = logging.getLogger(__name__)
+
+# Workers start from a fresh interpreter; forking a process that holds a loaded model and threads is unsafe
+_context = multiprocessing.get_context("spawn")
+
+
+def prepare_shared_index(config: Config):
+    """Load (or build) the knowledge base and export it for the workers.
+
+    Returns the shared index directory and the index's embeddings object, or
+    None for the embeddings when the store runs in keyword fallback mode.
+    """
+    chatbot = ContextAwareChatbot(config)
+    if not chatbot.initialize_knowledge_base():
+        raise RuntimeError("Failed to initialize knowledge base")
+    directory = export_shared_index(chatbot.vector_store, config.VECTOR_DB_PATH, chatbot.kb_version)
+    embeddings = chatbot.vector_store.embeddings if getattr(chatbot.vector_store, "vector_db", None) else None
+    return directory, embeddings
+
+
+def _worker_main(config: Config, sock: socket.socket, directory: str, embedding_url: Optional[str],
+                 ready, log_level: int):
+    """Entry point of one worker process"""
+    configure_cli_logging(log_level)
+    # The supervisor handles Ctrl+C and stops workers with SIGTERM
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    embeddings = EmbeddingClient(embedding_url) if embedding_url else None
+
+    def make_chatbot(cfg: Config) -> ContextAwareChatbot:
+        return ContextAwareChatbot(cfg, vector_store=SharedIndexStore(cfg, directory, embeddings))
+
+    async def serve():
+        api = ColliGentAPI(config, chatbot_factory=make_chatbot)
+        server = await api.serve(sock=sock)
+        ready.put((os.getpid(), api.ready))
+        loop = asyncio.get_running_loop()
+        stopped = loop.create_future()
+        loop.add_signal_handler(signal.SIGTERM, stopped.set_result, None)
+        async with server:
+            await stopped
+
+    asyncio.run(serve())
+
+
+class WorkerSupervisor:
+    """Starts, watches and stops the worker processes sharing one listening socket"""
+
+    def __init__(self, config: Config, workers: int, host: str, port: int):
+        self.config = config
+        self.workers = max(1, workers)
+        self.host = host
+        self.port = port
+        self.processes: List[multiprocessing.Process] = []
+        self.restarts = 0
+        self.embedding_server: Optional[EmbeddingServer] = None
+        self._ready = _context.Queue()
+        self._sock: Optional[socket.socket] = None
+        self._directory: Optional[str] = None
+        self._embedding_url: Optional[str] = None
+        self._stopping = False
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self, timeout: float = 120) -> "WorkerSupervisor":
+        """Prepare the shared index and embedding service, then start every worker and wait until they load"""
+        if getattr(self.config, "ENABLE_RATE_LIMITING", True) and not getattr(self.config, "RATE_LIMIT_DB_PATH", ""):
+            # Per-process buckets would give every client N times its budget
+            self.config.RATE_LIMIT_DB_PATH = os.path.join(self.config.VECTOR_DB_PATH, "rate_limits.sqlite3")
+
+        self._directory, embeddings = prepare_shared_index(self.config)
+        if embeddings is not None:
+            self.embedding_server = EmbeddingServer(
+                embeddings, "127.0.0.1", getattr(self.config, "EMBEDDING_SERVICE_PORT", 0)).start()
+            self._embedding_url = self.embedding_server.url
+            logger.info(f"Embedding service listening on {self._embedding_url}")
+        else:
+            logger.info("No embedding model loaded; workers will use keyword search")
+
+        self._sock = socket.create_server((self.host, self.port), backlog=1024)
+        self._sock.set_inheritable(True)
+        self.port = self._sock.getsockname()[1]
+        for _ in range(self.workers):
+            self._spawn()
+
+        deadline = time.monotonic() + timeout
+        for _ in range(self.workers):
+            pid, ok = self._ready.get(timeout=max(0.1, deadline - time.monotonic()))
+            if not ok:
+                raise RuntimeError(f"Worker {pid} failed to load the shared index")
+        logger.info(f"{self.workers} workers serving {self.url}")
+        return self
+
+    def _spawn(self) -> multiprocessing.Process:
+        process = _context.Process(
+            target=_worker_main, name="colligent-worker", daemon=True,
+            args=(self.config, self._sock, self._directory, self._embedding_url, self._ready,
+                  logging.getLogger().getEffectiveLevel()),
+        )
+        process.start()
+        self.processes.append(process)
+        return process
+
+    def watch(self):
+        """Replace workers that exit until stop() is called"""
+        delay = getattr(self.config, "WORKER_RESTART_DELAY_SECONDS", 1)
+        while not self._stopping:
+            time.sleep(delay)
+            for process in list(self.processes):
+                if process.is_alive() or self._stopping:
+                    continue
+                logger.warning(f"Worker {process.pid} exited with code {process.exitcode}; restarting")
+                self.processes.remove(process)
+                self._spawn()
+                self.restarts += 1
+
+    def stop(self, timeout: float = 10):
+        self._stopping = True
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.kill()
+        self.processes.clear()
+        if self._sock:
+            self._sock.close()
+        if self.embedding_server:
+            self.embedding_server.stop()
+
+
+def serve(config: Config, workers: int, host: str, port: int):
+    supervisor = WorkerSupervisor(config, workers, host, port).start()
+
+    def shutdown(signum, frame):
+        supervisor._stopping = True
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    try:
+        supervisor.watch()
+    finally:
+        supervisor.stop()
+
+
+# Benchmark
+
+def _bench_client(url: str, questions: List[str], client_id: int, duration: float, results):
+    """Ask questions on a new connection each, so the kernel spreads them across workers"""
+    host, port = url.split("//", 1)[1].rsplit(":", 1)
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+    n = 0
+    while time.perf_counter() < deadline:
+        # Unique questions, so neither the answer cache nor request coalescing hides the work
+        body = json.dumps({"question": f"{questions[n % len(questions)]} (client {client_id}, request {n})"})
+        n += 1
+        start = time.perf_counter()
+        try:
+            conn = http.client.HTTPConnection(host, int(port), timeout=30)
+            conn.request("POST", "/ask", body=body, headers={"Content-Type": "application/json", "Connection": "close"})
+            response = conn.getresponse()
+            response.read()
+            conn.close()
+            if response.status != 200:
+                errors += 1
+                continue
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+    results.put((latencies, errors))
+
+
+def run_benchmark(config: Config, worker_counts: List[int], duration: float, concurrency: int) -> List[Dict[str, Any]]:
+    """Measure /ask throughput for each worker count under the same client load"""
+    # Every request should do the full retrieval and answer work
+    config.ENABLE_RATE_LIMITING = False
+    config.ENABLE_ANSWER_CACHE = False
+    config.ENABLE_QUICK_QUESTION_WARMUP = False
+    questions = list(getattr(config, "QUICK_QUESTIONS", [])) or ["What is your background?"]
+
+    rows = []
+    for workers in worker_counts:
+        supervisor = WorkerSupervisor(config, workers, "127.0.0.1", 0).start()
+        try:
+            results = _context.Queue()
+            clients = [
+                _context.Process(target=_bench_client, args=(supervisor.url, questions, i, duration, results))
+                for i in range(concurrency)
+            ]
+            for client in clients:
+                client.start()
+            latencies, errors = [], 0
+            for _ in clients:
+                client_latencies, client_errors = results.get()
+                latencies.extend(client_latencies)
+                errors += client_errors
+            for client in clients:
+                client.join()
+        finally:
+            supervisor.stop()
+
+        row = {
+            "workers": workers,
+            "requests": len(latencies),
+            "errors": errors,
+            "rps": len(latencies) / duration,
+            "p50_ms": (percentile(latencies, 0.50) or 0.0) * 1000,
+            "p95_ms": (percentile(latencies, 0.95) or 0.0) * 1000,
+        }
+        row["speedup"] = row["rps"] / rows[0]["rps"] if rows and rows[0]["rps"] else 1.0
+        rows.append(row)
+        print(f"{workers:>7} {row['requests']:>9} {errors:>6} {row['rps']:>8.1f} "
+              f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['speedup']:>7.2f}x", flush=True)
+    return rows
+
+
+def main():
+    config = Config()
+    parser = argparse.ArgumentParser(description="Serve the ColliGent API from several worker processes")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="Run N workers behind one listening socket")
+    serve_parser.add_argument("--workers", type=int, default=config.WORKER_COUNT)
+    serve_parser.add_argument("--host", default=config.API_HOST)
+    serve_parser.add_argument("--port", type=int, default=config.API_PORT)
+
+    bench_parser = commands.add_parser("bench", help="Measure throughput for several worker counts")
+    bench_parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    bench_parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load per worker count")
+    bench_parser.add_argument("--concurrency", type=int, default=16, help="Client processes sending questions")
+    bench_parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    # Keep benchmark output readable
+    configure_cli_logging(logging.INFO if args.command == "serve" else logging.WARNING)
+    if args.command == "serve":
+        serve(config, args.workers, args.host, args.port)
+        return
+
+    print(f"{os.cpu_count()} CPUs, {args.concurrency} clients, {args.duration:.0f}s per run")
+    print(f"{'workers':>7} {'requests':>9} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'speedup':>8}")
+    rows = run_benchmark(config, args.workers, args.duration, args.concurrency)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"cpus": os.cpu_count(), "concurrency": args.concurrency,
+                       "duration": args.duration, "results": rows}, f, indent=2)
+    if max(args.workers) > (os.cpu_count() or 1):
+        print("Note: more workers than CPUs; throughput cannot scale past the core count", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import json
+
+import pytest
+
+import colligent_answer_cache
+from colligent_answer_cache import AnswerCache, normalize_query
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(colligent_answer_cache.time, "time", lambda: now[0])
+    return now
+
+
+def result(answer):
+    return {"answer": answer}
+
+
+def test_normalized_queries_share_an_entry():
+    cache = AnswerCache()
+    cache.put("What is your PhD about?", "general", "v1", result("cosmology"))
+    assert normalize_query("  what is   your PhD about ") == "what is your phd about"
+    assert cache.get("what is your phd about", "general", "v1") == result("cosmology")
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = AnswerCache(ttl_seconds=60)
+    cache.put("q", "general", "v1", result("a"))
+    clock[0] += 59
+    assert cache.get("q", "general", "v1") == result("a")
+    clock[0] += 2
+    assert cache.get("q", "general", "v1") is None
+    stats = cache.get_stats()
+    assert stats["expirations"] == 1 and stats["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = AnswerCache(max_entries=2)
+    cache.put("a", "general", "v1", result("a"))
+    cache.put("b", "general", "v1", result("b"))
+    assert cache.get("a", "general", "v1")  # a is now the most recent
+    cache.put("c", "general", "v1", result("c"))
+    assert cache.peek("b", "general", "v1") is None
+    assert cache.peek("a", "general", "v1") == result("a")
+    assert cache.peek("c", "general", "v1") == result("c")
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_kb_version_is_part_of_the_key():
+    cache = AnswerCache()
+    cache.put("q", "general", "v1", result("old"))
+    assert cache.get("q", "general", "v2") is None
+    cache.put("q", "general", "v2", result("new"))
+    cache.invalidate("v1")
+    assert cache.peek("q", "general", "v1") is None
+    assert cache.peek("q", "general", "v2") == result("new")
+
+
+def test_semantic_tier_is_off_by_default():
+    cache = AnswerCache()
+    cache.put("q", "general", "v1", result("a"), query_embedding=[1.0, 0.0])
+    assert not cache.semantic_enabled
+    assert cache.get("other", "general", "v1", query_embedding=[1.0, 0.0]) is None
+
+
+def test_semantic_hit_respects_threshold():
+    cache = AnswerCache(semantic_threshold=0.9)
+    cache.put("q", "general", "v1", result("a"), query_embedding=[1.0, 0.0])
+    assert cache.get("close", "general", "v1", query_embedding=[1.0, 0.2]) == result("a")  # cosine 0.98
+    assert cache.get("far", "general", "v1", query_embedding=[1.0, 1.0]) is None  # cosine 0.71
+    stats = cache.get_stats()
+    assert stats["semantic_hits"] == 1 and stats["misses"] == 1
+
+
+def test_semantic_tier_is_isolated_by_mode_and_kb_version():
+    cache = AnswerCache(semantic_threshold=0.9)
+    cache.put("q", "general", "v1", result("a"), query_embedding=[1.0, 0.0])
+    assert cache.get("close", "technical", "v1", query_embedding=[1.0, 0.0]) is None
+    assert cache.get("close", "general", "v2", query_embedding=[1.0, 0.0]) is None
+    assert cache.get("close", "general", "v1", query_embedding=[1.0, 0.0]) == result("a")
+
+
+def test_persisted_entries_survive_a_restart(tmp_path, clock):
+    path = tmp_path / "answers.json"
+    cache = AnswerCache(ttl_seconds=60, persist_path=str(path), save_delay_seconds=60)
+    cache.put("q", "general", "v1", result("a"))
+    cache.put("stale", "general", "v1", result("b"))
+    cache.flush()
+    stored = json.loads(path.read_text())
+    stored[AnswerCache.make_key("stale", "general", "v1")]["created"] -= 120
+    path.write_text(json.dumps(stored))
+
+    restored = AnswerCache(ttl_seconds=60, persist_path=str(path))
+    assert restored.peek("q", "general", "v1") == result("a")
+    assert restored.peek("stale", "general", "v1") is None
@@ -0,0 +1,63 @@
+import copy
+import json
+import asyncio
+
+from colligent_api import ColliGentAPI
+from colligent_config import Config
+
+
+class FailingSession:
+    """Streams its sources, then fails before answering"""
+    current_mode = "general"
+
+    def needs_llm(self, question):
+        return True
+
+    async def aask_question_stream(self, question, include_context=False):
+        yield {"type": "sources", "sources": ["cv.txt"]}
+        raise RuntimeError("LLM connection dropped")
+
+
+class FakeChatbot:
+    kb_version = "v1"
+
+    def __init__(self, config):
+        self.config = config
+
+    def initialize_knowledge_base(self):
+        return True
+
+    def fork_session(self, mode):
+        return FailingSession()
+
+
+def test_stream_error_is_reported_as_an_event():
+    config = copy.copy(Config())
+    config.ENABLE_RATE_LIMITING = False
+    config.ENABLE_QUICK_QUESTION_WARMUP = False
+
+    async def run():
+        api = ColliGentAPI(config, chatbot_factory=FakeChatbot)
+        server = await api.serve("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            body = json.dumps({"question": "Where do I need to grow?"}).encode()
+            writer.write(b"POST /ask/stream HTTP/1.1\r\nHost: test\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body))
+            await writer.drain()
+            response = await asyncio.wait_for(reader.read(), 5)
+            writer.close()
+            return response.decode()
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    response = asyncio.run(run())
+    head, _, stream = response.partition("\r\n\r\n")
+    assert head.startswith("HTTP/1.1 200")
+    assert "HTTP/1.1 500" not in stream
+    events = [frame.split("\n")[0] for frame in stream.strip().split("\n\n")]
+    assert events == ["event: sources", "event: error"]
+    assert json.loads(stream.strip().split("\n\n")[-1].split("data: ", 1)[1]) == {
+        "type": "error", "error": "Internal server error"
+    }
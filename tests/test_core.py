@@ -0,0 +1,8 @@
+from colligent_core import ContextAwareChatbot
+
+
+def test_precompute_answers_without_answer_cache_does_nothing():
+    chatbot = ContextAwareChatbot.__new__(ContextAwareChatbot)  # No knowledge base or models needed
+    chatbot.answer_cache = None
+    chatbot.kb_version = "v1"
+    assert chatbot.precompute_answers("What is your PhD about?") == "no_cache"
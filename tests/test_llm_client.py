@@ -0,0 +1,188 @@
+import copy
+import json
+import time
+import asyncio
+import threading
+import urllib.error
+import urllib.request
+from types import SimpleNamespace
+
+import pytest
+
+from colligent_config import Config
+from colligent_llm_client import LLMClientManager, ResilientLLM, retry_after_seconds
+from colligent_llm_stub import StubLLMServer
+
+
+class StubAPIError(Exception):
+    """Shaped like openai.APIStatusError: a status_code and the response headers"""
+
+    def __init__(self, status, headers):
+        super().__init__(f"HTTP {status}")
+        self.status_code = status
+        self.response = SimpleNamespace(status_code=status, headers={k.lower(): v for k, v in headers.items()})
+
+
+class StubChat:
+    """Minimal chat model speaking to the stub over HTTP, so no OpenAI client is needed"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+
+    def invoke(self, messages):
+        body = json.dumps({"model": "stub", "messages": [{"role": "user", "content": "hi"}]}).encode()
+        request = urllib.request.Request(f"{self.base_url}/chat/completions", data=body,
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=5) as response:
+                return json.load(response)["choices"][0]["message"]["content"]
+        except urllib.error.HTTPError as e:
+            raise StubAPIError(e.code, dict(e.headers))
+
+
+@pytest.fixture
+def stub():
+    with StubLLMServer(seed=0, latency_ms=0, jitter_ms=0, response="stub answer") as server:
+        yield server
+
+
+def make_manager(stub=None, **settings):
+    config = copy.copy(Config())
+    config.LLM_RETRY_BASE_DELAY = 0.01
+    config.LLM_RETRY_MAX_DELAY = 0.05
+    for name, value in settings.items():
+        setattr(config, name, value)
+    manager = LLMClientManager(config)
+    if stub is not None:
+        manager.build_model = lambda model_kwargs, loop=None: StubChat(stub.base_url)
+    return manager
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_transient_error_is_retried(stub, status):
+    stub.configure(fail_next=1, error_status=status)
+    manager = make_manager(stub)
+    assert ResilientLLM(manager, {}).invoke([]) == "stub answer"
+    assert stub.stats["requests"] == 2
+    assert manager.get_stats()["retries"] == 1
+
+
+def test_client_error_is_not_retried(stub):
+    stub.configure(fail_next=1, error_status=400)
+    manager = make_manager(stub)
+    with pytest.raises(StubAPIError):
+        ResilientLLM(manager, {}).invoke([])
+    assert stub.stats["requests"] == 1
+    assert manager.get_stats()["failures"] == 1
+
+
+def test_retry_after_is_honored(stub):
+    stub.configure(fail_next=1, error_status=429, retry_after=0.3)
+    manager = make_manager(stub)
+    start = time.monotonic()
+    assert ResilientLLM(manager, {}).invoke([]) == "stub answer"
+    assert time.monotonic() - start >= 0.3
+    assert stub.stats["requests"] == 2
+
+
+def test_retry_after_parsing():
+    assert retry_after_seconds(StubAPIError(429, {"Retry-After": "2"})) == 2.0
+    assert retry_after_seconds(StubAPIError(429, {"Retry-After": "Wed, 21 Oct 2026 07:28:00 GMT"})) is None
+    assert retry_after_seconds(StubAPIError(503, {})) is None
+    assert retry_after_seconds(ValueError()) is None
+
+
+def test_gives_up_when_retry_would_pass_deadline(stub):
+    stub.configure(error_rate=1.0, error_status=503, retry_after=5)
+    manager = make_manager(stub, LLM_MAX_RETRIES=5, LLM_RETRY_DEADLINE_SECONDS=1.0)
+    start = time.monotonic()
+    with pytest.raises(StubAPIError):
+        ResilientLLM(manager, {}).invoke([])
+    assert time.monotonic() - start < 1.0  # Did not sleep the 5s it was asked to
+    assert stub.stats["requests"] == 1
+    assert manager.get_stats()["failures"] == 1
+
+
+def test_gives_up_at_deadline_under_backoff(stub):
+    stub.configure(error_rate=1.0, error_status=503)
+    manager = make_manager(stub, LLM_MAX_RETRIES=100, LLM_RETRY_BASE_DELAY=0.05, LLM_RETRY_MAX_DELAY=0.05,
+                           LLM_RETRY_DEADLINE_SECONDS=0.3)
+    start = time.monotonic()
+    with pytest.raises(StubAPIError):
+        ResilientLLM(manager, {}).invoke([])
+    assert time.monotonic() - start < 0.3 + 0.2
+    assert 1 < stub.stats["requests"] < 100
+
+
+def hedging_manager(p95=0.05):
+    manager = make_manager(ENABLE_HEDGED_REQUESTS=True, LLM_HEDGE_MIN_SAMPLES=1)
+    manager.latency.record(p95)
+    return manager
+
+
+def test_hedge_fires_after_delay_and_cancels_loser():
+    manager = hedging_manager(p95=0.05)
+    llm = ResilientLLM(manager, {})
+    calls = []
+    primary_cancelled = asyncio.Event()
+
+    async def call():
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            try:
+                await asyncio.sleep(5)  # The slow primary
+            except asyncio.CancelledError:
+                primary_cancelled.set()
+                raise
+            return "primary"
+        return "hedge"
+
+    async def run():
+        start = time.monotonic()
+        result = await llm._ahedged(call)
+        await asyncio.sleep(0)  # Let the cancellation be delivered
+        return start, result
+
+    start, result = asyncio.run(run())
+    assert result == "hedge"
+    assert len(calls) == 2 and calls[1] - start >= 0.05
+    assert primary_cancelled.is_set()
+    stats = manager.get_stats()
+    assert stats["hedges"] == 1 and stats["hedge_wins"] == 1
+
+
+def test_fast_primary_is_not_hedged():
+    manager = hedging_manager(p95=0.5)
+    calls = []
+
+    async def call():
+        calls.append(1)
+        return "primary"
+
+    assert asyncio.run(ResilientLLM(manager, {})._ahedged(call)) == "primary"
+    assert len(calls) == 1
+    assert manager.get_stats()["hedges"] == 0
+
+
+def test_sync_hedge_fires_against_slow_stub(stub):
+    manager = hedging_manager(p95=0.05)
+    manager.build_model = lambda model_kwargs, loop=None: StubChat(stub.base_url)
+    stub.configure(latency_ms=300)
+    llm = ResilientLLM(manager, {})
+    # The first request is slow; by the time the hedge is sent the stub answers fast
+    threading.Timer(0.02, lambda: stub.configure(latency_ms=0)).start()
+    start = time.monotonic()
+    assert llm.invoke([]) == "stub answer"
+    assert time.monotonic() - start < 0.3
+    assert stub.stats["requests"] == 2
+    stats = manager.get_stats()
+    assert stats["hedges"] == 1 and stats["hedge_wins"] == 1
+
+
+def test_retries_through_openai_client(stub):
+    pytest.importorskip("langchain_openai")
+    stub.configure(fail_next=1, error_status=429, retry_after=0.1)
+    manager = make_manager(OPENAI_BASE_URL=stub.base_url)
+    llm = manager.get_llm("stub-key", model="stub")
+    assert llm.invoke([("user", "hi")]).content == "stub answer"
+    assert stub.stats["requests"] == 2
@@ -0,0 +1,58 @@
+from colligent_memory import ConversationMemory
+
+
+def add(memory, n, start=1, **kwargs):
+    for i in range(start, start + n):
+        memory.add_turn(f"Question {i}?", f"Answer {i}. More detail.", **kwargs)
+
+
+def test_ring_buffer_keeps_newest_turns():
+    memory = ConversationMemory(max_turns=3)
+    add(memory, 5)
+    history = memory.get_history()
+    assert [turn["query"] for turn in history] == ["Question 3?", "Question 4?", "Question 5?"]
+    assert [turn["turn_id"] for turn in history] == [3, 4, 5]
+    assert memory.folded_turns == 2
+    assert [turn["query"] for turn in memory.get_history(last_n=2)] == ["Question 4?", "Question 5?"]
+
+
+def test_folded_turns_are_summarized_by_first_sentence():
+    memory = ConversationMemory(max_turns=1)
+    add(memory, 3)
+    assert memory.summary == "- Q: Question 1? A: Answer 1.\n- Q: Question 2? A: Answer 2."
+
+
+def test_summary_is_capped_at_whole_lines():
+    memory = ConversationMemory(max_turns=1, summary_max_chars=70)
+    add(memory, 6)
+    assert len(memory.summary) <= 70
+    lines = memory.summary.split("\n")
+    assert all(line.startswith("- Q: ") for line in lines)
+    assert lines[-1] == "- Q: Question 5? A: Answer 5."
+
+
+def test_byte_cap_folds_turns_but_keeps_the_newest():
+    memory = ConversationMemory(max_turns=100, max_bytes=1)
+    add(memory, 3)
+    assert len(memory) == 1
+    assert memory.get_history()[0]["query"] == "Question 3?"
+    assert memory.folded_turns == 2
+
+
+def test_byte_accounting_matches_stored_turns():
+    memory = ConversationMemory(max_turns=2)
+    add(memory, 4)
+    assert memory._turn_bytes == sum(record.nbytes for record in memory.turns)
+    memory.clear()
+    assert memory.get_stats()["turns"] == 0 and memory.summary == "" and memory._turn_bytes == 0
+
+
+def test_rerender_uses_base_answers():
+    memory = ConversationMemory()
+    add(memory, 2)
+    memory.rerender(str.upper, "shout")
+    assert [turn["response"] for turn in memory.get_history()] == ["ANSWER 1. MORE DETAIL.", "ANSWER 2. MORE DETAIL."]
+    memory.rerender(lambda text: text, "default")
+    history = memory.get_history()
+    assert history[0]["response"] == "Answer 1. More detail." and history[0]["mode"] == "default"
+    assert memory._turn_bytes == sum(record.nbytes for record in memory.turns)
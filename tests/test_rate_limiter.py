@@ -0,0 +1,98 @@
+import time
+
+import pytest
+
+import colligent_rate_limiter
+from colligent_rate_limiter import (
+    CACHE_BUDGET, LLM_BUDGET, MemoryBucketStore, RateLimiter, SQLiteBucketStore, parse_trusted_proxies,
+    resolve_client_address,
+)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryBucketStore()
+    return SQLiteBucketStore(str(tmp_path / "limits.db"))
+
+
+def test_burst_then_limited_with_retry_after(store):
+    assert all(store.take("c", rate=1.0, capacity=3, now=100.0) == 0 for _ in range(3))
+    assert store.take("c", rate=1.0, capacity=3, now=100.0) == pytest.approx(1.0)
+
+
+def test_bucket_refills_with_elapsed_time(store):
+    for _ in range(2):
+        store.take("c", rate=0.5, capacity=2, now=100.0)
+    assert store.take("c", rate=0.5, capacity=2, now=101.0) == pytest.approx(1.0)  # Half a token back
+    assert store.take("c", rate=0.5, capacity=2, now=102.0) == 0  # A whole token after two seconds
+    # Refill stops at capacity however long the client was idle
+    assert all(store.take("c", rate=0.5, capacity=2, now=1000.0) == 0 for _ in range(2))
+    assert store.take("c", rate=0.5, capacity=2, now=1000.0) > 0
+
+
+def test_clients_have_separate_buckets(store):
+    store.take("a", rate=1.0, capacity=1, now=100.0)
+    assert store.take("a", rate=1.0, capacity=1, now=100.0) > 0
+    assert store.take("b", rate=1.0, capacity=1, now=100.0) == 0
+
+
+def test_sqlite_buckets_are_shared_between_stores(tmp_path):
+    path = str(tmp_path / "limits.db")
+    first, second = SQLiteBucketStore(path), SQLiteBucketStore(path)
+    assert first.take("c", rate=1.0, capacity=1, now=100.0) == 0
+    assert second.take("c", rate=1.0, capacity=1, now=100.0) > 0
+
+
+def test_memory_prune_drops_idle_buckets(monkeypatch):
+    store = MemoryBucketStore()
+    store.take("old", rate=1.0, capacity=1, now=0.0)
+    store.take("new", rate=1.0, capacity=1, now=650.0)
+    monkeypatch.setattr(colligent_rate_limiter.time, "monotonic", lambda: 700.0)
+    store.prune(max_idle_seconds=600)
+    assert len(store) == 1
+    assert store.take("new", rate=0.001, capacity=1, now=700.0) > 0  # Kept with its state
+
+
+def test_sqlite_prune_drops_idle_buckets(tmp_path):
+    store = SQLiteBucketStore(str(tmp_path / "limits.db"))
+    store.take("old", rate=1.0, capacity=1, now=time.time() - 1000)
+    store.take("new", rate=1.0, capacity=1)
+    store.prune(max_idle_seconds=600)
+    assert len(store) == 1
+
+
+def test_limiter_budgets_are_separate():
+    limiter = RateLimiter(requests_per_minute=2, cache_multiplier=2)
+    assert limiter.check("c")[0] and limiter.check("c")[0]
+    allowed, retry_after = limiter.check("c", LLM_BUDGET)
+    assert not allowed and 0 < retry_after <= 30
+    assert all(limiter.check("c", CACHE_BUDGET)[0] for _ in range(4))
+    assert not limiter.check("c", CACHE_BUDGET)[0]
+    stats = limiter.get_stats()
+    assert stats["allowed"] == 6 and stats["limited"] == 2
+
+
+def test_limiter_prunes_every_n_checks():
+    class CountingStore(MemoryBucketStore):
+        prunes = 0
+
+        def prune(self, max_idle_seconds=600):
+            CountingStore.prunes += 1
+            assert max_idle_seconds >= 60  # Never sooner than a bucket takes to refill
+
+    limiter = RateLimiter(store=CountingStore(), prune_every=3, max_idle_seconds=1)
+    for i in range(7):
+        limiter.check(f"client-{i}")
+    assert CountingStore.prunes == 2
+
+
+def test_forwarded_for_is_only_trusted_from_proxies():
+    proxies = parse_trusted_proxies("10.0.0.0/8, not-an-ip")
+    assert len(proxies) == 1
+    # Without trusted proxies the header is ignored
+    assert resolve_client_address("1.2.3.4", "9.9.9.9", []) == "1.2.3.4"
+    # A client connecting directly cannot choose its address
+    assert resolve_client_address("1.2.3.4", "9.9.9.9", proxies) == "1.2.3.4"
+    # Behind the proxy, the rightmost untrusted hop is the client; a forged left part is ignored
+    assert resolve_client_address("10.0.0.1", "6.6.6.6, 5.5.5.5, 10.0.0.2", proxies) == "5.5.5.5"
@@ -0,0 +1,97 @@
+import copy
+import math
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from colligent_config import Config
+from colligent_shared_index import SharedIndexStore, export_shared_index
+from colligent_vector_db import CHROMADB_AVAILABLE, Document, VectorStore, l2_relevance_score
+
+TEXTS = ["thesis findings", "work experience", "model architecture"]
+# The query has cosine 0.8, 0.6 and 0 with the three chunks
+VECTORS = {
+    "thesis findings": [0.8, 0.6, 0.0],
+    "work experience": [0.6, 0.8, 0.0],
+    "model architecture": [0.0, 0.0, 1.0],
+}
+QUERY = "what did the thesis find"
+QUERY_VECTOR = [1.0, 0.0, 0.0]
+
+
+class FixedEmbeddings:
+    """Embeds the test texts to known unit vectors"""
+
+    def embed_documents(self, texts):
+        return [VECTORS[text] for text in texts]
+
+    def embed_query(self, text):
+        return QUERY_VECTOR
+
+
+class _Collection:
+    def __init__(self, texts):
+        self.texts = texts
+
+    def get(self, include):
+        return {
+            "documents": self.texts,
+            "metadatas": [{"source": f"{i}.txt", "chunk_index": i} for i in range(len(self.texts))],
+            "embeddings": [VECTORS[text] for text in self.texts],
+        }
+
+
+class _LoadedStore:
+    """What export_shared_index reads from a loaded VectorStore"""
+
+    def __init__(self, config, texts):
+        self.config = config
+        self.vector_db = _Collection(texts)
+
+
+@pytest.fixture
+def config(tmp_path):
+    config = copy.copy(Config())
+    config.VECTOR_DB_PATH = str(tmp_path)
+    config.EMBEDDING_DIMENSION = 0
+    return config
+
+
+def _shared_scores(config, store):
+    directory = export_shared_index(store, config.VECTOR_DB_PATH, "test")
+    shared = SharedIndexStore(config, directory, FixedEmbeddings())
+    assert shared.load_vector_store()
+    return {r.text: r.score for r in shared.search_with_scores(QUERY, k=len(TEXTS))}
+
+
+def test_shared_scores_use_chroma_squared_l2_scale(config):
+    scores = _shared_scores(config, _LoadedStore(config, TEXTS))
+    for text, vector in VECTORS.items():
+        squared_distance = sum((a - b) ** 2 for a, b in zip(vector, QUERY_VECTOR))
+        assert scores[text] == pytest.approx(l2_relevance_score(squared_distance), abs=1e-6)
+    assert scores["thesis findings"] == pytest.approx(1 - 0.4 / math.sqrt(2), abs=1e-6)
+
+
+@pytest.mark.skipif(not CHROMADB_AVAILABLE, reason="needs chromadb")
+def test_shared_scores_match_vector_store(config):
+    store = VectorStore(config, base_embeddings=FixedEmbeddings())
+    documents = [Document(page_content=text, metadata={"source": f"{i}.txt", "chunk_index": i})
+                 for i, text in enumerate(TEXTS)]
+    assert store.create_vector_store(documents)
+    expected = {r.text: r.score for r in store.search_with_scores(QUERY, k=len(TEXTS), query_embedding=QUERY_VECTOR)}
+    assert _shared_scores(config, store) == pytest.approx(expected, abs=1e-5)
+
+
+def test_rebuilt_index_is_exported_again(config):
+    first = _LoadedStore(config, TEXTS)
+    first.index_path = "/indexes/index-1"
+    directory = export_shared_index(first, config.VECTOR_DB_PATH, "test")
+    assert export_shared_index(first, config.VECTOR_DB_PATH, "test") == directory
+
+    rebuilt = _LoadedStore(config, TEXTS[:2])
+    rebuilt.index_path = "/indexes/index-2"
+    new_directory = export_shared_index(rebuilt, config.VECTOR_DB_PATH, "test")
+    assert new_directory != directory
+    shared = SharedIndexStore(config, new_directory)
+    assert shared.load_vector_store() and shared.count == 2
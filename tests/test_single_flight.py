@@ -0,0 +1,102 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from colligent_single_flight import SingleFlight, make_flight_key
+
+
+def lead_until_released(flight, key, release, fn):
+    """Start a leader for key in a thread that computes fn() once release is set"""
+    started = threading.Event()
+
+    def leader():
+        def compute():
+            started.set()
+            release.wait(5)
+            return fn()
+        return flight.do(key, compute)
+
+    pool = ThreadPoolExecutor(max_workers=1)
+    future = pool.submit(leader)
+    pool.shutdown(wait=False)
+    assert started.wait(5)
+    return future
+
+
+def test_follower_shares_leader_result():
+    flight = SingleFlight()
+    release = threading.Event()
+    leader = lead_until_released(flight, "k", release, lambda: "answer")
+    calls = []
+
+    follower = ThreadPoolExecutor(max_workers=1).submit(flight.do, "k", lambda: calls.append(1) or "own")
+    deadline = time.monotonic() + 5
+    while flight.get_stats()["followers"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    release.set()
+    assert leader.result(5) == ("answer", False)
+    assert follower.result(5) == ("answer", True)
+    assert not calls
+    stats = flight.get_stats()
+    assert stats["leaders"] == 1 and stats["followers"] == 1 and stats["in_flight"] == 0
+
+
+def test_leader_error_reaches_followers():
+    flight = SingleFlight()
+    future, leader = flight.join("k")
+    assert leader
+    follower_future, follower_leads = flight.join("k")
+    assert not follower_leads
+    flight.complete("k", future, error=ValueError("boom"))
+    with pytest.raises(ValueError, match="boom"):
+        flight.wait("k", follower_future)
+    assert flight.join("k")[1]  # The failed flight has landed; the next caller leads
+
+
+def test_abandoned_leader_is_reported_to_followers():
+    flight = SingleFlight()
+    future, _ = flight.join("k")
+    flight.complete("k", future, error=GeneratorExit())
+    with pytest.raises(RuntimeError, match="abandoned"):
+        flight.wait("k", future)
+
+
+def test_follower_computes_itself_after_timeout():
+    flight = SingleFlight(wait_timeout=0.05)
+    release = threading.Event()
+    leader = lead_until_released(flight, "k", release, lambda: "leader")
+    try:
+        assert flight.do("k", lambda: "own") == ("own", False)
+        assert flight.get_stats()["follower_timeouts"] == 1
+    finally:
+        release.set()
+    assert leader.result(5) == ("leader", False)
+
+
+def test_async_follower_shares_leader_result():
+    flight = SingleFlight()
+
+    async def run():
+        release = asyncio.Event()
+
+        async def compute():
+            await release.wait()
+            return "answer"
+
+        leader = asyncio.ensure_future(flight.ado("k", compute))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.ado("k", compute))
+        await asyncio.sleep(0)
+        release.set()
+        return await leader, await follower
+
+    assert asyncio.run(run()) == (("answer", False), ("answer", True))
+
+
+def test_flight_key_separates_llm_and_fallback_answers():
+    assert make_flight_key("What?", "general", "v1") == make_flight_key("what", "general", "v1")
+    assert make_flight_key("what", "general", "v1") != make_flight_key("what", "general", "v1", ["gpt", 0.2, 500])
+    assert make_flight_key("what", "general", "v1") != make_flight_key("what", "general", "v2")
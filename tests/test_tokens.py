@@ -0,0 +1,55 @@
+from colligent_retrieval import RetrievalResult, RetrievedContext, context_header
+from colligent_tokens import count_tokens, format_context, pack_chunks, trim_to_sentences
+
+SENTENCES = " ".join(f"Sentence number {i} is about cosmology and machine learning." for i in range(20))
+
+
+def chunk(rank, text=SENTENCES, source="cv.txt"):
+    return context_header(rank, source), text
+
+
+def test_whole_chunks_count_the_rendered_context():
+    chunks = [chunk(1, "First chunk."), chunk(2, "Second chunk.")]
+    packed, used = pack_chunks(chunks, budget=1000)
+    assert packed == chunks
+    assert used == count_tokens(format_context(chunks))
+
+
+def test_prompt_context_is_what_was_packed():
+    results = [RetrievalResult(chunk_id=str(i), source="cv.txt", score=1.0, text=f"Chunk {i}.") for i in (1, 2)]
+    packed, used = pack_chunks([chunk(rank, r.text) for rank, r in enumerate(results, 1)], budget=1000)
+    context = RetrievedContext(results=results, tokens=used)
+    assert context.format_for_prompt() == format_context(packed)
+    assert count_tokens(context.format_for_prompt()) == used
+
+
+def test_never_exceeds_budget():
+    chunks = [chunk(rank) for rank in range(1, 4)]
+    for budget in range(0, count_tokens(format_context(chunks)) + 20, 7):
+        packed, used = pack_chunks(chunks, budget)
+        assert used == count_tokens(format_context(packed))
+        assert used <= budget
+
+
+def test_chunk_that_does_not_fit_is_trimmed_at_a_sentence():
+    first = chunk(1, "Short.")
+    budget = count_tokens(format_context([first, chunk(2)])) // 2
+    packed, used = pack_chunks([first, chunk(2), chunk(3)], budget)
+    assert len(packed) == 2  # Packing stops at the trimmed chunk
+    header, text = packed[1]
+    assert text.endswith(".") and SENTENCES.startswith(text) and text != SENTENCES
+    assert used <= budget
+
+
+def test_too_little_room_for_a_partial_chunk_drops_it():
+    first = chunk(1, "Short.")
+    budget = count_tokens(format_context([first])) + 10
+    packed, _ = pack_chunks([first, chunk(2)], budget, min_partial_tokens=40)
+    assert packed == [first]
+
+
+def test_trim_to_sentences_keeps_whole_sentences():
+    text, tokens = trim_to_sentences("One two. Three four. Five six.", count_tokens("One two. Three four."))
+    assert text == "One two. Three four."
+    assert tokens <= count_tokens("One two. Three four.") + 1
+    assert trim_to_sentences("A long first sentence.", 1) == ("", 0)
@@ -0,0 +1,65 @@
+import copy
+
+import pytest
+
+from colligent_config import Config
+from colligent_vector_db import (
+    CHROMADB_AVAILABLE, INDEX_VERSION_FILENAME, Document, VectorStore, read_index_version
+)
+
+
+class FixedEmbeddings:
+    """Deterministic 3-d embeddings, so no model is downloaded"""
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), float(text.count("e")), 1.0]
+
+
+@pytest.fixture
+def config(tmp_path):
+    config = copy.copy(Config())
+    config.VECTOR_DB_PATH = str(tmp_path)
+    config.EMBEDDING_DIMENSION = 0
+    return config
+
+
+def test_read_index_version(tmp_path):
+    assert read_index_version(str(tmp_path)) is None
+    (tmp_path / INDEX_VERSION_FILENAME).write_text("abc123\n")
+    assert read_index_version(str(tmp_path)) == "abc123"
+
+
+@pytest.mark.skipif(not CHROMADB_AVAILABLE, reason="needs chromadb")
+def test_index_built_for_another_version_is_not_loaded(config):
+    documents = [Document(page_content=text, metadata={"source": "cv.txt"}) for text in ("one", "three")]
+    assert VectorStore(config, base_embeddings=FixedEmbeddings()).create_vector_store(documents, index_version="v1")
+    assert VectorStore(config, base_embeddings=FixedEmbeddings()).load_vector_store(index_version="v1")
+    assert not VectorStore(config, base_embeddings=FixedEmbeddings()).load_vector_store(index_version="v2")
+
+
+def _fitted_projector(dimension, method="pca"):
+    np = pytest.importorskip("numpy")
+    from colligent_embedding_projection import EmbeddingProjector
+    return EmbeddingProjector(dimension, method).fit(np.random.default_rng(0).normal(size=(20, 8)).tolist())
+
+
+def test_stored_projection_is_checked_against_config(config):
+    pytest.importorskip("numpy")
+    store = VectorStore(config)
+    store.base_embeddings = FixedEmbeddings()
+    assert store._projection_matches(None)
+    assert not store._projection_matches(_fitted_projector(4))
+
+    config.EMBEDDING_DIMENSION = 4
+    config.EMBEDDING_PROJECTION = "pca"
+    assert store._projection_matches(_fitted_projector(4))
+    assert not store._projection_matches(None)
+    assert not store._projection_matches(_fitted_projector(6))
+    assert not store._projection_matches(_fitted_projector(4, "truncate"))
+
+    # Asking for the native size or more leaves vectors unchanged
+    config.EMBEDDING_DIMENSION = 16
+    assert store._projection_matches(_fitted_projector(16))